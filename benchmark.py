@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# benchmark.py - Offline end-to-end benchmark against the fake chat site
+"""
+Runs the real scraper flow (scraper.main -> process_prompt -> ask_one) in
+headless Chrome against fake_chat_server.py and reports prompts/minute,
+per-stage latency, WebDriver round trips and memory. Nothing leaves the
+machine, so runs are repeatable and can be compared before/after a change.
+
+Usage:
+    python3 benchmark.py --prompts 10
+    python3 benchmark.py --prompts 20 --workers 2 --latency 2 --words 300
+    python3 benchmark.py --prompts 12 --workers 4 --backend playwright
+    python3 benchmark.py --prompts 10 -- --reuse-session --completion observer
+
+Arguments after `--` are passed straight to scraper.py.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import scraper
+from fake_chat_server import FakeChatServer, add_settings_arguments, settings_from_args
+
+class MemorySampler:
+    """Samples the RSS of this process plus every browser it launched"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = scraper.process_tree_rss_bytes(os.getpid())
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def write_prompts(path: Path, count: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for k in range(1, count + 1):
+            writer.writerow([f"Benchmark question {k}: which firms lead AI consulting in sector {k}?"])
+
+def run_benchmark(args, scraper_args: List[str]) -> Dict:
+    server = FakeChatServer(port=args.port, settings=settings_from_args(args))
+    server.start_background()
+    work = Path(args.keep or tempfile.mkdtemp(prefix="ai-scraper-bench-"))
+    work.mkdir(parents=True, exist_ok=True)
+    prompts_csv = work / "prompts.csv"
+    write_prompts(prompts_csv, args.prompts)
+
+    argv = [
+        "scraper.py", "--site", args.site, "--base-url", server.url, "--headless",
+        "--prompts-csv", str(prompts_csv),
+        "--out-csv", str(work / "results.csv"),
+        "--report-json", str(work / "report.json"),
+        # Fresh learned state so runs don't influence each other
+        "--selector-stats", str(work / "selector_stats.json"),
+        "--latency-model", str(work / "latency_model.json"),
+        "--backend", args.backend,
+    ] + scraper_args
+    if args.backend == "selenium":
+        argv += ["--workers", str(args.workers), "--profile-dir", str(work / "profiles"),
+                 "--profile-webdriver", str(work / "webdriver_profile.json")]
+    else:
+        argv += ["--concurrency", str(args.workers)]
+    if args.no_delays:
+        scraper.PER_PROMPT_DELAY = (0.0, 0.0)
+
+    print(f"🏁 Benchmarking {args.prompts} prompts against {server.url} (work dir {work})")
+    saved_argv = sys.argv
+    sys.argv = argv
+    started = time.time()
+    try:
+        with MemorySampler() as memory:
+            scraper.main()
+    finally:
+        sys.argv = saved_argv
+        server.shutdown()
+        server.server_close()
+    wall = time.time() - started
+
+    with open(work / "report.json", encoding="utf-8") as f:
+        report = json.load(f)
+    profile = {"run": {}}
+    if args.backend == "selenium":
+        with open(work / "webdriver_profile.json", encoding="utf-8") as f:
+            profile = json.load(f)
+    with open(work / "results.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    ok = sum(1 for row in rows if scraper.is_completed_row(row))
+    return {
+        "site": args.site,
+        "prompts": len(rows),
+        "succeeded": ok,
+        "backend": args.backend,
+        "workers": args.workers,
+        "wall_seconds": round(wall, 2),
+        "prompts_per_minute": round(len(rows) / wall * 60, 2) if wall > 0 else 0.0,
+        "stages": {name[2:]: series for name, series in report["series"].items() if name.startswith("t_")},
+        # How the answer waits ended; timeouts mean the stage timings measure the budget, not the site
+        "completed_by": {name[len("completed_by_"):]: count for name, count in report["counters"].items()
+                         if name.startswith("completed_by_")},
+        "round_trips_per_prompt": profile["run"].get("commands_per_prompt"),
+        "peak_rss_mb": round(max(memory.samples) / 1e6, 1) if memory.samples else None,
+        "mean_rss_mb": round(sum(memory.samples) / len(memory.samples) / 1e6, 1) if memory.samples else None,
+        "server": server.stats(),
+        "scraper_args": scraper_args,
+        "work_dir": str(work),
+    }
+
+def print_result(result: Dict):
+    print(f"\n{'='*60}")
+    print("🏁 Benchmark result")
+    print(f"{'='*60}")
+    print(f"  prompts: {result['succeeded']}/{result['prompts']} succeeded with {result['workers']} "
+          f"{result['backend']} worker(s)")
+    print(f"  throughput: {result['prompts_per_minute']:.2f} prompts/min ({result['wall_seconds']:.1f}s wall)")
+    if result["round_trips_per_prompt"] is not None:
+        print(f"  WebDriver round trips: {result['round_trips_per_prompt']:.1f} per prompt")
+    if result["peak_rss_mb"] is not None:
+        print(f"  memory (scraper + browsers): peak {result['peak_rss_mb']:.0f} MB, mean {result['mean_rss_mb']:.0f} MB")
+    print(f"  page loads: {result['server'].get('pages', 0)}, answer streams: {result['server'].get('streams', 0)}")
+    if result["completed_by"]:
+        print("  answer waits ended by: " + ", ".join(f"{how} {count}" for how, count
+                                                      in sorted(result["completed_by"].items())))
+        if result["completed_by"].get("timeout"):
+            print("  ⚠️  some answer waits timed out; their stage timings reflect the wait budget")
+    print("  stage latency (s):")
+    for stage, s in result["stages"].items():
+        print(f"    {stage:<12} p50 {s['p50']:.2f}  p95 {s['p95']:.2f}  max {s['max']:.2f}  (n={s['count']})")
+
+def main():
+    argv = sys.argv[1:]
+    scraper_args: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, scraper_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description="Offline end-to-end scraper benchmark")
+    parser.add_argument("--prompts", type=int, default=10, help="Number of prompts to run (default: 10)")
+    parser.add_argument("--site", choices=["perplexity", "chatgpt"], default="perplexity",
+                       help="Which site's flow to exercise (default: perplexity)")
+    parser.add_argument("--backend", choices=["selenium", "playwright"], default="selenium",
+                       help="Scraper backend to benchmark (default: selenium)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Parallel browsers (selenium) or pages (playwright) (default: 1)")
+    parser.add_argument("--port", type=int, default=0, help="Fake site port (default: any free port)")
+    parser.add_argument("--no-delays", action="store_true",
+                       help="Skip the random pause between prompts")
+    parser.add_argument("--keep", metavar="DIR", help="Keep outputs and reports in DIR")
+    parser.add_argument("--json", metavar="PATH", help="Also write the result to this JSON file")
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args, scraper_args)
+    print_result(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Wrote benchmark result to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# fake_chat_server.py - Local stand-in chat site for offline runs and benchmarks
+"""
+Serves a single-page chat app that matches the selectors scraper.py expects
+(a textarea input, an answer container that is both `[data-testid='answer']`
+/ `.prose` and inside `[data-message-author-role='assistant']`, citation
+anchors, stop/copy generation-state buttons and a new-thread link). Answers are streamed token by token over
+Server-Sent Events with configurable latency, length and citation count,
+read by the page either with EventSource or with fetch() (--transport), so
+both DOM and network-stream capture can be exercised.
+
+Usage:
+    python3 fake_chat_server.py --port 8765 --latency 1.5 --words 150 --citations 4
+    python3 scraper.py --base-url http://127.0.0.1:8765/ --limit 5
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+PAGE_HTML = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Fake Chat</title>
+<style>
+body { font-family: sans-serif; max-width: 760px; margin: 2em auto; }
+textarea { width: 100%; height: 4em; }
+[data-testid='conversation-turn-1'] { color: #666; margin-bottom: 1em; }
+</style>
+</head>
+<body>
+<nav><a href="/" aria-label="New Thread" data-testid="create-new-chat-button">New</a></nav>
+<main>
+<div id="thread"></div>
+<textarea id="ask" placeholder="Ask anything..."></textarea>
+</main>
+<script>
+const TRANSPORT = '__TRANSPORT__';
+const ask = document.getElementById('ask');
+const thread = document.getElementById('thread');
+
+function div(attrs) {
+    const el = document.createElement('div');
+    for (const [k, v] of Object.entries(attrs)) el.setAttribute(k, v);
+    return el;
+}
+
+// Start a new thread in-page, like the real single-page apps do
+document.querySelector('nav a').addEventListener('click', e => {
+    e.preventDefault();
+    history.pushState({}, '', '/');
+    thread.innerHTML = '';
+    ask.value = '';
+});
+
+ask.addEventListener('keydown', e => {
+    if (e.key !== 'Enter' || e.shiftKey) return;
+    e.preventDefault();
+    const question = ask.value.trim();
+    if (!question) return;
+    ask.value = '';
+    thread.innerHTML = '';
+
+    const turn1 = div({'data-testid': 'conversation-turn-1'});
+    turn1.textContent = question;
+    const turn2 = div({'data-testid': 'conversation-turn-2'});
+    const message = div({'data-message-author-role': 'assistant'});
+    const answer = div({'data-testid': 'answer', 'class': 'prose markdown'});
+    message.appendChild(answer);
+    turn2.appendChild(message);
+    thread.append(turn1, turn2);
+
+    // Generation-state controls: a stop button and aria-busy while streaming,
+    // a copy action once the answer is done
+    answer.setAttribute('aria-busy', 'true');
+    const stop = document.createElement('button');
+    stop.setAttribute('data-testid', 'stop-button');
+    stop.setAttribute('aria-label', 'Stop generating');
+    stop.textContent = 'Stop';
+    turn2.appendChild(stop);
+
+    function handle(name, data) {
+        if (name === 'token') {
+            answer.appendChild(document.createTextNode(JSON.parse(data)));
+        } else if (name === 'cite') {
+            const cite = JSON.parse(data);
+            const a = document.createElement('a');
+            a.href = cite.url;
+            a.textContent = '[' + cite.n + ']';
+            answer.appendChild(a);
+            answer.appendChild(document.createTextNode(' '));
+        } else if (name === 'done') {
+            turn2.setAttribute('data-state', 'done');
+            answer.removeAttribute('aria-busy');
+            stop.remove();
+            const copy = document.createElement('button');
+            copy.setAttribute('data-testid', 'copy-turn-action-button');
+            copy.setAttribute('aria-label', 'Copy');
+            copy.textContent = 'Copy';
+            turn2.appendChild(copy);
+        }
+    }
+
+    const url = '/api/stream?q=' + encodeURIComponent(question);
+    if (TRANSPORT === 'fetch') {
+        // Read the SSE body off a fetch() stream, like the real chat apps do
+        fetch(url).then(async resp => {
+            const reader = resp.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const {value, done} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                let cut;
+                while ((cut = buffer.indexOf('\\n\\n')) >= 0) {
+                    const block = buffer.slice(0, cut);
+                    buffer = buffer.slice(cut + 2);
+                    let name = 'message';
+                    const data = [];
+                    for (const line of block.split('\\n')) {
+                        if (line.startsWith('event:')) name = line.slice(6).trim();
+                        else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+                    }
+                    handle(name, data.join('\\n'));
+                }
+            }
+        });
+    } else {
+        const source = new EventSource(url);
+        for (const name of ['token', 'cite']) {
+            source.addEventListener(name, ev => handle(name, ev.data));
+        }
+        source.addEventListener('done', ev => {
+            source.close();
+            handle('done', ev.data);
+        });
+        source.onerror = () => source.close();
+    }
+});
+</script>
+</body>
+</html>
+"""
+
+WORDS = [
+    "consulting", "firms", "platform", "analytics", "model", "teams", "deliver",
+    "strategy", "clients", "data", "engineering", "automation", "services", "leading",
+    "enterprise", "adoption", "results", "growth", "industry", "research", "projects",
+    "practice", "scale", "tools", "market", "experience", "custom", "solutions",
+    "integration", "capabilities", "focus", "partners", "value", "global", "specialist",
+]
+
+class AnswerSettings:
+    """How the fake site answers: delays in seconds, length in words"""
+
+    def __init__(self, latency: float = 1.0, token_delay: float = 0.02, words: int = 150,
+                 citations: int = 4, jitter: float = 0.2, seed: int = 0,
+                 transport: str = "eventsource"):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.words = words
+        self.citations = citations
+        self.jitter = jitter
+        self.seed = seed
+        self.transport = transport
+
+def generate_answer(prompt: str, settings: AnswerSettings) -> List[Dict]:
+    """Deterministic answer for a prompt as a list of token/cite events"""
+    digest = hashlib.sha1(f"{settings.seed}\n{prompt}".encode("utf-8")).hexdigest()
+    rng = random.Random(int(digest[:16], 16))
+
+    sentences: List[List[str]] = []
+    remaining = max(1, settings.words)
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 16))
+        sentences.append([rng.choice(WORDS) for _ in range(length)])
+        remaining -= length
+
+    # Spread citations evenly over the sentence ends
+    cite_after = set()
+    if settings.citations > 0:
+        step = len(sentences) / settings.citations
+        cite_after = {min(len(sentences) - 1, int(step * (k + 1)) - 1) for k in range(settings.citations)}
+
+    events = []
+    n = 0
+    for s, words in enumerate(sentences):
+        words[0] = words[0].capitalize()
+        for w, word in enumerate(words):
+            end = "." if w == len(words) - 1 else ""
+            events.append({"event": "token", "data": f"{word}{end} "})
+        if s in cite_after:
+            n += 1
+            events.append({"event": "cite",
+                           "data": {"n": n, "url": f"https://source-{n}.example.com/{digest[:8]}/article-{n}"}})
+    return events
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    server_version = "FakeChat/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/api/stream":
+            prompt = parse_qs(url.query).get("q", [""])[0]
+            self.server.count("streams")
+            self._stream(prompt)
+        elif url.path == "/stats":
+            self._send(200, "application/json", json.dumps(self.server.stats()).encode("utf-8"))
+        elif url.path in ("/", "/index.html") or not url.path.startswith("/api/"):
+            self.server.count("pages")
+            page = PAGE_HTML.replace("__TRANSPORT__", self.server.settings.transport)
+            self._send(200, "text/html; charset=utf-8", page.encode("utf-8"))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, prompt: str):
+        settings = self.server.settings
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        rng = random.Random()
+        time.sleep(max(0.0, settings.latency * (1 + rng.uniform(-settings.jitter, settings.jitter))))
+        try:
+            for event in generate_answer(prompt, settings):
+                self.wfile.write(f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if settings.token_delay > 0:
+                    time.sleep(settings.token_delay)
+            self.wfile.write(b"event: done\ndata: {}\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The page went away mid-answer (new thread or reload)
+            pass
+
+class FakeChatServer(ThreadingHTTPServer):
+    """Threaded HTTP server for the fake chat site; port 0 picks a free port"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 settings: Optional[AnswerSettings] = None, verbose: bool = False):
+        super().__init__((host, port), FakeChatHandler)
+        self.settings = settings or AnswerSettings()
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, name: str):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def start_background(self) -> threading.Thread:
+        """Serve from a daemon thread (call shutdown() to stop)"""
+        thread = threading.Thread(target=self.serve_forever, name="fake-chat-server", daemon=True)
+        thread.start()
+        return thread
+
+def add_settings_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=1.0,
+                       help="Seconds before the first token (default: 1.0)")
+    parser.add_argument("--token-delay", type=float, default=0.02,
+                       help="Seconds between streamed tokens (default: 0.02)")
+    parser.add_argument("--words", type=int, default=150, help="Answer length in words (default: 150)")
+    parser.add_argument("--citations", type=int, default=4, help="Citation links per answer (default: 4)")
+    parser.add_argument("--jitter", type=float, default=0.2,
+                       help="Relative random variation of the first-token latency (default: 0.2)")
+    parser.add_argument("--transport", choices=["eventsource", "fetch"], default="eventsource",
+                       help="How the page reads the answer stream: EventSource, or fetch() with "
+                            "an SSE body like the real apps (default: eventsource)")
+
+def settings_from_args(args) -> AnswerSettings:
+    return AnswerSettings(latency=args.latency, token_delay=args.token_delay, words=args.words,
+                          citations=args.citations, jitter=args.jitter, transport=args.transport)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake chat site for offline scraper runs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeChatServer(args.host, args.port, settings_from_args(args), verbose=args.verbose)
+    print(f"💬 Fake chat site at {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
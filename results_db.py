@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# results_db.py - Indexed SQLite store of scraper results across runs
+"""
+Keeps every run's answers and citations in one SQLite database so runs can
+be compared without loading CSVs into memory:
+
+    runs       one row per scraper run (site, prompts file, start/end, counts)
+    prompts    one row per distinct prompt, keyed by prompt_hash (site + normalized text)
+    answers    one row per prompt per run (answer, status, timings)
+    citations  one row per citation, with the cited domain for URL citations
+
+The scraper writes to it through ResultsSink (--out-db); rows are inserted as
+each prompt completes and committed in batches, with the database in WAL mode
+so the query CLI can read while a run is writing.
+
+Usage:
+    python3 results_db.py results.db runs
+    python3 results_db.py results.db domains --prompt "AI consulting" --last 4
+    python3 results_db.py results.db answers --prompt-hash 1bc1cfd0... --last 3
+    python3 results_db.py results.db top-domains --run 12
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    site TEXT,
+    prompts_file TEXT,
+    args TEXT,
+    started_at REAL,
+    finished_at REAL,
+    rows INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    site TEXT,
+    prompt TEXT
+);
+CREATE TABLE IF NOT EXISTS answers (
+    answer_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    prompt_hash TEXT NOT NULL REFERENCES prompts (prompt_hash),
+    idx INTEGER,
+    status TEXT,
+    cached INTEGER,
+    answer TEXT,
+    t_total REAL,
+    captured_at REAL,
+    metrics TEXT
+);
+CREATE TABLE IF NOT EXISTS citations (
+    answer_id INTEGER NOT NULL REFERENCES answers (answer_id),
+    run_id INTEGER NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    position INTEGER,
+    citation TEXT,
+    domain TEXT
+);
+CREATE INDEX IF NOT EXISTS answers_prompt_run ON answers (prompt_hash, run_id);
+CREATE INDEX IF NOT EXISTS answers_run ON answers (run_id);
+CREATE INDEX IF NOT EXISTS citations_prompt_run ON citations (prompt_hash, run_id);
+CREATE INDEX IF NOT EXISTS citations_domain ON citations (domain);
+CREATE INDEX IF NOT EXISTS citations_run ON citations (run_id);
+"""
+
+# Row fields that get their own answers column; the rest of the row lands in answers.metrics
+ANSWER_COLUMNS = {"idx", "prompt", "answer", "citations", "site", "prompt_hash", "cached", "t_total"}
+
+def citation_domain(citation: str) -> Optional[str]:
+    """Host of a URL citation without "www." (None for "Source: ..." style citations)"""
+    if not citation.startswith(("http://", "https://")):
+        return None
+    host = urlparse(citation).netloc.lower().split("@")[-1].split(":")[0]
+    return host[4:] if host.startswith("www.") else host or None
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) a results database in WAL mode"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    conn.commit()
+    return conn
+
+class ResultsSink:
+    """Result sink that inserts each row into a results database.
+
+    Inserts happen as rows arrive; they are committed every batch_size rows or
+    batch_seconds seconds (and on close), so a transaction covers many prompts.
+    status(row) classifies a row (ok/error/...); it is passed in by the scraper.
+    """
+
+    def __init__(self, path: str, site: str, prompts_file: Optional[str] = None,
+                 args: Optional[Dict] = None, status: Optional[Callable[[Dict], str]] = None,
+                 batch_size: int = 50, batch_seconds: float = 5.0):
+        self.path = path
+        self.status = status
+        self.batch_size = max(1, batch_size)
+        self.batch_seconds = batch_seconds
+        self.rows_written = 0
+        self._pending = 0
+        self._last_commit = time.time()
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        cursor = self._conn.execute(
+            "INSERT INTO runs (site, prompts_file, args, started_at) VALUES (?, ?, ?, ?)",
+            (site, prompts_file, json.dumps(args or {}, default=str), time.time()))
+        self.run_id = cursor.lastrowid
+        self._conn.commit()
+
+    def write(self, row: Dict):
+        citations = row.get("citations") or []
+        if isinstance(citations, str):
+            citations = [c for c in citations.split("; ") if c]
+        metrics = {k: v for k, v in row.items() if k not in ANSWER_COLUMNS and v not in (None, "")}
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?, ?)",
+                               (row["prompt_hash"], row.get("site"), row.get("prompt")))
+            cursor = self._conn.execute(
+                "INSERT INTO answers (run_id, prompt_hash, idx, status, cached, answer, t_total,"
+                " captured_at, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, row["prompt_hash"], row.get("idx"),
+                 self.status(row) if self.status else None, int(bool(row.get("cached"))),
+                 row.get("answer"), row.get("t_total"), time.time(),
+                 json.dumps(metrics, ensure_ascii=False, default=str)))
+            self._conn.executemany(
+                "INSERT INTO citations VALUES (?, ?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, self.run_id, row["prompt_hash"], k, c, citation_domain(c))
+                 for k, c in enumerate(citations)])
+            self.rows_written += 1
+            self._pending += 1
+            if self._pending >= self.batch_size or time.time() - self._last_commit >= self.batch_seconds:
+                self._commit()
+
+    def _commit(self):
+        self._conn.execute("UPDATE runs SET rows = rows + ? WHERE run_id = ?", (self._pending, self.run_id))
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.time()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._commit()
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id))
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+def _matching_prompts(conn: sqlite3.Connection, prompt: Optional[str],
+                      prompt_hash: Optional[str]) -> List[str]:
+    if prompt_hash:
+        return [prompt_hash]
+    found = conn.execute("SELECT prompt_hash FROM prompts WHERE prompt LIKE ?", (f"%{prompt}%",))
+    return [h for (h,) in found]
+
+def _recent_runs(conn: sqlite3.Connection, hashes: List[str], last: int) -> List[int]:
+    """The last runs (newest first) that answered any of the given prompts"""
+    marks = ",".join("?" * len(hashes))
+    found = conn.execute(f"SELECT DISTINCT run_id FROM answers WHERE prompt_hash IN ({marks})"
+                         f" ORDER BY run_id DESC LIMIT ?", (*hashes, last))
+    return [run_id for (run_id,) in found]
+
+def _when(timestamp: Optional[float]) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "-"
+
+def list_runs(conn: sqlite3.Connection, last: int) -> Iterator[str]:
+    rows = conn.execute(
+        "SELECT run_id, site, prompts_file, started_at, finished_at, rows FROM runs"
+        " ORDER BY run_id DESC LIMIT ?", (last,))
+    for run_id, site, prompts_file, started, finished, count in rows:
+        ok = conn.execute("SELECT COUNT(*) FROM answers WHERE run_id = ? AND status IN ('ok', 'cached')",
+                          (run_id,)).fetchone()[0]
+        yield (f"run {run_id}: {site} {_when(started)} -> {_when(finished)}  "
+               f"{ok}/{count} answered  ({prompts_file or 'built-in prompts'})")
+
+def prompt_domains(conn: sqlite3.Connection, hashes: List[str], last: int) -> Iterator[str]:
+    """Cited domains (with counts) per run for the given prompts"""
+    if not hashes:
+        return
+    runs = _recent_runs(conn, hashes, last)
+    for run_id in runs:
+        marks = ",".join("?" * len(hashes))
+        rows = conn.execute(
+            f"SELECT COALESCE(domain, citation), COUNT(*) FROM citations"
+            f" WHERE prompt_hash IN ({marks}) AND run_id = ?"
+            f" GROUP BY COALESCE(domain, citation) ORDER BY COUNT(*) DESC, COALESCE(domain, citation)",
+            (*hashes, run_id))
+        cited = [f"{name} ({n})" if n > 1 else name for name, n in rows]
+        yield f"run {run_id}: " + (", ".join(cited) if cited else "no citations")
+
+def prompt_answers(conn: sqlite3.Connection, hashes: List[str], last: int, width: int) -> Iterator[str]:
+    if not hashes:
+        return
+    runs = _recent_runs(conn, hashes, last)
+    marks = ",".join("?" * len(hashes))
+    run_marks = ",".join("?" * len(runs))
+    rows = conn.execute(
+        f"SELECT a.run_id, p.prompt, a.status, a.answer FROM answers a JOIN prompts p USING (prompt_hash)"
+        f" WHERE a.prompt_hash IN ({marks}) AND a.run_id IN ({run_marks})"
+        f" ORDER BY a.run_id DESC, a.idx", (*hashes, *runs))
+    for run_id, prompt, status, answer in rows:
+        text = " ".join((answer or "").split())
+        if len(text) > width:
+            text = text[:width - 3] + "..."
+        yield f"run {run_id} [{status}] {prompt}\n    {text}"
+
+def top_domains(conn: sqlite3.Connection, run_id: Optional[int], limit: int) -> Iterator[str]:
+    where, params = ("WHERE domain IS NOT NULL AND run_id = ?", (run_id,)) if run_id else \
+        ("WHERE domain IS NOT NULL", ())
+    rows = conn.execute(
+        f"SELECT domain, COUNT(*), COUNT(DISTINCT prompt_hash) FROM citations {where}"
+        f" GROUP BY domain ORDER BY COUNT(*) DESC, domain LIMIT ?", (*params, limit))
+    for domain, n, prompts in rows:
+        yield f"{n:>6}  {domain}  ({prompts} prompts)"
+
+def _print_lines(lines: Iterable[str], empty: str):
+    printed = False
+    for line in lines:
+        print(line)
+        printed = True
+    if not printed:
+        print(empty)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the scraper's SQLite results store")
+    parser.add_argument("db", help="Results database written with scraper.py --out-db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runs = commands.add_parser("runs", help="List recent runs")
+    runs.add_argument("--last", type=int, default=20, help="How many runs (default: 20)")
+
+    for name, help_text in (("domains", "Domains cited for a prompt, run by run"),
+                            ("answers", "Answers to a prompt, run by run")):
+        sub = commands.add_parser(name, help=help_text)
+        which = sub.add_mutually_exclusive_group(required=True)
+        which.add_argument("--prompt", help="Text contained in the prompt (case-insensitive)")
+        which.add_argument("--prompt-hash", help="Exact prompt_hash from the outputs")
+        sub.add_argument("--last", type=int, default=5, help="How many recent runs (default: 5)")
+        if name == "answers":
+            sub.add_argument("--width", type=int, default=200, help="Truncate answers to this many characters")
+
+    top = commands.add_parser("top-domains", help="Most cited domains overall or in one run")
+    top.add_argument("--run", type=int, help="Only this run id")
+    top.add_argument("--limit", type=int, default=20, help="How many domains (default: 20)")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        if args.command == "runs":
+            _print_lines(list_runs(conn, args.last), "No runs recorded yet")
+        elif args.command == "top-domains":
+            _print_lines(top_domains(conn, args.run, args.limit), "No cited domains")
+        else:
+            hashes = _matching_prompts(conn, args.prompt, args.prompt_hash)
+            if args.command == "domains":
+                _print_lines(prompt_domains(conn, hashes, args.last), "No matching prompts")
+            else:
+                _print_lines(prompt_answers(conn, hashes, args.last, args.width), "No matching prompts")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
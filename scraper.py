@@ -3,16 +3,32 @@ import time
 import random
 import csv
 import json
+import os
+import sys
+import math
+import hashlib
+import sqlite3
+import shutil
+import tempfile
+import threading
 import argparse
+import asyncio
+import heapq
+from contextlib import contextmanager
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 
-import pandas as pd
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import InvalidSessionIdException
 from selenium.webdriver.chrome.options import Options
+from urllib3.exceptions import MaxRetryError, ProtocolError
+
+from citations import extract_text_citations
+from results_db import ResultsSink
 
 DEFAULT_PROMPTS = [
     "What is AI consulting?",
@@ -23,21 +39,1025 @@ DEFAULT_PROMPTS = [
 ANSWER_WAIT_SECONDS = 180  # Longer wait for Perplexity to complete answers
 PER_PROMPT_DELAY = (3.0, 6.0)  # Shorter delays
 
-def read_prompts(csv_path: Optional[str]) -> List[str]:
-    """Read prompts from CSV file"""
-    if not csv_path:
-        return DEFAULT_PROMPTS[:]
-    
-    prompts: List[str] = []
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row:
+# Answer completion detection: "poll" re-reads the DOM every second,
+# "observer" watches page mutations and waits for a quiet period, "signals"
+# polls and also watches the site's generation-state controls (GENERATION_SIGNALS)
+COMPLETION_MODE = "poll"
+OBSERVER_QUIET_SECONDS = 3.0  # No DOM changes for this long = answer finished
+OBSERVER_CHUNK_SECONDS = 20  # Max time a single in-page wait blocks before reporting back
+
+# Answer capture: "dom" reads the rendered answer, "network" reads the streamed
+# response from DevTools network events and falls back to the DOM
+CAPTURE_MODE = "dom"
+NETWORK_STREAM_GRACE_SECONDS = 15  # Give up on the stream if none has started by then
+
+# Selector probing: "batched" evaluates a whole selector list in one script call,
+# "legacy" issues find_elements/is_displayed/.text per element (for comparison)
+PROBE_MODE = "batched"
+
+# Adaptive selector ordering (a SelectorStats store, set up in main())
+SELECTOR_STATS = None
+
+# Learned wait budgets (a LatencyModel, set up in main())
+LATENCY_MODEL = None
+
+# Answers from earlier runs (an AnswerCache, set up in main() with --cache)
+ANSWER_CACHE = None
+
+# Per-caller WebDriver command profile (a CommandProfiler, set up in main() when requested)
+WEBDRIVER_PROFILER = None
+
+# Prompt input fields per site, most specific first
+INPUT_SELECTORS = {
+    "perplexity": [
+        "textarea[placeholder*='Ask anything']",
+        "textarea[placeholder*='Ask']",
+        "textarea[placeholder*='question']",
+        "textarea",
+        "div[contenteditable='true']",
+        "div[role='textbox']",
+    ],
+    "chatgpt": [
+        "textarea[placeholder*='Message ChatGPT']",
+        "textarea[placeholder*='Send a message']",
+        "textarea[placeholder*='Message']",
+        "textarea",
+        "div[contenteditable='true']",
+    ],
+}
+
+# Answer containers per site, most specific first
+ANSWER_SELECTORS = {
+    "perplexity": [
+        "[data-testid='answer']",
+        "[data-testid='response']",
+        ".prose",
+        ".markdown",
+        ".answer",
+        ".response",
+        "main",
+        "div[role='main']",
+    ],
+    "chatgpt": [
+        ".markdown",
+        "div[data-message-author-role='assistant']",
+        "div[class*='markdown']",
+        "[data-testid='conversation-turn-2']",
+        "main div:last-child",
+    ],
+}
+
+# Answer containers that also hold the question or the page controls (stop/copy
+# button labels). They are last-resort fallbacks: adaptive ordering never moves
+# them ahead of a specific container and a wait that ends on one of them does
+# not count as a hit
+BROAD_ANSWER_SELECTORS = {"main", "div[role='main']", "main div:last-child", "body",
+                          "[data-testid='conversation-turn-2']"}
+
+def selector_tier(role: str, selector: str) -> int:
+    """Specificity tier of a selector (lower is more specific); order only changes within a tier"""
+    return 1 if role == "answer" and selector in BROAD_ANSWER_SELECTORS else 0
+
+# Citation anchors per site, most specific first
+CITATION_SELECTORS = {
+    "perplexity": [
+        "[data-testid='answer'] a[href]",
+        ".prose a[href]",
+        "main a[href]",
+        "div[role='main'] a[href]",
+    ],
+    # ChatGPT rarely has external links, so we'll look for any meaningful links
+    "chatgpt": [
+        "div[data-message-author-role='assistant'] a[href]",
+        ".markdown a[href]",
+        "main a[href]",
+        "a[href]",
+    ],
+}
+
+# Generation-state controls per site for --completion signals: "busy" elements
+# are shown while an answer is being written (stop button, aria-busy), "done"
+# ones appear once it is finished (copy / regenerate actions)
+GENERATION_SIGNALS = {
+    "perplexity": {
+        "busy": [
+            "button[aria-label*='Stop']",
+            "[data-testid='stop-generating-response-button']",
+            "[aria-busy='true']",
+        ],
+        "done": [
+            "button[aria-label='Copy']",
+            "button[aria-label*='Rewrite']",
+            "[data-testid='copy-button']",
+        ],
+    },
+    "chatgpt": {
+        "busy": [
+            "button[data-testid='stop-button']",
+            "button[aria-label*='Stop']",
+            "[aria-busy='true']",
+        ],
+        "done": [
+            "button[data-testid='copy-turn-action-button']",
+            "button[aria-label='Copy']",
+            "button[data-testid*='regenerate']",
+        ],
+    },
+}
+
+# How an answer can be judged complete from the generation-state controls
+SIGNAL_COMPLETIONS = ("busy_cleared", "done_signal")
+
+# Where the full answer text is read from for text-based citations; the main
+# content area and then the whole body are the last-resort fallbacks
+ANSWER_TEXT_SELECTORS = [
+    "div[data-message-author-role='assistant']",
+    ".markdown",
+    "main div:last-child",
+    "div[class*='markdown']",
+    "div[class*='prose']",
+    "div[class*='text']",
+    "div[class*='content']",
+    "main",
+    "body",
+]
+
+# Internal links that are never citations
+INTERNAL_LINK_DOMAINS = {
+    "perplexity": (),
+    "chatgpt": ("chatgpt.com", "openai.com"),
+}
+
+# Text that marks a container as site navigation rather than an answer
+NAVIGATION_FILTERS = {
+    "perplexity": ['Home', 'Discover', 'Spaces'],
+    "chatgpt": ['ChatGPT', 'New chat', 'Clear conversations'],
+}
+
+# Landing page per site (overridable with --base-url, e.g. for a local test page)
+SITE_URLS = {
+    "perplexity": "https://www.perplexity.ai/",
+    "chatgpt": "https://chat.openai.com/",
+}
+
+# Controls that start a fresh thread without reloading the app
+NEW_THREAD_SELECTORS = {
+    "perplexity": [
+        "button[aria-label*='New Thread']",
+        "a[aria-label*='New Thread']",
+        "button[data-testid='sidebar-new-thread']",
+        "a[href='/']",
+    ],
+    "chatgpt": [
+        "a[data-testid='create-new-chat-button']",
+        "button[aria-label*='New chat']",
+        "a[aria-label*='New chat']",
+        "a[href='/']",
+    ],
+}
+
+# Keep the app loaded between prompts and start new threads in-page
+REUSE_SESSION = False
+
+# Whether someone can log in by hand when a login wall appears (set in main():
+# a visible browser, one Selenium browser or the shared Playwright one, and a
+# terminal on stdin); otherwise the prompt fails with login_required
+INTERACTIVE_LOGIN = True
+
+# URL patterns blocked in --lean mode (CDP wildcards): images, fonts, media
+# and third-party analytics; extend with --block-list
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*segment.io*", "*segment.com*", "*hotjar.com*", "*mixpanel.com*",
+    "*amplitude.com*", "*intercom.io*", "*datadoghq.com*", "*clarity.ms*",
+]
+
+# Stages of a prompt that are timed separately (t_<stage> columns, in seconds)
+STAGES = ["navigate", "page_load", "login", "find_input", "typing", "wait_answer",
+          "completion", "citations", "post_sleep"]
+
+# Output columns, in the order they are written to CSV
+RESULT_FIELDS = ["idx", "prompt", "answer", "citations", "site", "prompt_hash", "meta", "cached",
+                 "round_trips", "nav_mode", "nav_seconds", "answer_timeout", "stable_window", "capture",
+                 "completed_by", "dead_seconds"] + \
+                [f"t_{stage}" for stage in STAGES] + ["t_total"] + \
+                ["page_ready_ms", "bytes_received", "requests", "blocked_requests", "browser_rss_mb"] + \
+                ["attempts", "error_class"]
+
+# Arrow types of the typed output columns (Parquet); anything else is stored as a string
+PARQUET_TYPES = {
+    "idx": "int64", "citations": "list<string>", "cached": "bool", "round_trips": "int32",
+    "nav_seconds": "float64", "answer_timeout": "float64", "stable_window": "int32",
+    "page_ready_ms": "float64", "dead_seconds": "float64", "bytes_received": "int64", "requests": "int32",
+    "blocked_requests": "int32", "browser_rss_mb": "float64", "t_total": "float64", "attempts": "int32",
+    **{f"t_{stage}": "float64" for stage in STAGES},
+}
+
+# Answers starting with these prefixes are re-queued when resuming a run
+RETRY_ANSWER_PREFIXES = ("Error:", "Skipped")
+
+# Failures that a later attempt can't fix (a login needs a human)
+PERMANENT_ERRORS = {"login_required"}
+
+class ScrapeError(Exception):
+    """A prompt failed in a known way; error_class is input_not_found, answer_timeout or login_required"""
+
+    def __init__(self, message: str, error_class: str):
+        super().__init__(message)
+        self.error_class = error_class
+
+def classify_error(error: BaseException) -> str:
+    if isinstance(error, ScrapeError):
+        return error.error_class
+    if is_session_dead(error):
+        return "browser_crash"
+    return "error"
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize prompt text so trivial whitespace/case edits map to the same key"""
+    return " ".join(prompt.split()).casefold()
+
+def prompt_key(site_type: str, prompt: str) -> str:
+    """Stable key for a (site, prompt) pair used to match rows across runs"""
+    data = f"{site_type}\n{normalize_prompt(prompt)}".encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+def prompt_format(path: str) -> str:
+    """Input format from the file extension: csv, jsonl or parquet"""
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+def _iter_prompt_records(path: str, column: Optional[str]) -> Iterator[Tuple[str, Dict]]:
+    """Yield (prompt, metadata) for every record of a prompt file, reading lazily.
+
+    Without a column, CSV files use the first field of each row (no header) and
+    JSONL/Parquet use "prompt". Every other field is returned as metadata.
+    """
+    fmt = prompt_format(path)
+    if fmt == "jsonl":
+        column = column or "prompt"
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    yield str(record.pop(column, "") or ""), record
+                elif isinstance(record, str):
+                    yield record, {}
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Reading Parquet prompts needs pyarrow: pip install pyarrow")
+        column = column or "prompt"
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=1024):
+            for record in batch.to_pylist():
+                yield str(record.pop(column, "") or ""), record
+    elif column:
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                yield (record.pop(column, "") or ""), record
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if row:
+                    yield row[0], {}
+
+class PromptDeduper:
+    """Remembers which prompts were seen as 64-bit hashes of the normalized text"""
+
+    def __init__(self):
+        self._seen = set()
+        self.duplicates = 0
+
+    def add(self, prompt: str) -> bool:
+        """True the first time a prompt (after normalization) is seen"""
+        digest = hashlib.blake2b(normalize_prompt(prompt).encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        if value in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(value)
+        return True
+
+class PromptSource:
+    """Lazy stream of (idx, prompt) from a prompt file, deduplicated on the fly.
+
+    idx is the record's position in the file, so it stays stable across runs
+    (and --resume) whatever was skipped. Per-prompt metadata is kept only until
+    the prompt's row is written (see attach_meta).
+    """
+
+    def __init__(self, path: Optional[str], column: Optional[str] = None, dedupe: bool = True):
+        self.path = path
+        self.column = column
+        self.deduper = PromptDeduper() if dedupe else None
+        self.meta: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        records = ((p, {}) for p in DEFAULT_PROMPTS) if not self.path else \
+            _iter_prompt_records(self.path, self.column)
+        for i, (prompt, meta) in enumerate(records, 1):
+            prompt = prompt.strip()
+            if not prompt:
+                continue
+            if self.deduper is not None and not self.deduper.add(prompt):
+                RUN_STATS.incr("duplicate_prompts")
+                continue
+            if meta:
+                with self._lock:
+                    self.meta[i] = json.dumps(meta, ensure_ascii=False, default=str)
+            yield i, prompt
+
+    def discard(self, idx: int):
+        """Forget the metadata of a prompt that will not get a row"""
+        with self._lock:
+            self.meta.pop(idx, None)
+
+    def attach_meta(self, row: Dict) -> Dict:
+        with self._lock:
+            meta = self.meta.pop(row.get("idx"), None)
+        if meta is not None:
+            row["meta"] = meta
+        return row
+
+def skip_completed(pending: Iterable[Tuple[int, str]], done: set, site_type: str,
+                   source: PromptSource) -> Iterator[Tuple[int, str]]:
+    """Drop prompts that already have a successful row (and their metadata)"""
+    for i, prompt in pending:
+        if prompt_key(site_type, prompt) in done:
+            source.discard(i)
+            continue
+        yield i, prompt
+
+def read_prompts(path: Optional[str], column: Optional[str] = None) -> List[str]:
+    """Read every prompt from a CSV/JSONL/Parquet file (or the defaults) into a list"""
+    return [prompt for _, prompt in PromptSource(path, column, dedupe=False)]
+
+class JobFeed:
+    """Thread-safe feed of (seq, idx, prompt) jobs: the prompt stream first, then deferred retries.
+
+    Every job handed out must be reported back with finish(). A failed prompt
+    that can be retried goes to a retry queue instead of being retried on the
+    spot; it becomes due after an exponential backoff (backoff, 2*backoff, ...
+    capped at max_backoff) and is served once the stream is dry, up to
+    max_attempts attempts in all.
+    """
+
+    def __init__(self, prompts: Iterable[Tuple[int, str]], max_attempts: int = 1,
+                 backoff: float = 30.0, max_backoff: float = 600.0):
+        self._jobs = ((seq, i, prompt) for seq, (i, prompt) in enumerate(prompts, 1))
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._cond = threading.Condition()
+        self._exhausted = False
+        self._retries: List[Tuple[float, int, int, str]] = []
+        self._attempts: Dict[int, int] = {}
+        self._in_flight = 0
+
+    @property
+    def finished(self) -> bool:
+        """True once the stream is dry, no retry is waiting and no job is out"""
+        with self._cond:
+            return self._exhausted and not self._retries and self._in_flight == 0
+
+    def next(self, block: bool = True) -> Optional[Tuple[int, int, str]]:
+        """Next job, or None when finished. With block=False, None also means "nothing due yet"."""
+        with self._cond:
+            while True:
+                if not self._exhausted:
+                    job = next(self._jobs, None)
+                    if job is not None:
+                        self._in_flight += 1
+                        return job
+                    self._exhausted = True
+                now = time.time()
+                if self._retries and self._retries[0][0] <= now:
+                    _, seq, i, prompt = heapq.heappop(self._retries)
+                    self._in_flight += 1
+                    print(f"🔁 Retrying prompt #{i} (attempt {self._attempts[seq] + 1}/{self.max_attempts})")
+                    return seq, i, prompt
+                if not block or (not self._retries and self._in_flight == 0):
+                    return None
+                # Wake up when the next retry is due or another attempt finishes
+                self._cond.wait(self._retries[0][0] - now if self._retries else None)
+
+    def finish(self, seq: int, row: Dict) -> bool:
+        """Report a job's row; True if it is final, False if the prompt was queued for another attempt"""
+        with self._cond:
+            self._in_flight -= 1
+            attempts = self._attempts.pop(seq, 0) + 1
+            row["attempts"] = attempts
+            final = (is_completed_row(row) or attempts >= self.max_attempts
+                     or row.get("error_class") in PERMANENT_ERRORS)
+            if not final:
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+                self._attempts[seq] = attempts
+                heapq.heappush(self._retries, (time.time() + delay, seq, row["idx"], row["prompt"]))
+                print(f"↪️  Prompt #{row['idx']} failed ({row.get('error_class') or 'error'}); "
+                      f"retrying in {delay:.0f}s, after the main pass")
+                RUN_STATS.incr("deferred_attempts")
+            elif not is_completed_row(row):
+                RUN_STATS.incr(f"failed_{row.get('error_class') or 'error'}")
+            self._cond.notify_all()
+            return final
+
+    def remaining(self) -> Iterator[Tuple[int, int, str]]:
+        """Everything not yet handed out, retries included, ignoring their backoff"""
+        with self._cond:
+            jobs = list(self._jobs) + [(seq, i, prompt) for _, seq, i, prompt in sorted(self._retries)]
+            self._retries = []
+            self._exhausted = True
+        return iter(jobs)
+
+def abandoned_rows(feed: JobFeed, reason: str, site_type: str) -> Iterator[Tuple[int, Dict]]:
+    """(seq, error row) for everything the feed still holds, deferred retries included,
+    once no browser is left to run it"""
+    error = ScrapeError(reason, "browser_crash")
+    for seq, i, prompt in feed.remaining():
+        RUN_STATS.incr("failed_browser_crash")
+        yield seq, error_row(i, prompt, error, site_type)
+
+def make_row(idx: int, prompt: str, answer: str, citations: List[str],
+             site_type: str = "perplexity") -> Dict:
+    """Build one output row"""
+    return {
+        "idx": idx,
+        "prompt": prompt,
+        "answer": answer,
+        "citations": list(citations),
+        "site": site_type,
+        "prompt_hash": prompt_key(site_type, prompt),
+        "cached": 0,
+    }
+
+def error_row(idx: int, prompt: str, error: BaseException, site_type: str = "perplexity",
+              prefix: str = "Error") -> Dict:
+    """Output row for a failed prompt, with the failure classified"""
+    row = make_row(idx, prompt, f"{prefix}: {error}", [], site_type)
+    row["error_class"] = classify_error(error)
+    return row
+
+def is_completed_row(row: Dict) -> bool:
+    """True if the row holds a real answer (not an error or skipped placeholder)"""
+    answer = (row.get("answer") or "").strip()
+    return bool(answer) and not answer.startswith(RETRY_ANSWER_PREFIXES)
+
+def _iter_parquet_rows(path: str):
+    import pyarrow.parquet as pq
+    try:
+        parquet = pq.ParquetFile(path)
+    except Exception as e:
+        print(f"⚠️  Cannot read {path}: {e}")
+        return
+    columns = [c for c in ("prompt", "answer", "site", "prompt_hash") if c in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(columns=columns):
+        yield from batch.to_pylist()
+
+def _iter_existing_rows(path: str):
+    """Stream rows back from an existing CSV, JSONL or Parquet output"""
+    if os.path.isdir(path):
+        # Parquet dataset: one finished part per run (in-progress "_part-" files
+        # of a crashed run have no footer and are skipped)
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".parquet") and not name.startswith(("_", ".")):
+                yield from _iter_parquet_rows(os.path.join(path, name))
+    elif path.endswith(".parquet"):
+        yield from _iter_parquet_rows(path)
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written last line after a crash
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+def load_completed_keys(paths: List[str], site_type: str) -> set:
+    """Collect prompt keys that already have a successful row in the given outputs"""
+    # Long answers can exceed the csv module's default 128KB field limit
+    csv.field_size_limit(sys.maxsize)
+    
+    done = set()
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        count = 0
+        for row in _iter_existing_rows(path):
+            if not is_completed_row(row):
                 continue
-            p = row[0].strip()
-            if p:
-                prompts.append(p)
-    return prompts
+            key = row.get("prompt_hash")
+            if not key:
+                # Outputs written before prompt_hash existed
+                key = prompt_key(row.get("site") or site_type, row.get("prompt") or "")
+            done.add(key)
+            count += 1
+        print(f"♻️  Found {count} completed rows in {path}")
+    return done
+
+class RunStats:
+    """Per-prompt measurements and counters collected over a run (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.values: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+        self.timelines: Dict[str, List[Dict]] = {}
+
+    def observe(self, name: str, value: Optional[float]):
+        if value is None:
+            return
+        with self._lock:
+            self.values.setdefault(name, []).append(float(value))
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def sample(self, name: str, **fields):
+        """Append a timestamped point (seconds since the run started) to a timeline"""
+        point = {"t": round(time.time() - self.started, 1), **fields}
+        with self._lock:
+            self.timelines.setdefault(name, []).append(point)
+
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        """Nearest-rank percentile of an observed series"""
+        with self._lock:
+            values = sorted(self.values.get(name, []))
+        if not values:
+            return None
+        rank = max(1, math.ceil(pct / 100.0 * len(values)))
+        return values[min(rank, len(values)) - 1]
+
+    def print_summary(self):
+        if not self.values and not self.counts:
+            return
+        print(f"\n{'='*60}")
+        print("📊 Run summary")
+        print(f"{'='*60}")
+        for name in sorted(self.values):
+            values = self.values[name]
+            print(f"  {name}: p50 {self.percentile(name, 50):.2f}, p95 {self.percentile(name, 95):.2f}, "
+                  f"max {max(values):.2f} (n={len(values)})")
+        for name in sorted(self.counts):
+            print(f"  {name}: {self.counts[name]}")
+
+    def report(self) -> Dict:
+        """Summary of the run so far: per-series percentiles plus counters and throughput"""
+        wall = time.time() - self.started
+        with self._lock:
+            names = sorted(self.values)
+            counts = dict(self.counts)
+            timelines = {name: list(points) for name, points in self.timelines.items()}
+        series = {}
+        for name in names:
+            with self._lock:
+                values = list(self.values[name])
+            series[name] = {
+                "count": len(values),
+                "sum": round(sum(values), 3),
+                "p50": self.percentile(name, 50),
+                "p95": self.percentile(name, 95),
+                "max": max(values),
+            }
+        prompts = counts.get("prompts", 0)
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "wall_seconds": round(wall, 3),
+            "prompts_per_minute": round(prompts / wall * 60, 3) if wall > 0 else 0.0,
+            "counters": counts,
+            "series": series,
+            "timelines": timelines,
+        }
+
+    def write_json(self, path: str, **extra):
+        report = self.report()
+        report.update(extra)
+        _atomic_write(path, json.dumps(report, indent=2) + "\n")
+
+    def write_prometheus(self, path: str, site: str):
+        """Write the report in Prometheus text format (for the node exporter textfile collector)"""
+        report = self.report()
+        label = f'site="{site}"'
+        lines = [
+            "# HELP scraper_wall_seconds Wall time of the run so far.",
+            "# TYPE scraper_wall_seconds gauge",
+            f"scraper_wall_seconds{{{label}}} {report['wall_seconds']}",
+            "# HELP scraper_prompts_per_minute Prompt throughput of the run.",
+            "# TYPE scraper_prompts_per_minute gauge",
+            f"scraper_prompts_per_minute{{{label}}} {report['prompts_per_minute']}",
+        ]
+        if report["counters"]:
+            lines += ["# HELP scraper_events_total Counters collected during the run.",
+                      "# TYPE scraper_events_total counter"]
+            for name, value in sorted(report["counters"].items()):
+                lines.append(f'scraper_events_total{{{label},event="{name}"}} {value}')
+        stages = {name: s for name, s in report["series"].items() if name.startswith("t_")}
+        if stages:
+            lines += ["# HELP scraper_stage_seconds Time spent per prompt in each stage.",
+                      "# TYPE scraper_stage_seconds summary"]
+            for name, s in stages.items():
+                stage = f'{label},stage="{name[2:]}"'
+                lines.append(f'scraper_stage_seconds{{{stage},quantile="0.5"}} {s["p50"]}')
+                lines.append(f'scraper_stage_seconds{{{stage},quantile="0.95"}} {s["p95"]}')
+                lines.append(f'scraper_stage_seconds{{{stage},quantile="1"}} {s["max"]}')
+                lines.append(f"scraper_stage_seconds_sum{{{stage}}} {s['sum']}")
+                lines.append(f"scraper_stage_seconds_count{{{stage}}} {s['count']}")
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+RUN_STATS = RunStats()
+
+@contextmanager
+def timed_stage(metrics: Optional[Dict], stage: str):
+    """Add the time spent in the block to metrics["t_<stage>"] (no-op without metrics)"""
+    started = time.time()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            key = f"t_{stage}"
+            metrics[key] = round(metrics.get(key, 0.0) + time.time() - started, 3)
+
+def _atomic_write(path: str, text: str):
+    """Replace path with text so readers never see a half-written file"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write_run_reports(args):
+    if WEBDRIVER_PROFILER is not None:
+        WEBDRIVER_PROFILER.print_summary()
+        WEBDRIVER_PROFILER.save()
+        print(f"🔬 Wrote WebDriver command profile to {WEBDRIVER_PROFILER.path}")
+    if getattr(args, "report_json", None):
+        RUN_STATS.write_json(args.report_json, site=args.site)
+        print(f"📈 Wrote run report to {args.report_json}")
+    if getattr(args, "report_prom", None):
+        RUN_STATS.write_prometheus(args.report_prom, args.site)
+        print(f"📈 Wrote Prometheus metrics to {args.report_prom}")
+
+class ResultSink:
+    """Base class for outputs that append and flush one row at a time.
+
+    fsync_interval controls durability vs. I/O cost:
+        None -> flush to the OS after every row, never fsync
+        0    -> fsync after every row
+        N    -> fsync at most once every N seconds (and on close)
+    """
+
+    def __init__(self, path: str, fsync_interval: Optional[float] = None, append: bool = False):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self._last_fsync = time.time()
+        needs_newline = False
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        if needs_newline:
+            # Terminate a row that was cut off by a crash before appending more
+            self._file.write("\n")
+
+    def _write_row(self, row: Dict):
+        raise NotImplementedError
+
+    def write(self, row: Dict):
+        self._write_row(row)
+        self.rows_written += 1
+        self._file.flush()
+        if self.fsync_interval is not None:
+            now = time.time()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync_interval is not None:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+class CsvSink(ResultSink):
+    """Stream rows to a CSV file with a fixed header"""
+
+    def __init__(self, path: str, fsync_interval: Optional[float] = None, append: bool = False):
+        fieldnames = RESULT_FIELDS
+        has_header = False
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            # Keep appending in the column layout the file already has
+            with open(path, newline="", encoding="utf-8") as f:
+                header = next(csv.reader(f), None)
+            if header:
+                fieldnames = header
+                has_header = True
+        super().__init__(path, fsync_interval, append)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames,
+                                      extrasaction="ignore", lineterminator="\n")
+        if not has_header:
+            self._writer.writeheader()
+
+    def _write_row(self, row: Dict):
+        self._writer.writerow(flatten_citations(row))
+
+class JsonlSink(ResultSink):
+    """Stream rows to a JSONL file, one object per line"""
+
+    def _write_row(self, row: Dict):
+        self._file.write(json.dumps(flatten_citations(row), ensure_ascii=False) + "\n")
+
+def flatten_citations(row: Dict) -> Dict:
+    """Row with its citation list joined into one "; "-separated string (CSV/JSONL layout)"""
+    citations = row.get("citations")
+    if isinstance(citations, list):
+        row = dict(row, citations="; ".join(citations))
+    return row
+
+def citation_list(row: Dict) -> List[str]:
+    """Citations of a row as a list, whether it holds a list or a joined string"""
+    citations = row.get("citations") or []
+    if isinstance(citations, str):
+        citations = [c for c in citations.split("; ") if c]
+    return list(citations)
+
+def row_status(row: Dict) -> str:
+    """ok / cached / skipped / error, derived from the answer"""
+    answer = (row.get("answer") or "").strip()
+    if answer.startswith("Skipped"):
+        return "skipped"
+    if not is_completed_row(row):
+        return "error"
+    return "cached" if row.get("cached") else "ok"
+
+class ParquetSink:
+    """Stream rows to a Parquet dataset directory in row groups of row_group_size rows.
+
+    Citations are a list<string> column and timings/counters are typed (see
+    PARQUET_TYPES), so readers can prune columns instead of re-parsing text.
+    Each run writes its own part file, named with a leading underscore (which
+    Parquet readers skip) until it is closed and renamed to part-*.parquet, so
+    a crash never touches earlier runs' rows. Without append, earlier parts
+    are removed, like the CSV is truncated.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 500, append: bool = False):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self.path = path
+        self.row_group_size = max(1, row_group_size)
+        self.rows_written = 0
+        self._rows: List[Dict] = []
+
+        fields = [pa.field("status", pa.string())]
+        for name in RESULT_FIELDS:
+            kind = PARQUET_TYPES.get(name, "string")
+            arrow_type = pa.list_(pa.string()) if kind == "list<string>" else pa.type_for_alias(kind)
+            fields.append(pa.field(name, arrow_type))
+        self.schema = pa.schema(fields)
+
+        self._prepare_dataset(append)
+        # Random suffix: two runs in the same second and process must not share a part
+        name = f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{os.urandom(4).hex()}.parquet"
+        self.part_path = os.path.join(path, name)
+        self._in_progress = os.path.join(path, f"_{name}")
+        self._writer = pq.ParquetWriter(self._in_progress, self.schema, compression="zstd")
+
+    def _prepare_dataset(self, append: bool):
+        if os.path.isfile(self.path):
+            # Single-file output from an older version: keep it as the first part
+            legacy = f"{self.path}.legacy"
+            os.replace(self.path, legacy)
+            os.makedirs(self.path)
+            if append:
+                os.replace(legacy, os.path.join(self.path, "part-00000000-000000-legacy.parquet"))
+            else:
+                os.remove(legacy)
+        os.makedirs(self.path, exist_ok=True)
+        if not append:
+            for name in os.listdir(self.path):
+                if name.endswith(".parquet") and name.lstrip("_").startswith("part-"):
+                    os.remove(os.path.join(self.path, name))
+
+    def _value(self, name: str, value):
+        if value is None or value == "":
+            return None
+        kind = PARQUET_TYPES.get(name, "string")
+        try:
+            if kind.startswith("int"):
+                return int(value)
+            if kind == "float64":
+                return float(value)
+            if kind == "bool":
+                return bool(int(value))
+        except (TypeError, ValueError):
+            return None
+        return value if isinstance(value, str) else str(value)
+
+    def write(self, row: Dict):
+        record = {"status": row_status(row), "citations": citation_list(row)}
+        for name in RESULT_FIELDS:
+            if name != "citations":
+                record[name] = self._value(name, row.get(name))
+        self._rows.append(record)
+        self.rows_written += 1
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+        if self.rows_written:
+            os.replace(self._in_progress, self.part_path)
+        else:
+            os.remove(self._in_progress)
+
+class MultiSink:
+    """Fan each row out to several sinks"""
+
+    def __init__(self, sinks: List[ResultSink]):
+        self.sinks = sinks
+        self.decorate = None  # Optional hook applied to each row before it is written
+        # Cached rows are written by whichever thread pulls the prompt, scraped
+        # ones by the result writer; the file sinks themselves are not thread-safe
+        self._lock = threading.Lock()
+
+    @property
+    def rows_written(self) -> int:
+        return self.sinks[0].rows_written if self.sinks else 0
+
+    def write(self, row: Dict):
+        if self.decorate is not None:
+            row = self.decorate(row)
+        with self._lock:
+            for sink in self.sinks:
+                sink.write(row)
+
+    def close(self):
+        with self._lock:
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    print(f"⚠️  Error closing {sink.path}: {e}")
+
+class AnswerCache:
+    """Persistent answer cache keyed by prompt_key (site + normalized prompt).
+
+    Entries older than ttl_seconds are treated as missing; beyond max_entries
+    the least recently used entries are evicted. Safe to share between workers.
+    Hits only note their access time in memory; it is written in batches of
+    touch_batch (or every touch_seconds), before evictions and on close().
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int = 10000,
+                 touch_batch: int = 100, touch_seconds: float = 5.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.touch_seconds = touch_seconds
+        self._touched: Dict[str, float] = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, site TEXT, prompt TEXT, answer TEXT, citations TEXT,"
+            " captured_at REAL, last_used REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    def get(self, site_type: str, prompt: str) -> Optional[Dict]:
+        key = prompt_key(site_type, prompt)
+        now = time.time()
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT answer, citations, captured_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if found is None:
+                return None
+            answer, citations, captured_at = found
+            if now - captured_at > self.ttl_seconds:
+                self._touched.pop(key, None)
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch or now - self._last_flush >= self.touch_seconds:
+                self._flush_touches()
+                self._conn.commit()
+        return {"answer": answer, "citations": json.loads(citations), "captured_at": captured_at}
+
+    def put(self, site_type: str, prompt: str, answer: str, citations: List[str]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (prompt_key(site_type, prompt), site_type, prompt, answer, json.dumps(citations), now, now))
+            # Size bound: drop the least recently used entries
+            self._flush_touches()
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC"
+                " LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._conn.commit()
+
+    def _flush_touches(self):
+        """Write the pending access times (caller holds the lock and commits)"""
+        if self._touched:
+            self._conn.executemany("UPDATE answers SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+
+class CacheSink:
+    """Stores every freshly scraped successful row in the answer cache"""
+
+    def __init__(self, cache: AnswerCache):
+        self.cache = cache
+        self.path = cache.path
+        self.rows_written = 0
+
+    def write(self, row: Dict):
+        if row.get("cached") or not is_completed_row(row):
+            return
+        self.cache.put(row["site"], row["prompt"], row["answer"], citation_list(row))
+        self.rows_written += 1
+
+    def close(self):
+        self.cache.close()
+
+def serve_cached(prompts: Iterable[Tuple[int, str]], sink, site_type: str,
+                 refresh: bool = False) -> Iterator[Tuple[int, str]]:
+    """Write cache hits straight to the sink and pass the misses on"""
+    for i, prompt in prompts:
+        entry = None if refresh else ANSWER_CACHE.get(site_type, prompt)
+        if entry is None:
+            RUN_STATS.incr("cache_misses")
+            yield i, prompt
+            continue
+        sink.write(cached_row(i, prompt, site_type, entry))
+        RUN_STATS.incr("cache_hits")
+
+def cached_row(i: int, prompt: str, site_type: str, entry: Dict) -> Dict:
+    """Output row for a prompt served from the answer cache"""
+    row = make_row(i, prompt, entry["answer"], entry["citations"], site_type)
+    row["cached"] = 1
+    return row
+
+def open_result_sinks(args) -> MultiSink:
+    """Open the CSV (and optional JSONL/Parquet) outputs for incremental writing"""
+    append = bool(getattr(args, "resume", False))
+    sinks: List[ResultSink] = [CsvSink(args.out_csv, args.fsync_interval, append)]
+    if args.out_jsonl:
+        sinks.append(JsonlSink(args.out_jsonl, args.fsync_interval, append))
+    if getattr(args, "out_parquet", None):
+        sinks.append(ParquetSink(args.out_parquet, args.parquet_row_group, append))
+    if getattr(args, "out_db", None):
+        sinks.append(ResultsSink(args.out_db, args.site, args.prompts_csv, vars(args), status=row_status))
+    if ANSWER_CACHE is not None:
+        sinks.append(CacheSink(ANSWER_CACHE))
+    return MultiSink(sinks)
 
 def human_like_typing(driver, element, text):
     """Type text like a human with random delays"""
@@ -61,8 +1081,19 @@ def human_like_typing(driver, element, text):
     
     time.sleep(random.uniform(0.3, 0.6))
 
+def is_login_wall(title: str, url: str = "") -> bool:
+    """True if the page title or URL is a login / sign-in page"""
+    title, path = title.lower(), urlparse(url or "").path.lower()
+    return ("login" in title or "sign in" in title or "log in" in title
+            or any(part in path for part in ("/login", "/log-in", "/signin", "/sign-in", "/auth/")))
+
 def wait_for_manual_login(driver) -> bool:
-    """Wait for user to manually log in"""
+    """Wait for user to manually log in; False if nobody can (headless, parallel or no terminal)"""
+    if not INTERACTIVE_LOGIN:
+        print("🔐 Login required, but this run cannot wait for a manual login "
+              "(log in once in a visible single-browser run with --profile-dir DIR, "
+              "then reuse DIR; --workers copy it into DIR/worker-N)")
+        return False
     print("\n" + "="*80)
     print("🔐 LOGIN REQUIRED!")
     print("="*80)
@@ -76,139 +1107,737 @@ def wait_for_manual_login(driver) -> bool:
     print("✅ Login completed! Continuing with scraping...")
     return True
 
-def get_input_element(driver, site_type="perplexity"):
-    """Find the input field based on site type"""
-    if site_type == "perplexity":
-        selectors = [
-            "textarea[placeholder*='Ask anything']",
-            "textarea[placeholder*='Ask']",
-            "textarea[placeholder*='question']",
-            "textarea",
-            "div[contenteditable='true']",
-            "div[role='textbox']",
-        ]
-    else:  # chatgpt
-        selectors = [
-            "textarea[placeholder*='Message ChatGPT']",
-            "textarea[placeholder*='Send a message']",
-            "textarea[placeholder*='Message']",
-            "textarea",
-            "div[contenteditable='true']",
-        ]
-    
-    print(f"🔍 Looking for input field...")
+# Evaluates every selector in one round trip and returns the matching
+# candidates (visibility, text length, text and/or element handles)
+PROBE_SELECTORS_JS = """
+const selectors = arguments[0], opts = arguments[1] || {};
+const minLength = opts.minLength || 0, filters = opts.filters || [];
+const out = [];
+for (const sel of selectors) {
+    let nodes;
+    try { nodes = document.querySelectorAll(sel); } catch (e) { continue; }
+    for (let i = 0; i < nodes.length; i++) {
+        const el = nodes[i];
+        const style = window.getComputedStyle(el);
+        const visible = !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+            && style.visibility !== 'hidden' && style.display !== 'none';
+        const item = {selector: sel, index: i, visible: visible};
+        if (opts.withText) {
+            // WebElement.text is empty for hidden elements; mirror that
+            const text = visible ? (el.innerText || '').trim() : '';
+            if (text.length <= minLength || filters.some(f => text.startsWith(f))) continue;
+            item.length = text.length;
+            item.text = text;
+        }
+        if (opts.withElements) {
+            item.element = el;
+            item.placeholder = el.getAttribute('placeholder');
+        }
+        out.push(item);
+        if (opts.firstVisible && visible) return out;
+        if (opts.firstMatch) return out;
+    }
+}
+return out;
+"""
+
+# One poll for --completion signals: the PROBE_SELECTORS_JS candidates plus the
+# first visible busy control and the first visible done control that belongs to
+# the chosen (first) candidate, i.e. sits inside or after it, so a copy button
+# left over from an earlier answer does not count. No extra round trip.
+ANSWER_STATE_JS = """
+const probe = function () {
+""" + PROBE_SELECTORS_JS + """
+};
+const signals = arguments[2] || {};
+const candidates = probe(arguments[0], arguments[1]);
+let chosen = null;
+if (candidates.length) {
+    try { chosen = document.querySelectorAll(candidates[0].selector)[candidates[0].index] || null; } catch (e) {}
+}
+function firstVisible(list, afterChosen) {
+    for (const sel of list || []) {
+        let nodes;
+        try { nodes = document.querySelectorAll(sel); } catch (e) { continue; }
+        for (const el of nodes) {
+            if (!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)) continue;
+            if (afterChosen && chosen && !chosen.contains(el)
+                && !(chosen.compareDocumentPosition(el) & Node.DOCUMENT_POSITION_FOLLOWING)) continue;
+            return sel;
+        }
+    }
+    return null;
+}
+return {candidates: candidates, busy: firstVisible(signals.busy, false),
+        done: firstVisible(signals.done, true)};
+"""
+
+class CommandProfiler:
+    """Counts and times WebDriver commands by calling scraper function.
+
+    Commands are attributed to the innermost function in this file on the call
+    stack (e.g. find_candidates, get_input_element), collected per prompt and
+    rolled up per run. Each driver keeps its own per-prompt tally, so several
+    workers can share one profiler.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.run: Dict[str, Dict[str, List[float]]] = {}
+        self.prompts: List[Dict] = []
+
+    @staticmethod
+    def _add(table: Dict, caller: str, command: str, count: int, seconds: float):
+        entry = table.setdefault(caller, {}).setdefault(command, [0, 0.0])
+        entry[0] += count
+        entry[1] += seconds
+
+    def record(self, driver, command: str, seconds: float):
+        caller = _scraper_caller(sys._getframe(2))
+        current = getattr(driver, "command_profile", None)
+        if current is not None:
+            self._add(current, caller, command, 1, seconds)
+            return
+        # Commands outside a prompt (startup, shutdown) only count towards the run
+        with self._lock:
+            self._add(self.run, caller, command, 1, seconds)
+
+    def begin_prompt(self, driver):
+        driver.command_profile = {}
+
+    def end_prompt(self, driver, idx: int) -> Dict:
+        """Close the driver's current prompt tally and fold it into the run"""
+        table = getattr(driver, "command_profile", None) or {}
+        driver.command_profile = None
+        summary = {"idx": idx, **self._summarize(table)}
+        with self._lock:
+            for caller, commands in table.items():
+                for command, (count, seconds) in commands.items():
+                    self._add(self.run, caller, command, count, seconds)
+            self.prompts.append(summary)
+        return summary
+
+    @staticmethod
+    def _summarize(table: Dict) -> Dict:
+        by_caller = {}
+        by_command: Dict[str, List[float]] = {}
+        total_count, total_seconds = 0, 0.0
+        for caller, commands in table.items():
+            count = sum(c for c, _ in commands.values())
+            seconds = sum(t for _, t in commands.values())
+            by_caller[caller] = {"commands": count, "seconds": round(seconds, 4)}
+            total_count += count
+            total_seconds += seconds
+            for command, (c, t) in commands.items():
+                entry = by_command.setdefault(command, [0, 0.0])
+                entry[0] += c
+                entry[1] += t
+        return {
+            "commands": total_count,
+            "seconds": round(total_seconds, 4),
+            "by_caller": dict(sorted(by_caller.items(), key=lambda kv: -kv[1]["commands"])),
+            "by_command": {cmd: {"commands": c, "seconds": round(t, 4)}
+                           for cmd, (c, t) in sorted(by_command.items(), key=lambda kv: -kv[1][0])},
+        }
+
+    def report(self) -> Dict:
+        with self._lock:
+            run = {caller: {cmd: list(v) for cmd, v in commands.items()}
+                   for caller, commands in self.run.items()}
+            prompts = sorted(self.prompts, key=lambda p: p["idx"])
+        summary = self._summarize(run)
+        summary["prompts"] = len(prompts)
+        if prompts:
+            summary["commands_per_prompt"] = round(sum(p["commands"] for p in prompts) / len(prompts), 1)
+        return {"run": summary, "per_prompt": prompts}
+
+    def save(self):
+        _atomic_write(self.path, json.dumps(self.report(), indent=2) + "\n")
+
+    def print_summary(self, top: int = 10):
+        run = self.report()["run"]
+        if not run["commands"]:
+            return
+        print(f"\n🔬 WebDriver commands by caller ({run['commands']} commands, {run['seconds']:.1f}s)")
+        for caller, entry in list(run["by_caller"].items())[:top]:
+            print(f"  {caller}: {entry['commands']} commands, {entry['seconds']:.2f}s")
+
+def _scraper_caller(frame) -> str:
+    """Name of the innermost function from this file on the stack"""
+    while frame is not None:
+        if frame.f_code.co_filename == __file__:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "<unknown>"
+
+def install_round_trip_counter(driver):
+    """Count every command the driver sends to chromedriver (driver.round_trips).
+
+    With WEBDRIVER_PROFILER set, each command is also timed and attributed to
+    its calling function.
+    """
+    original_execute = driver.execute
+    driver.round_trips = 0
+    driver.command_profile = None
+    
+    def execute(driver_command, params=None):
+        driver.round_trips += 1
+        if WEBDRIVER_PROFILER is None:
+            return original_execute(driver_command, params)
+        started = time.perf_counter()
+        try:
+            return original_execute(driver_command, params)
+        finally:
+            WEBDRIVER_PROFILER.record(driver, driver_command, time.perf_counter() - started)
     
-    for i, sel in enumerate(selectors):
+    # WebElement calls go through the parent driver's execute too
+    driver.execute = execute
+    return driver
+
+def _find_candidates_legacy(driver, selectors, min_length, filters, with_text,
+                            with_elements, first_visible, first_match) -> List[Dict]:
+    """Per-element WebDriver calls; same result shape as the batched probe"""
+    out = []
+    for sel in selectors:
         try:
             elements = driver.find_elements(By.CSS_SELECTOR, sel)
-            print(f"🔍 Selector '{sel}' found {len(elements)} elements")
-            
-            for j, element in enumerate(elements):
-                try:
-                    if element.is_displayed():
-                        placeholder = element.get_attribute("placeholder") or "no placeholder"
-                        print(f"✅ Found input: '{sel}' (placeholder: '{placeholder}') - element {j+1}")
-                        return element
-                    else:
-                        print(f"⚠️  Element '{sel}' {j+1} is not displayed")
-                except Exception as e:
-                    print(f"⚠️  Error checking element '{sel}' {j+1}: {e}")
-                    continue
         except Exception as e:
             print(f"⚠️  Error with selector '{sel}': {e}")
             continue
-    
-    return None
-
-def wait_for_answer(driver, site_type="perplexity") -> Optional[str]:
-    """Wait for answer to appear and complete with optimized detection"""
-    if site_type == "perplexity":
-        selectors = [
-            "[data-testid='answer']",
-            "[data-testid='response']",
-            ".prose",
-            ".markdown",
-            ".answer",
-            ".response",
-            "main",
-            "div[role='main']",
-        ]
-        # Perplexity-specific filters
-        navigation_filters = ['Home', 'Discover', 'Spaces']
-    else:  # chatgpt
-        selectors = [
-            "[data-testid='conversation-turn-2']",
-            ".markdown",
-            "div[data-message-author-role='assistant']",
-            "main div:last-child",
-            "div[class*='markdown']",
-        ]
-        # ChatGPT-specific filters
-        navigation_filters = ['ChatGPT', 'New chat', 'Clear conversations']
-    
-    print(f"🔍 Looking for answer...")
-    print(f"⏰ Will wait up to {ANSWER_WAIT_SECONDS} seconds...")
-    
-    start_time = time.time()
-    answer_text = None
-    answer_length = 0
-    stable_count = 0
-    
-    while time.time() - start_time < ANSWER_WAIT_SECONDS:
-        for sel in selectors:
+        for j, elem in enumerate(elements):
             try:
-                elements = driver.find_elements(By.CSS_SELECTOR, sel)
-                for elem in elements:
-                    try:
-                        text = elem.text.strip()
-                        # Look for substantial content that's not navigation
-                        if (len(text) > 150 and 
-                            not any(text.startswith(filter_text) for filter_text in navigation_filters)):
-                            
-                            # Check if answer is still growing
-                            if answer_text is None:
-                                answer_text = text
-                                answer_length = len(text)
-                                print(f"✅ Found initial answer: {len(text)} chars")
-                            elif len(text) > answer_length:
-                                # Answer is still growing
-                                answer_text = text
-                                answer_length = len(text)
-                                stable_count = 0
-                                print(f"📈 Answer growing: {len(text)} chars")
-                            elif len(text) == answer_length:
-                                # Answer length is stable
-                                stable_count += 1
-                                if stable_count >= 8:  # Wait 8 seconds of stable length for Perplexity
-                                    print(f"✅ Answer stable for 8s: {len(text)} chars")
-                                    
-                                    # For ChatGPT, try to get the full answer via copy button
-                                    if site_type == "chatgpt":
-                                        full_answer = try_get_full_answer_via_copy(driver)
-                                        if full_answer and len(full_answer) > len(text):
-                                            print(f"📋 Got full answer via copy button: {len(full_answer)} chars")
-                                            return full_answer
-                                    
-                                    return text
-                            else:
-                                # Answer length decreased (unusual), reset
-                                answer_text = text
-                                answer_length = len(text)
-                                stable_count = 0
-                                print(f"⚠️  Answer length changed: {len(text)} chars")
-                    except:
+                item = {"selector": sel, "index": j}
+                if with_text:
+                    text = elem.text.strip()
+                    if len(text) <= min_length or any(text.startswith(f) for f in filters):
                         continue
-            except:
+                    item.update(visible=True, length=len(text), text=text)
+                if with_elements:
+                    item["visible"] = elem.is_displayed()
+                    item["element"] = elem
+                    item["placeholder"] = elem.get_attribute("placeholder") if item["visible"] else None
+                out.append(item)
+                if (first_visible and item.get("visible")) or first_match:
+                    return out
+            except Exception:
                 continue
+    return out
+
+def _probe_options(min_length: int = 0, filters=(), with_text: bool = True, with_elements: bool = False,
+                   first_visible: bool = False, first_match: bool = False) -> Dict:
+    return {
+        "minLength": min_length,
+        "filters": list(filters),
+        "withText": with_text,
+        "withElements": with_elements,
+        "firstVisible": first_visible,
+        "firstMatch": first_match,
+    }
+
+def find_candidates(driver, selectors: List[str], min_length: int = 0, filters=(),
+                    with_text: bool = True, with_elements: bool = False,
+                    first_visible: bool = False, first_match: bool = False) -> List[Dict]:
+    """Probe a selector list and return matching candidates in selector order.
+
+    Each candidate is a dict with selector, index, visible and, depending on the
+    flags, length/text (text longer than min_length and not starting with any of
+    filters) and element/placeholder. In batched mode this is one execute_script
+    call; otherwise (or if the script fails) it falls back to per-element calls.
+    """
+    if PROBE_MODE == "batched":
+        opts = _probe_options(min_length, filters, with_text, with_elements, first_visible, first_match)
+        try:
+            result = driver.execute_script(PROBE_SELECTORS_JS, selectors, opts)
+            if isinstance(result, list):
+                return result
+        except Exception as e:
+            print(f"⚠️  Batched probe failed, using per-element lookups: {e}")
+    return _find_candidates_legacy(driver, selectors, min_length, filters, with_text,
+                                   with_elements, first_visible, first_match)
+
+def load_json_state(path: Optional[str], label: str) -> Dict:
+    """Load a small JSON state file; missing or unreadable files start empty"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Ignoring unreadable {label} {path}: {e}")
+        return {}
+
+def save_json_state(path: Optional[str], data: Dict, label: str) -> bool:
+    """Atomically replace a JSON state file"""
+    if not path:
+        return False
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"⚠️  Could not save {label}: {e}")
+        return False
+
+class SelectorStats:
+    """Per-site record of which selectors actually matched, persisted as JSON.
+
+    Each hit adds 1 to the winning selector after multiplying every score for
+    that site/role by `decay`, so scores track recent hit rate and the order
+    recovers within a handful of prompts when a site's markup changes. Scores
+    only reorder selectors within a specificity tier (see selector_tier), so
+    broad answer containers such as `main` always stay behind specific ones.
+    """
+
+    def __init__(self, path: str, decay: float = 0.9, save_every: int = 20):
+        self.path = path
+        self.decay = decay
+        self.save_every = save_every
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict[str, Dict[str, float]]] = load_json_state(path, "selector stats")
+
+    def order(self, site_type: str, role: str, selectors: List[str]) -> List[str]:
+        """Selectors sorted by specificity tier, then score, best first; ties keep the given order"""
+        with self._lock:
+            scores = self.data.get(site_type, {}).get(role, {})
+            return sorted(selectors, key=lambda sel: (selector_tier(role, sel), -scores.get(sel, 0.0)))
+
+    def record(self, site_type: str, role: str, selector: str):
+        with self._lock:
+            scores = self.data.setdefault(site_type, {}).setdefault(role, {})
+            for sel in list(scores):
+                scores[sel] *= self.decay
+                if scores[sel] < 0.01:
+                    del scores[sel]
+            scores[selector] = scores.get(selector, 0.0) + 1.0
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            if self._unsaved and save_json_state(self.path, self.data, "selector stats"):
+                self._unsaved = 0
+
+class LatencyModel:
+    """Observed answer latencies per site, persisted as JSON and used to size waits.
+
+    Series (seconds, most recent max_samples kept per site):
+        first_text  submit -> first answer text seen
+        completion  submit -> answer captured (timeouts count as the timeout)
+        gap         longest pause between growth steps while an answer streamed
+    """
+
+    def __init__(self, path: str, margin: float = 1.5, min_samples: int = 20,
+                 max_samples: int = 500):
+        self.path = path
+        self.margin = margin
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.data: Dict[str, Dict[str, List[float]]] = load_json_state(path, "latency model")
+
+    def record(self, site_type: str, series: str, seconds: Optional[float]):
+        if seconds is None:
+            return
+        with self._lock:
+            samples = self.data.setdefault(site_type, {}).setdefault(series, [])
+            samples.append(round(float(seconds), 2))
+            del samples[:-self.max_samples]
+
+    def percentile(self, site_type: str, series: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.data.get(site_type, {}).get(series, []))
+        if len(samples) < self.min_samples:
+            return None
+        rank = max(1, math.ceil(pct / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def budget(self, site_type: str, series: str, default: float, floor: float,
+               pct: float = 99.0) -> float:
+        """percentile x margin, clamped to [floor, default]; default until enough samples"""
+        observed = self.percentile(site_type, series, pct)
+        if observed is None:
+            return default
+        return max(floor, min(default, observed * self.margin))
+
+    def save(self):
+        with self._lock:
+            save_json_state(self.path, self.data, "latency model")
+
+def wait_budget(site_type: str, series: str, default: float, floor: float,
+                pct: float = 99.0) -> float:
+    """Timeout for a wait, learned from past latencies when the model is enabled"""
+    if LATENCY_MODEL is None:
+        return default
+    return LATENCY_MODEL.budget(site_type, series, default, floor, pct)
+
+def stable_window(site_type: str, default: int) -> int:
+    """Seconds of unchanged length that mean an answer is complete"""
+    return int(math.ceil(wait_budget(site_type, "gap", default, floor=2, pct=95.0)))
+
+def record_latency(site_type: str, series: str, seconds: Optional[float]):
+    if LATENCY_MODEL is not None:
+        LATENCY_MODEL.record(site_type, series, seconds)
+
+def ordered_selectors(site_type: str, role: str, selectors: List[str]) -> List[str]:
+    """Reorder a selector list toward recent winners (if adaptive ordering is on)"""
+    if SELECTOR_STATS is None:
+        return selectors
+    return SELECTOR_STATS.order(site_type, role, selectors)
+
+def record_selector_hit(site_type: str, role: str, selector: Optional[str]):
+    """Note which selector produced the input/answer (broad answer fallbacks are not hits)"""
+    if SELECTOR_STATS is not None and selector and selector_tier(role, selector) == 0:
+        SELECTOR_STATS.record(site_type, role, selector)
+
+def get_input_element(driver, site_type="perplexity"):
+    """Find the input field based on site type"""
+    print("🔍 Looking for input field...")
+    
+    selectors = ordered_selectors(site_type, "input", INPUT_SELECTORS[site_type])
+    candidates = find_candidates(driver, selectors, with_text=False,
+                                 with_elements=True, first_visible=True)
+    for cand in candidates:
+        if cand["visible"]:
+            placeholder = cand.get("placeholder") or "no placeholder"
+            print(f"✅ Found input: '{cand['selector']}' (placeholder: '{placeholder}') - element {cand['index']+1}")
+            record_selector_hit(site_type, "input", cand["selector"])
+            return cand["element"]
+    
+    print(f"⚠️  No visible input among {len(candidates)} candidates")
+    return None
+
+class AnswerTracker:
+    """Completion state behind every answer wait (Selenium, tabs, Playwright), fed one probe at a time.
+
+    poll() takes a probe_answer()/pw_probe_answer() result and follows one
+    container: the first candidate, i.e. the match of the earliest selector in
+    `selectors`. A more specific container replaces the current one once it
+    appears (it may start below the length threshold), a broader one such as
+    `main` never does. poll() returns "stable" (the length has not changed for
+    stable_polls polls), "busy_cleared"/"done_signal" from the generation state
+    (--completion signals) or None; self.status holds the length step
+    ("first", "grew", "same", "shrunk", "stable" or None if nothing was read).
+    First-text latency and the longest growth pause are written into metrics
+    as they are observed; complete() records how the wait ended and the dead
+    time since the answer last grew.
+    """
+
+    def __init__(self, timeout: float, stable_polls: int, metrics: Optional[Dict] = None,
+                 selectors: List[str] = ()):
+        self.timeout = timeout
+        self.stable_polls = stable_polls
+        self.metrics = metrics if metrics is not None else {}
+        self.selectors = list(selectors)
+        self._rank = {sel: k for k, sel in enumerate(self.selectors)}
+        self.status: Optional[str] = None
+        self.start_time = time.time()
+        self.text: Optional[str] = None
+        self.selector: Optional[str] = None
+        self.stable_count = 0
+        self.last_growth: Optional[float] = None
+        self.max_gap = 0.0
+        self.busy_seen = False
+
+    @property
+    def timed_out(self) -> bool:
+        return time.time() - self.start_time >= self.timeout
+
+    def update(self, text: str, selector: Optional[str] = None) -> str:
+        if self.text is None or len(text) != len(self.text):
+            self.selector = selector
+        if self.text is None:
+            self.last_growth = time.time()
+            self.metrics["first_text_seconds"] = round(self.last_growth - self.start_time, 2)
+            status = "first"
+        elif len(text) > len(self.text):
+            now = time.time()
+            self.max_gap = max(self.max_gap, now - self.last_growth)
+            self.metrics["max_gap_seconds"] = round(self.max_gap, 2)
+            self.last_growth = now
+            self.stable_count = 0
+            status = "grew"
+        elif len(text) == len(self.text):
+            self.stable_count += 1
+            status = "stable" if self.stable_count >= self.stable_polls else "same"
+        else:
+            self.stable_count = 0
+            status = "shrunk"
+        self.text = text
+        return status
+
+    def poll(self, candidates: List[Dict], state: Optional[Dict] = None) -> Optional[str]:
+        self.status = None
+        if candidates:
+            cand = candidates[0]
+            rank = self._rank.get(cand["selector"], len(self._rank))
+            if self.selector is None or rank <= self._rank.get(self.selector, len(self._rank)):
+                self.status = self.update(cand["text"], cand["selector"])
+                if self.status == "stable":
+                    return "stable"
+        return self.signal(state)
+
+    def signal(self, state: Optional[Dict]) -> Optional[str]:
+        """"busy_cleared" or "done_signal" once the page's controls say the answer is finished"""
+        if not state:
+            return None
+        if state.get("busy"):
+            self.busy_seen = True
+            return None
+        if self.text is None:
+            return None
+        if self.busy_seen:
+            return "busy_cleared"
+        # A done control without a busy one first: also wait for one unchanged reading
+        if state.get("done") and self.stable_count >= 1:
+            return "done_signal"
+        return None
+
+    def complete(self, how: str):
+        self.metrics["completed_by"] = how
+        if how != "timeout" and self.last_growth is not None:
+            self.metrics["dead_seconds"] = round(time.time() - self.last_growth, 2)
+
+def _answer_probe_options(site_type: str) -> Dict:
+    """Probe options shared by every answer wait: the first substantial, non-navigation match"""
+    return _probe_options(150, NAVIGATION_FILTERS[site_type], first_match=True)
+
+def probe_answer(driver, site_type: str, selectors: List[str]) -> Tuple[List[Dict], Optional[Dict]]:
+    """The answer candidate for AnswerTracker.poll() and, with --completion signals,
+    the generation state from the same call"""
+    if COMPLETION_MODE == "signals" and PROBE_MODE == "batched":
+        try:
+            state = driver.execute_script(ANSWER_STATE_JS, selectors, _answer_probe_options(site_type),
+                                          GENERATION_SIGNALS[site_type])
+            if isinstance(state, dict):
+                return state.get("candidates") or [], state
+        except Exception as e:
+            print(f"⚠️  Generation-state probe failed, using length stability only: {e}")
+    return find_candidates(driver, selectors, min_length=150, filters=NAVIGATION_FILTERS[site_type],
+                           first_match=True), None
+
+def wait_for_answer(driver, site_type="perplexity", timeout: Optional[float] = None,
+                    stable_polls: Optional[int] = None, metrics: Optional[Dict] = None) -> Optional[str]:
+    """Wait for answer to appear and complete with optimized detection.
+
+    timeout/stable_polls default to ANSWER_WAIT_SECONDS and 8; when metrics is
+    given, first-text latency and the longest growth pause are recorded in it.
+    """
+    if timeout is None:
+        timeout = ANSWER_WAIT_SECONDS
+    if stable_polls is None:
+        stable_polls = 8
+    selectors = ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type])
+    
+    print("🔍 Looking for answer...")
+    print(f"⏰ Will wait up to {timeout:.0f} seconds (stable window {stable_polls}s)...")
+    
+    def finish(text: str) -> str:
+        # For ChatGPT, try to get the full answer via copy button
+        if site_type == "chatgpt":
+            full_answer = try_get_full_answer_via_copy(driver)
+            if full_answer and len(full_answer) > len(text):
+                print(f"📋 Got full answer via copy button: {len(full_answer)} chars")
+                return full_answer
+        return text
+    
+    tracker = AnswerTracker(timeout, stable_polls, metrics, selectors)
+    while not tracker.timed_out:
+        how = tracker.poll(*probe_answer(driver, site_type, selectors))
+        length = len(tracker.text) if tracker.text else 0
+        if tracker.status == "first":
+            print(f"✅ Found initial answer: {length} chars")
+        elif tracker.status == "grew":
+            print(f"📈 Answer growing: {length} chars")
+        elif tracker.status == "shrunk":
+            # Answer length decreased (unusual, or a more specific container took over), reset
+            print(f"⚠️  Answer length changed: {length} chars")
+        
+        if how is not None:
+            if how == "stable":
+                print(f"✅ Answer stable for {stable_polls}s: {length} chars")
+            else:
+                print(f"✅ Answer complete ({how.replace('_', ' ')}): {length} chars")
+            record_selector_hit(site_type, "answer", tracker.selector)
+            tracker.complete(how)
+            return finish(tracker.text)
         
         # Progress indicator
-        elapsed = int(time.time() - start_time)
+        elapsed = int(time.time() - tracker.start_time)
         if elapsed % 10 == 0:
-            print(f"⏳ Waiting... ({elapsed}s elapsed, stable: {stable_count}s)")
+            print(f"⏳ Waiting... ({elapsed}s elapsed, stable: {tracker.stable_count}s)")
         
         time.sleep(1)
     
     # If we have an answer but it's not stable, return what we have
+    tracker.complete("timeout")
+    if tracker.text:
+        print(f"⏰ Timeout - returning current answer: {len(tracker.text)} chars")
+        return tracker.text
+    
+    print("⏰ Timeout waiting for answer")
+    return None
+
+# Installed once after submit: records mutation times on the page so Python
+# can wait for a quiet period with one async call instead of polling
+ANSWER_OBSERVER_JS = """
+const selectors = arguments[0], filters = arguments[1], minLength = arguments[2];
+const prev = window.__aiScraperObserver;
+if (prev && prev.observer) prev.observer.disconnect();
+const state = {started: Date.now(), lastMutation: Date.now(), lastGrowth: Date.now(), length: 0,
+               mutations: 0, firstText: null, maxGap: 0};
+state.measure = function () {
+    for (const sel of selectors) {
+        let nodes;
+        try { nodes = document.querySelectorAll(sel); } catch (e) { continue; }
+        for (const el of nodes) {
+            const text = (el.innerText || '').trim();
+            if (text.length > minLength && !filters.some(f => text.startsWith(f))) {
+                return {text: text, selector: sel};
+            }
+        }
+    }
+    return null;
+};
+state.observer = new MutationObserver(function (records) {
+    state.mutations += records.length;
+    state.lastMutation = Date.now();
+});
+state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+window.__aiScraperObserver = state;
+return true;
+"""
+
+# Blocks (async) until the answer has been quiet for quietMs or budgetMs runs out.
+# timing carries what AnswerTracker measures: first text and the longest growth
+# pause since the observer was installed, and the idle time since the last growth
+ANSWER_QUIET_WAIT_JS = """
+const quietMs = arguments[0], budgetMs = arguments[1];
+const done = arguments[arguments.length - 1];
+const state = window.__aiScraperObserver;
+if (!state) { done({status: 'missing'}); return; }
+const start = Date.now();
+(function check() {
+    const now = Date.now();
+    const match = state.measure();
+    const text = match ? match.text : null;
+    if (text) {
+        if (text.length !== state.length) {
+            if (state.firstText === null) state.firstText = now;
+            else if (text.length > state.length) state.maxGap = Math.max(state.maxGap, now - state.lastGrowth);
+            state.length = text.length;
+            state.lastGrowth = now;
+        }
+    }
+    const timing = {firstTextMs: state.firstText === null ? null : state.firstText - state.started,
+                    maxGapMs: state.maxGap, idleMs: now - state.lastGrowth};
+    if (text && now - state.lastMutation >= quietMs && now - state.lastGrowth >= quietMs) {
+        done({status: 'quiet', text: text, selector: match.selector, mutations: state.mutations,
+              timing: timing});
+        return;
+    }
+    if (now - start >= budgetMs) {
+        done({status: 'pending', text: text, selector: match ? match.selector : null,
+              mutations: state.mutations, timing: timing});
+        return;
+    }
+    setTimeout(check, 250);
+})();
+"""
+
+def install_answer_observer(driver, site_type="perplexity", min_length=150) -> bool:
+    """Inject the MutationObserver that tracks answer activity in the page"""
+    try:
+        selectors = ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type])
+        return bool(driver.execute_script(ANSWER_OBSERVER_JS, selectors,
+                                          NAVIGATION_FILTERS[site_type], min_length))
+    except Exception as e:
+        print(f"⚠️  Could not install answer observer: {e}")
+        return False
+
+def record_observed_wait(metrics: Optional[Dict], result: Optional[Dict], how: str):
+    """AnswerTracker's completion record for an observer wait, from the page-side timings"""
+    if metrics is None:
+        return
+    timing = (result or {}).get("timing") or {}
+    if timing.get("firstTextMs") is not None:
+        metrics["first_text_seconds"] = round(timing["firstTextMs"] / 1000, 2)
+        if timing.get("maxGapMs"):
+            metrics["max_gap_seconds"] = round(timing["maxGapMs"] / 1000, 2)
+    metrics["completed_by"] = how
+    if how != "timeout" and timing.get("idleMs") is not None and timing.get("firstTextMs") is not None:
+        metrics["dead_seconds"] = round(timing["idleMs"] / 1000, 2)
+
+def wait_for_answer_observed(driver, site_type="perplexity", timeout: Optional[float] = None,
+                             stable_polls: Optional[int] = None, metrics: Optional[Dict] = None) -> Optional[str]:
+    """Wait for the answer using page-side mutation tracking instead of polling"""
+    if timeout is None:
+        timeout = ANSWER_WAIT_SECONDS
+    print(f"🔍 Waiting for answer (mutation observer, {OBSERVER_QUIET_SECONDS:.0f}s quiet period)...")
+    print(f"⏰ Will wait up to {timeout:.0f} seconds...")
+    
+    if not install_answer_observer(driver, site_type):
+        return wait_for_answer(driver, site_type, timeout, stable_polls, metrics)
+    
+    # The script timeout is driver-wide; put it back for whoever uses the driver next
+    try:
+        previous_timeout = driver.timeouts.script
+    except Exception:
+        previous_timeout = 30  # W3C default
+    try:
+        return _wait_observed_quiet(driver, site_type, timeout, stable_polls, metrics)
+    finally:
+        try:
+            driver.set_script_timeout(previous_timeout)
+        except Exception:
+            pass
+
+def _wait_observed_quiet(driver, site_type: str, timeout: float, stable_polls: Optional[int],
+                         metrics: Optional[Dict]) -> Optional[str]:
+    quiet_ms = int(OBSERVER_QUIET_SECONDS * 1000)
+    start_time = time.time()
+    answer_text = None
+    result = None
+    while time.time() - start_time < timeout:
+        remaining = timeout - (time.time() - start_time)
+        budget = min(OBSERVER_CHUNK_SECONDS, remaining)
+        driver.set_script_timeout(budget + 10)
+        try:
+            result = driver.execute_async_script(ANSWER_QUIET_WAIT_JS, quiet_ms, int(budget * 1000))
+        except Exception as e:
+            print(f"⚠️  Observer wait failed ({e}), falling back to polling")
+            return answer_text or wait_for_answer(driver, site_type, timeout, stable_polls, metrics)
+        
+        status = (result or {}).get("status")
+        if result and result.get("text"):
+            answer_text = result["text"]
+        
+        if status == "quiet":
+            record_selector_hit(site_type, "answer", result.get("selector"))
+            record_observed_wait(metrics, result, "quiet")
+            print(f"✅ Answer quiet for {OBSERVER_QUIET_SECONDS:.0f}s: {len(answer_text)} chars "
+                  f"({result.get('mutations', 0)} mutations)")
+            if site_type == "chatgpt":
+                full_answer = try_get_full_answer_via_copy(driver)
+                if full_answer and len(full_answer) > len(answer_text):
+                    return full_answer
+            return answer_text
+        if status == "missing":
+            # The page navigated and dropped our state; start watching again
+            if not install_answer_observer(driver, site_type):
+                return answer_text or wait_for_answer(driver, site_type, timeout, stable_polls, metrics)
+            continue
+        
+        elapsed = int(time.time() - start_time)
+        print(f"⏳ Waiting... ({elapsed}s elapsed, {len(answer_text) if answer_text else 0} chars so far)")
+    
+    record_observed_wait(metrics, result, "timeout")
     if answer_text:
         print(f"⏰ Timeout - returning current answer: {len(answer_text)} chars")
         return answer_text
@@ -216,6 +1845,178 @@ def wait_for_answer(driver, site_type="perplexity") -> Optional[str]:
     print("⏰ Timeout waiting for answer")
     return None
 
+# Response types that carry a streamed answer
+STREAM_MIME_TYPES = ("text/event-stream", "application/x-ndjson", "application/stream+json")
+
+def parse_sse(body: str) -> List[Tuple[str, str]]:
+    """Split a Server-Sent Events body into (event name, data) pairs"""
+    events = []
+    name, data = "message", []
+    for line in body.splitlines() + [""]:
+        if not line:
+            if data:
+                events.append((name, "\n".join(data)))
+            name, data = "message", []
+        elif line.startswith("event:"):
+            name = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+    return events
+
+class StreamCapture:
+    """Rebuilds an answer from DevTools network events of the page's answer stream.
+
+    EventSource streams arrive message by message (Network.eventSourceMessageReceived);
+    fetch()-based SSE or NDJSON streams are read in full with Network.getResponseBody
+    once Chrome reports Network.loadingFinished for them. Payloads can be delta
+    tokens (JSON strings, {"v": ...}, {"delta": {"content": ...}}) or cumulative
+    text ({"message": {"content": {"parts": [...]}}}, {"answer"/"text": ...});
+    any http(s) "url" values are collected as sources.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.text = ""
+        self.urls: Dict[str, None] = {}
+        self.streams = set()
+        self.event_sources = set()
+        self.finished = False
+        self.messages = 0
+
+    def feed(self, messages: List[Dict]):
+        for message in messages:
+            method = message.get("method", "")
+            params = message.get("params", {})
+            request_id = params.get("requestId")
+            if method == "Network.responseReceived":
+                mime = (params.get("response", {}).get("mimeType") or "").lower()
+                if mime in STREAM_MIME_TYPES:
+                    self.streams.add(request_id)
+            elif method == "Network.eventSourceMessageReceived":
+                self.streams.add(request_id)
+                self.event_sources.add(request_id)
+                self._on_event(params.get("eventName") or "message", params.get("data") or "")
+            elif method == "Network.loadingFinished" and request_id in self.streams:
+                if request_id not in self.event_sources:
+                    self._read_body(request_id)
+                self.finished = True
+            elif method == "Network.loadingFailed" and request_id in self.streams:
+                # Closed early (e.g. EventSource.close() after the final event)
+                self.finished = True
+
+    def _read_body(self, request_id: str):
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception as e:
+            print(f"⚠️  Could not read the answer stream body: {e}")
+            return
+        text = body.get("body") or ""
+        events = parse_sse(text)
+        if not events:
+            # NDJSON: one JSON document per line
+            events = [("message", line) for line in text.splitlines() if line.strip()]
+        for name, data in events:
+            self._on_event(name, data)
+
+    def _on_event(self, name: str, data: str):
+        self.messages += 1
+        if data.strip() == "[DONE]" or name in ("done", "end", "finish"):
+            self.finished = True
+            return
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            payload = data
+        if isinstance(payload, str):
+            self.text += payload
+            return
+        self._collect_urls(payload)
+        if isinstance(payload, dict):
+            self._apply_text(payload)
+
+    def _apply_text(self, payload: Dict):
+        message = payload.get("message")
+        if isinstance(message, dict):
+            parts = (message.get("content") or {}).get("parts")
+            if isinstance(parts, list) and parts and isinstance(parts[0], str):
+                self.text = parts[0]
+                return
+        delta = payload.get("delta")
+        if isinstance(delta, dict) and isinstance(delta.get("content"), str):
+            self.text += delta["content"]
+            return
+        if isinstance(payload.get("v"), str):
+            self.text += payload["v"]
+            return
+        for key in ("answer", "text", "content"):
+            value = payload.get(key)
+            if isinstance(value, str):
+                # Cumulative if it extends what we have, otherwise a delta
+                self.text = value if value.startswith(self.text) else self.text + value
+                return
+
+    def _collect_urls(self, payload):
+        stack = [payload]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    if key in ("url", "href") and isinstance(value, str) and value.startswith("http"):
+                        self.urls.setdefault(value, None)
+                    elif isinstance(value, (dict, list)):
+                        stack.append(value)
+            elif isinstance(item, list):
+                stack.extend(reversed(item))
+
+def wait_for_answer_network(driver, site_type="perplexity", timeout: Optional[float] = None,
+                            metrics: Optional[Dict] = None) -> Optional[StreamCapture]:
+    """Read the answer from the page's network stream; None if no stream was seen.
+
+    Returns as soon as the stream closes. Needs the performance log (driver.network_monitor).
+    """
+    monitor = getattr(driver, "network_monitor", None)
+    if monitor is None:
+        return None
+    if timeout is None:
+        timeout = ANSWER_WAIT_SECONDS
+    if metrics is None:
+        metrics = {}
+    
+    print(f"📡 Reading the answer stream (up to {timeout:.0f}s)...")
+    capture = StreamCapture(driver)
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        capture.feed(monitor.drain())
+        if capture.text and "first_text_seconds" not in metrics:
+            metrics["first_text_seconds"] = round(time.time() - start_time, 2)
+        if capture.finished:
+            break
+        if not capture.streams and time.time() - start_time > NETWORK_STREAM_GRACE_SECONDS:
+            print("⚠️  No answer stream seen, falling back to the DOM")
+            return None
+        time.sleep(0.25)
+    
+    if not capture.text:
+        print("⚠️  Answer stream had no text, falling back to the DOM")
+        return None
+    state = "closed" if capture.finished else "still open at timeout"
+    print(f"✅ Stream {state}: {len(capture.text)} chars, {len(capture.urls)} source URLs "
+          f"from {capture.messages} messages")
+    return capture
+
+def stream_citations(driver, capture: StreamCapture, site_type="perplexity") -> List[str]:
+    """Citations from the stream's source URLs (plus answer-text sources for ChatGPT);
+    falls back to the DOM when the stream carried no URLs"""
+    links = clean_citation_urls([{"href": url} for url in capture.urls], site_type)
+    if not links:
+        return extract_citations(driver, site_type)
+    if site_type == "chatgpt":
+        links += extract_text_citations(capture.text, existing=links,
+                                        exclude_domains=INTERNAL_LINK_DOMAINS[site_type])
+    print(f"📚 Extracted {len(links)} citations from the answer stream")
+    return sorted(set(links))
+
+
 def try_get_full_answer_via_copy(driver) -> Optional[str]:
     """Try to get the full answer by clicking the copy button"""
     try:
@@ -248,109 +2049,102 @@ def try_get_full_answer_via_copy(driver) -> Optional[str]:
     except:
         return None
 
-def extract_citations(driver, site_type="perplexity") -> List[str]:
-    """Extract links from the answer"""
-    if site_type == "perplexity":
-        selectors = [
-            "[data-testid='answer'] a[href]",
-            ".prose a[href]",
-            "main a[href]",
-            "div[role='main'] a[href]",
-        ]
-    else:  # chatgpt
-        # ChatGPT rarely has external links, so we'll look for any meaningful links
-        selectors = [
-            "div[data-message-author-role='assistant'] a[href]",
-            ".markdown a[href]",
-            "main a[href]",
-            "a[href]",
-        ]
-    
-    links = set()
-    for sel in selectors:
+# Collects every citation anchor in one call: href, anchor text, document
+# order and character offset inside the answer container that holds it
+HARVEST_ANCHORS_JS = """
+const selectors = arguments[0], answerSelectors = arguments[1];
+const seen = new Set();
+const roots = [];
+for (const sel of answerSelectors) {
+    try { document.querySelectorAll(sel).forEach(el => roots.push(el)); } catch (e) {}
+}
+const out = [];
+for (const sel of selectors) {
+    let nodes;
+    try { nodes = document.querySelectorAll(sel); } catch (e) { continue; }
+    for (const a of nodes) {
+        if (seen.has(a)) continue;
+        seen.add(a);
+        let offset = null;
+        const root = roots.find(r => r.contains(a));
+        if (root) {
+            const range = document.createRange();
+            range.setStart(root, 0);
+            range.setEndBefore(a);
+            offset = range.toString().length;
+        }
+        out.push({href: a.href || a.getAttribute('href') || '', text: (a.innerText || '').trim(),
+                  index: out.length, offset: offset, selector: sel});
+    }
+}
+return out;
+"""
+
+def harvest_anchors(driver, site_type="perplexity") -> Optional[List[Dict]]:
+    """Return every citation anchor (href, text, index, offset) from one script call"""
+    try:
+        anchors = driver.execute_script(HARVEST_ANCHORS_JS, CITATION_SELECTORS[site_type],
+                                        ANSWER_SELECTORS[site_type])
+        if isinstance(anchors, list):
+            return anchors
+    except Exception as e:
+        print(f"⚠️  Bulk anchor harvest failed, using per-anchor lookups: {e}")
+    return None
+
+def _harvest_anchors_legacy(driver, site_type="perplexity") -> List[Dict]:
+    """Per-anchor get_attribute calls; same result shape as harvest_anchors()"""
+    anchors = []
+    for sel in CITATION_SELECTORS[site_type]:
         try:
-            anchors = driver.find_elements(By.CSS_SELECTOR, sel)
-            for a in anchors:
+            for a in driver.find_elements(By.CSS_SELECTOR, sel):
                 try:
-                    href = a.get_attribute("href")
-                    if href and href.startswith("http"):
-                        # Clean URLs and filter out internal ChatGPT links
-                        if "?" in href:
-                            href = href.split("?")[0]
-                        
-                        # Filter out internal ChatGPT URLs
-                        if site_type == "chatgpt" and ("chatgpt.com" in href or "openai.com" in href):
-                            continue
-                        
-                        links.add(href)
-                except:
+                    anchors.append({"href": a.get_attribute("href") or "", "text": None,
+                                    "index": len(anchors), "offset": None, "selector": sel})
+                except Exception:
                     pass
-        except:
+        except Exception:
+            continue
+    return anchors
+
+def clean_citation_urls(anchors: List[Dict], site_type="perplexity") -> List[str]:
+    """Turn harvested anchors into unique external URLs, in answer order"""
+    excluded = INTERNAL_LINK_DOMAINS[site_type]
+    urls = {}
+    for anchor in anchors:
+        href = anchor.get("href") or ""
+        if not href.startswith("http"):
             continue
+        # Clean URLs and filter out internal links
+        if "?" in href:
+            href = href.split("?")[0]
+        if any(domain in href for domain in excluded):
+            continue
+        urls.setdefault(href, None)
+    return list(urls)
+
+def extract_citations(driver, site_type="perplexity") -> List[str]:
+    """Extract links from the answer"""
+    anchors = harvest_anchors(driver, site_type) if PROBE_MODE == "batched" else None
+    if anchors is None:
+        anchors = _harvest_anchors_legacy(driver, site_type)
+    links = set(clean_citation_urls(anchors, site_type))
+    print(f"🔗 Found {len(anchors)} anchors, {len(links)} external links")
     
-    # For ChatGPT, also extract URLs from the answer text itself
+    # For ChatGPT, also extract URLs and named sources from the answer text itself
     if site_type == "chatgpt":
         print("🔍 Extracting citations from ChatGPT answer text...")
         try:
-            # Get the answer text and look for URLs
             answer_text = get_current_answer_text(driver)
             if answer_text:
-                import re
                 print(f"📝 Processing {len(answer_text)} characters of answer text for citations...")
-                
-                # Find URLs in text using regex - more comprehensive pattern
-                url_pattern = r'https?://[^\s\)]+'
-                text_urls = re.findall(url_pattern, answer_text)
-                print(f"🔗 Found {len(text_urls)} URLs in text")
-                for url in text_urls:
-                    # Clean URL
-                    if "?" in url:
-                        url = url.split("?")[0]
-                    if ")" in url:
-                        url = url.rstrip(")")
-                    if url not in links and not ("chatgpt.com" in url or "openai.com" in url):
-                        links.add(url)
-                        print(f"✅ Added URL citation: {url}")
-                
-                # Also look for domain-like patterns that might be citations
-                # This captures things like "Business Chief", "AI Magazine", "FNLondon", "goml.io"
-                domain_pattern = r'\b[A-Z][a-zA-Z\s&]+(?:\.com|\.io|\.org|\.net|\.co\.uk|\.ai|\.tech)\b'
-                domain_matches = re.findall(domain_pattern, answer_text)
-                print(f"🌐 Found {len(domain_matches)} domain-like patterns")
-                for domain in domain_matches:
-                    # Clean up the domain match
-                    clean_domain = domain.strip()
-                    if clean_domain and len(clean_domain) > 3:
-                        # Add as a potential citation source
-                        if clean_domain not in links:
-                            links.add(f"Potential source: {clean_domain}")
-                            print(f"✅ Added domain citation: {clean_domain}")
-                
-                # Look for company names that might be sources
-                company_pattern = r'\b(?:Business Chief|AI Magazine|FNLondon|Business Insider|The Wall Street Journal|Wikipedia|McKinsey|BCG|Deloitte|EY|PwC|Accenture|IBM|Infosys|Capgemini|Cognizant|Financial Times|The Times of India|The Australian|LinkedIn|Superside|Bitcot|Goml|Ailoitte|Xonique|Faculty|Fractal|Algoscale|Quantiphi|Tredence|ZS Associates|Slalom|Booz Allen Hamilton|Unity Advisory|Keystone|Fusion Collective|Slideworks|Monevate|SIB|Perceptis|Xavier AI)\b'
-                company_matches = re.findall(company_pattern, answer_text)
-                print(f"🏢 Found {len(company_matches)} company name matches")
-                for company in company_matches:
-                    if company not in links:
-                        links.add(f"Source: {company}")
-                        print(f"✅ Added company citation: {company}")
-                
-                # Also look for any capitalized phrases that might be sources (like "Business Chief", "AI Magazine")
-                source_pattern = r'\b[A-Z][a-zA-Z\s&]+(?:Magazine|Journal|Times|Insider|Chief|London|Financial|Wall Street|Business|AI|Tech|Consulting|Analytics|Platform|Company|Firm|Group|Advisory|Collective|Works|Advisory)\b'
-                source_matches = re.findall(source_pattern, answer_text)
-                print(f"📰 Found {len(source_matches)} source pattern matches")
-                for source in source_matches:
-                    clean_source = source.strip()
-                    if clean_source and len(clean_source) > 3 and clean_source not in links:
-                        # Check if it's not already captured by company pattern
-                        if not any(clean_source in link for link in links):
-                            links.add(f"Potential source: {clean_source}")
-                            print(f"✅ Added source citation: {clean_source}")
+                text_citations = extract_text_citations(answer_text, existing=links,
+                                                        exclude_domains=INTERNAL_LINK_DOMAINS[site_type])
+                links.update(text_citations)
+                print(f"✅ Added {len(text_citations)} citations from answer text")
             else:
                 print("⚠️  No answer text found for citation extraction")
         except Exception as e:
             print(f"⚠️  Error extracting text citations: {e}")
-            pass
     
     result = sorted(set(links))
     if site_type == "chatgpt" and not result:
@@ -361,68 +2155,21 @@ def extract_citations(driver, site_type="perplexity") -> List[str]:
 
 def get_current_answer_text(driver) -> Optional[str]:
     """Get the current answer text from ChatGPT"""
+    print("🔍 Searching for answer text using multiple selectors...")
     try:
-        # Try multiple strategies to get the answer text
-        selectors = [
-            "div[data-message-author-role='assistant']",
-            ".markdown",
-            "main div:last-child",
-            "div[class*='markdown']",
-            "div[class*='prose']",
-            "div[class*='text']",
-            "div[class*='content']",
-        ]
-        
-        print("🔍 Searching for answer text using multiple selectors...")
-        for i, sel in enumerate(selectors):
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, sel)
-                print(f"🔍 Selector '{sel}' found {len(elements)} elements")
-                
-                for j, elem in enumerate(elements):
-                    try:
-                        text = elem.text.strip()
-                        if text and len(text) > 100:
-                            print(f"📝 Found answer text: {len(text)} chars for citation extraction using '{sel}' element {j+1}")
-                            return text
-                        elif text:
-                            print(f"⚠️  Element '{sel}' {j+1} has text but too short: {len(text)} chars")
-                    except Exception as e:
-                        print(f"⚠️  Error processing element '{sel}' {j+1}: {e}")
-                        continue
-            except Exception as e:
-                print(f"⚠️  Error with selector '{sel}': {e}")
-                continue
-        
-        # Fallback: try to get text from the main content area
-        print("🔄 Trying fallback: main content area...")
-        try:
-            main_content = driver.find_element(By.CSS_SELECTOR, "main")
-            if main_content:
-                text = main_content.text.strip()
-                if text and len(text) > 100:
-                    print(f"📝 Found fallback text: {len(text)} chars for citation extraction")
-                    return text
-                else:
-                    print(f"⚠️  Main content too short: {len(text) if text else 0} chars")
-        except Exception as e:
-            print(f"⚠️  Error with main content fallback: {e}")
-        
-        # Last resort: try to get any visible text from the page
-        print("🔄 Trying last resort: any visible text...")
-        try:
-            body_text = driver.find_element(By.CSS_SELECTOR, "body").text.strip()
-            if body_text and len(body_text) > 100:
-                print(f"📝 Found body text: {len(body_text)} chars for citation extraction")
-                return body_text
-        except Exception as e:
-            print(f"⚠️  Error with body text: {e}")
-        
-        print("❌ Could not find suitable answer text for citation extraction")
-        return None
+        candidates = find_candidates(driver, ANSWER_TEXT_SELECTORS, min_length=100, first_match=True)
     except Exception as e:
         print(f"⚠️  Error getting answer text: {e}")
         return None
+    
+    if candidates:
+        cand = candidates[0]
+        print(f"📝 Found answer text: {cand['length']} chars for citation extraction using "
+              f"'{cand['selector']}' element {cand['index']+1}")
+        return cand["text"]
+    
+    print("❌ Could not find suitable answer text for citation extraction")
+    return None
 
 def handle_blocking_elements(driver):
     """Handle any blocking elements like buttons or overlays"""
@@ -456,344 +2203,405 @@ def handle_blocking_elements(driver):
         print(f"⚠️  Could not handle blocking elements: {e}")
         pass
 
-def ask_one(driver, prompt: str, site_type="perplexity") -> Tuple[str, List[str]]:
-    """Ask one question and get the answer"""
-    print(f"\n🤖 Processing: {prompt[:60]}{'...' if len(prompt) > 60 else ''}")
+# Client-side route change: push the start path and let the SPA router react
+ROUTE_CHANGE_JS = """
+history.pushState({}, '', arguments[0]);
+window.dispatchEvent(new PopStateEvent('popstate', {state: {}}));
+return location.href;
+"""
+
+def open_site(driver, site_type="perplexity", settle=(2, 4), max_wait=30,
+              login_delay=(3.0, 8.0), mode="", metrics: Optional[Dict] = None):
+    """Load the site with a full page load, wait out interstitials and handle login"""
+    label = f" ({mode})" if mode else ""
     
     # Navigate to the selected site
+    url = SITE_URLS[site_type]
     if site_type == "perplexity":
-        url = "https://www.perplexity.ai/"
         print("🌐 Navigating to Perplexity...")
     else:  # chatgpt
-        url = "https://chat.openai.com/"
         print("🌐 Navigating to ChatGPT...")
     
-    driver.get(url)
-    time.sleep(random.uniform(2, 4))
+    with timed_stage(metrics, "navigate"):
+        driver.get(url)
     
     # Wait for page to be ready (not showing "Just a moment..." or similar)
-    print("⏳ Waiting for page to fully load...")
-    max_wait = 30  # Wait up to 30 seconds for page to load
-    start_time = time.time()
-    while time.time() - start_time < max_wait:
-        if "just a moment" not in driver.title.lower() and "loading" not in driver.title.lower():
-            print("✅ Page appears to be loaded")
-            break
-        time.sleep(1)
-        print(f"⏳ Still waiting for page to load... ({int(time.time() - start_time)}s)")
+    with timed_stage(metrics, "page_load"):
+        time.sleep(random.uniform(*settle))
+        print(f"⏳ Waiting for page to fully load{label}...")
+        start_time = time.time()
+        while time.time() - start_time < max_wait:
+            if "just a moment" not in driver.title.lower() and "loading" not in driver.title.lower():
+                print("✅ Page appears to be loaded")
+                break
+            time.sleep(1)
+            print(f"⏳ Still waiting for page to load... ({int(time.time() - start_time)}s)")
+    
+    if metrics is not None and getattr(driver, "network_monitor", None) is not None:
+        metrics["page_ready_ms"] = page_ready_ms(driver)
     
     # Check if login needed
-    if "login" in driver.title.lower() or "sign in" in driver.title.lower():
-        if not wait_for_manual_login(driver):
-            raise Exception("Login not completed")
-        
-        # Add delay after login to appear more human-like
-        delay = random.uniform(3.0, 8.0)
-        print(f"⏸️  Waiting {delay:.1f}s after login...")
-        time.sleep(delay)
+    title, url = driver.execute_script("return [document.title, location.href]")
+    if is_login_wall(title, url):
+        with timed_stage(metrics, "login"):
+            if not wait_for_manual_login(driver):
+                raise ScrapeError("Login not completed", "login_required")
+            
+            # Add delay after login to appear more human-like
+            delay = random.uniform(*login_delay)
+            print(f"⏸️  Waiting {delay:.1f}s after login{label}...")
+            time.sleep(delay)
+
+def try_reuse_session(driver, site_type="perplexity"):
+    """Start a new thread in the already-loaded app; returns the input element, or None
+    if the app isn't loaded or didn't reset (the caller then does a full page load)"""
+    if not REUSE_SESSION:
+        return None
+    try:
+        current = urlparse(driver.current_url)
+    except Exception:
+        return None
+    base = urlparse(SITE_URLS[site_type])
+    if (current.scheme, current.netloc) != (base.scheme, base.netloc):
+        return None
+    
+    print("♻️  Reusing loaded app - starting a new thread in-page...")
+    clicked = False
+    candidates = find_candidates(driver, NEW_THREAD_SELECTORS[site_type], with_text=False,
+                                 with_elements=True, first_visible=True)
+    for cand in candidates:
+        if cand["visible"]:
+            try:
+                cand["element"].click()
+                clicked = True
+                print(f"🆕 Clicked new-thread control '{cand['selector']}'")
+                break
+            except Exception:
+                continue
+    if not clicked:
+        try:
+            driver.execute_script(ROUTE_CHANGE_JS, base.path or "/")
+            print("🆕 Changed route client-side")
+        except Exception as e:
+            print(f"⚠️  Route change failed: {e}")
+            return None
+    time.sleep(random.uniform(0.5, 1.5))
     
-    # Find input field
-    print(f"🔍 Current page: {driver.title} at {driver.current_url}")
     input_el = get_input_element(driver, site_type)
-    if not input_el:
-        print("🔄 Input not found, refreshing...")
-        driver.refresh()
-        time.sleep(3)
-        print(f"🔍 After refresh - page: {driver.title} at {driver.current_url}")
-        input_el = get_input_element(driver, site_type)
-        if not input_el:
-            print("❌ Input still not found after refresh, trying one more time...")
-            time.sleep(5)  # Wait a bit longer
+    if input_el is None:
+        print("🔄 No input after in-page reset, falling back to a full page load")
+        return None
+    
+    # Make sure the previous answer is gone so it isn't captured again
+    previous = getattr(driver, "last_answer_text", None)
+    if previous:
+        marker = previous[:200]
+        for cand in find_candidates(driver, ANSWER_SELECTORS[site_type], min_length=150,
+                                    filters=NAVIGATION_FILTERS[site_type]):
+            if marker in cand["text"]:
+                print("🔄 Previous answer still on screen, falling back to a full page load")
+                return None
+    return input_el
+
+def ask_one(driver, prompt: str, site_type="perplexity",
+            metrics: Optional[Dict] = None) -> Tuple[str, List[str]]:
+    """Ask one question and get the answer (per-prompt measurements go into metrics)"""
+    print(f"\n🤖 Processing: {prompt[:60]}{'...' if len(prompt) > 60 else ''}")
+    
+    # Reuse the loaded app when possible, else do a full page load
+    nav_start = time.time()
+    with timed_stage(metrics, "navigate"):
+        input_el = try_reuse_session(driver, site_type)
+    nav_mode = "reuse" if input_el is not None else "load"
+    if input_el is None:
+        open_site(driver, site_type, settle=(2, 4), max_wait=30, login_delay=(3.0, 8.0), metrics=metrics)
+        
+        # Find input field
+        with timed_stage(metrics, "find_input"):
+            print(f"🔍 Current page: {driver.title} at {driver.current_url}")
             input_el = get_input_element(driver, site_type)
             if not input_el:
-                # Take a screenshot for debugging
-                try:
-                    screenshot_path = f"debug_input_not_found_{int(time.time())}.png"
-                    driver.save_screenshot(screenshot_path)
-                    print(f"📸 Screenshot saved to {screenshot_path} for debugging")
-                except:
-                    pass
-                raise Exception("Could not find input field even after refresh and retry")
+                print("🔄 Input not found, refreshing...")
+                driver.refresh()
+                time.sleep(3)
+                print(f"🔍 After refresh - page: {driver.title} at {driver.current_url}")
+                input_el = get_input_element(driver, site_type)
+                if not input_el:
+                    print("❌ Input still not found after refresh, trying one more time...")
+                    time.sleep(5)  # Wait a bit longer
+                    input_el = get_input_element(driver, site_type)
+                    if not input_el:
+                        # Take a screenshot for debugging
+                        try:
+                            screenshot_path = f"debug_input_not_found_{int(time.time())}.png"
+                            driver.save_screenshot(screenshot_path)
+                            print(f"📸 Screenshot saved to {screenshot_path} for debugging")
+                        except:
+                            pass
+                        raise ScrapeError("Could not find input field even after refresh and retry",
+                                          "input_not_found")
+    
+    if metrics is not None:
+        metrics["nav_mode"] = nav_mode
+        metrics["nav_seconds"] = round(time.time() - nav_start, 2)
     
     # Skip blocking element handling for now - it was causing input field issues
     # The fake prompts work fine without it
     
     # Type and submit
-    print("⌨️  Typing prompt...")
-    human_like_typing(driver, input_el, prompt)
-    
-    # Submit with Enter
-    time.sleep(random.uniform(0.3, 0.8))
-    input_el.send_keys(Keys.RETURN)
-    print("📤 Submitted prompt, waiting for answer...")
-    
-    # Wait for answer
-    answer = wait_for_answer(driver, site_type)
-    if not answer:
-        print("⏳ Answer not found, trying extra wait...")
-        time.sleep(8)
-        answer = wait_for_answer(driver, site_type)
+    with timed_stage(metrics, "typing"):
+        print("⌨️  Typing prompt...")
+        human_like_typing(driver, input_el, prompt)
+        
+        # Submit with Enter
+        time.sleep(random.uniform(0.3, 0.8))
+        if CAPTURE_MODE == "network" and getattr(driver, "network_monitor", None) is not None:
+            # Start the stream capture from a clean slate
+            driver.network_monitor.drain()
+        input_el.send_keys(Keys.RETURN)
+        print("📤 Submitted prompt, waiting for answer...")
+    
+    # Wait for answer, with budgets learned from earlier answers when available
+    timeout = wait_budget(site_type, "completion", default=ANSWER_WAIT_SECONDS, floor=30)
+    stable_polls = stable_window(site_type, 8)
+    wait_metrics: Dict = {}
+    if metrics is not None:
+        metrics["answer_timeout"] = round(timeout, 1)
+        metrics["stable_window"] = stable_polls
+    
+    submitted_at = time.time()
+    capture = None
+    with timed_stage(metrics, "wait_answer"):
+        if CAPTURE_MODE == "network":
+            capture = wait_for_answer_network(driver, site_type, timeout, wait_metrics)
+        if capture is not None:
+            answer = capture.text
+        else:
+            wait = wait_for_answer_observed if COMPLETION_MODE == "observer" else wait_for_answer
+            answer = wait(driver, site_type, timeout, stable_polls, wait_metrics)
     
     if not answer:
-        raise Exception("Could not capture answer")
-    
-    # For ChatGPT, wait for answer to stop growing (indicating completion)
-    if site_type == "chatgpt":
-        print("⏳ Waiting for ChatGPT to finish typing...")
-        answer = wait_for_answer_completion(driver, answer)
+        raise ScrapeError("Could not capture answer", "answer_timeout")
+    if metrics is not None:
+        metrics["capture"] = "network" if capture is not None else "dom"
+        for key in ("completed_by", "dead_seconds"):
+            if key in wait_metrics:
+                metrics[key] = wait_metrics[key]
+    
+    record_latency(site_type, "completion", time.time() - submitted_at)
+    record_latency(site_type, "first_text", wait_metrics.get("first_text_seconds"))
+    record_latency(site_type, "gap", wait_metrics.get("max_gap_seconds"))
+    
+    # For ChatGPT, wait for answer to stop growing (indicating completion); the
+    # observer's quiet period, the closed stream and the page's own controls already cover this
+    if (site_type == "chatgpt" and COMPLETION_MODE != "observer" and capture is None
+            and wait_metrics.get("completed_by") not in SIGNAL_COMPLETIONS):
+        with timed_stage(metrics, "completion"):
+            print("⏳ Waiting for ChatGPT to finish typing...")
+            answer = wait_for_answer_completion(driver, answer, site_type)
     
     # Extract citations
-    print("🔍 Extracting citations...")
-    citations = extract_citations(driver, site_type)
+    with timed_stage(metrics, "citations"):
+        print("🔍 Extracting citations...")
+        if capture is not None:
+            citations = stream_citations(driver, capture, site_type)
+        else:
+            citations = extract_citations(driver, site_type)
     
     print(f"✅ Success! Answer: {len(answer)} chars, Citations: {len(citations)}")
+    driver.last_answer_text = answer
     
-    # Add delay after getting answer to appear more human-like
-    delay = random.uniform(2.0, 5.0)
-    print(f"⏸️  Waiting {delay:.1f}s after getting answer...")
-    time.sleep(delay)
-    
-    # Additional wait for Perplexity to ensure answer is fully rendered
-    if site_type == "perplexity":
-        extra_wait = random.uniform(2.0, 4.0)
-        print(f"⏸️  Additional {extra_wait:.1f}s for Perplexity completion...")
-        time.sleep(extra_wait)
+    with timed_stage(metrics, "post_sleep"):
+        # Add delay after getting answer to appear more human-like
+        delay = random.uniform(2.0, 5.0)
+        print(f"⏸️  Waiting {delay:.1f}s after getting answer...")
+        time.sleep(delay)
+        
+        # Additional wait for Perplexity to ensure answer is fully rendered
+        if site_type == "perplexity":
+            extra_wait = random.uniform(2.0, 4.0)
+            print(f"⏸️  Additional {extra_wait:.1f}s for Perplexity completion...")
+            time.sleep(extra_wait)
     
     return answer.strip(), citations
 
-def ask_one_fast(driver, prompt: str, site_type="perplexity") -> Tuple[str, List[str]]:
+def ask_one_fast(driver, prompt: str, site_type="perplexity",
+                 metrics: Optional[Dict] = None) -> Tuple[str, List[str]]:
     """Fast version for first prompt - quick fail to avoid bot detection"""
     print(f"\n🤖 Fast processing: {prompt[:60]}{'...' if len(prompt) > 60 else ''}")
     
-    # Navigate to the selected site
-    if site_type == "perplexity":
-        url = "https://www.perplexity.ai/"
-        print("🌐 Navigating to Perplexity...")
-    else:  # chatgpt
-        url = "https://chat.openai.com/"
-        print("🌐 Navigating to ChatGPT...")
-    
-    driver.get(url)
-    time.sleep(2)  # Shorter wait
-    
-    # Wait for page to be ready (not showing "Just a moment..." or similar)
-    print("⏳ Waiting for page to fully load (fast mode)...")
-    max_wait = 15  # Wait up to 15 seconds for page to load in fast mode
-    start_time = time.time()
-    while time.time() - start_time < max_wait:
-        if "just a moment" not in driver.title.lower() and "loading" not in driver.title.lower():
-            print("✅ Page appears to be loaded")
-            break
-        time.sleep(1)
-        print(f"⏳ Still waiting for page to load... ({int(time.time() - start_time)}s)")
-    
-    # Check if login needed
-    if "login" in driver.title.lower() or "sign in" in driver.title.lower():
-        if not wait_for_manual_login(driver):
-            raise Exception("Login not completed")
-        
-        # Add delay after login to appear more human-like
-        delay = random.uniform(2.0, 5.0)
-        print(f"⏸️  Waiting {delay:.1f}s after login (fast mode)...")
-        time.sleep(delay)
+    # Reuse the loaded app when possible, else do a full page load
+    nav_start = time.time()
+    with timed_stage(metrics, "navigate"):
+        input_el = try_reuse_session(driver, site_type)
+    nav_mode = "reuse" if input_el is not None else "load"
+    if input_el is None:
+        open_site(driver, site_type, settle=(2, 2), max_wait=15, login_delay=(2.0, 5.0),
+                  mode="fast mode", metrics=metrics)
+        with timed_stage(metrics, "find_input"):
+            input_el = get_input_element(driver, site_type)
+        if not input_el:
+            raise ScrapeError("Input field not found", "input_not_found")
     
-    # Find input field
-    input_el = get_input_element(driver, site_type)
-    if not input_el:
-        raise Exception("Input field not found")
+    if metrics is not None:
+        metrics["nav_mode"] = nav_mode
+        metrics["nav_seconds"] = round(time.time() - nav_start, 2)
     
     # Type and submit quickly
-    print("⌨️  Typing prompt quickly...")
-    human_like_typing(driver, input_el, prompt)
-    
-    # Submit with Enter
-    time.sleep(0.5)
-    input_el.send_keys(Keys.RETURN)
-    print("📤 Submitted prompt, waiting briefly...")
+    with timed_stage(metrics, "typing"):
+        print("⌨️  Typing prompt quickly...")
+        human_like_typing(driver, input_el, prompt)
+        
+        # Submit with Enter
+        time.sleep(0.5)
+        input_el.send_keys(Keys.RETURN)
+        print("📤 Submitted prompt, waiting briefly...")
     
     # Wait for answer with very short timeout
-    answer = wait_for_answer_fast(driver, site_type)
+    timeout = wait_budget(site_type, "first_text", default=30, floor=10)
+    if metrics is not None:
+        metrics["answer_timeout"] = round(timeout, 1)
+    with timed_stage(metrics, "wait_answer"):
+        answer = wait_for_answer_fast(driver, site_type, timeout)
     if not answer:
-        raise Exception("Answer not found quickly - skipping to avoid bot detection")
+        raise ScrapeError("Answer not found quickly - skipping to avoid bot detection", "answer_timeout")
     
     # For ChatGPT, wait for answer to stop growing even in fast mode
     if site_type == "chatgpt":
-        print("⏳ Waiting for ChatGPT to finish typing (fast mode)...")
-        answer = wait_for_answer_completion(driver, answer)
+        with timed_stage(metrics, "completion"):
+            print("⏳ Waiting for ChatGPT to finish typing (fast mode)...")
+            answer = wait_for_answer_completion(driver, answer, site_type)
     
     # Extract citations quickly
-    print("🔍 Extracting citations...")
-    citations = extract_citations(driver, site_type)
+    with timed_stage(metrics, "citations"):
+        print("🔍 Extracting citations...")
+        citations = extract_citations(driver, site_type)
     
     print(f"✅ Fast success! Answer: {len(answer)} chars, Citations: {len(citations)}")
     
     # Add delay after getting answer to appear more human-like
-    delay = random.uniform(1.0, 3.0)
-    print(f"⏸️  Waiting {delay:.1f}s after getting answer (fast mode)...")
-    time.sleep(delay)
+    with timed_stage(metrics, "post_sleep"):
+        delay = random.uniform(1.0, 3.0)
+        print(f"⏸️  Waiting {delay:.1f}s after getting answer (fast mode)...")
+        time.sleep(delay)
     
+    driver.last_answer_text = answer
     return answer.strip(), citations
 
-def wait_for_answer_fast(driver, site_type="perplexity") -> Optional[str]:
+def wait_for_answer_fast(driver, site_type="perplexity", timeout: Optional[float] = None) -> Optional[str]:
     """Fast answer detection with short timeout"""
-    selectors = [
-        "[data-testid='answer']",
-        "[data-testid='response']",
-        ".prose",
-        ".markdown",
-        ".answer",
-        ".response",
-        "main",
-        "div[role='main']",
-    ]
-    
-    print(f"🔍 Looking for answer quickly...")
-    print(f"⏰ Will wait up to 30 seconds (fast mode)...")
-    
-    start_time = time.time()
-    while time.time() - start_time < 30:  # Increased from 15 to 30 seconds
-        for sel in selectors:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, sel)
-                for elem in elements:
-                    try:
-                        text = elem.text.strip()
-                        # Look for substantial content that's not navigation
-                        if (len(text) > 150 and 
-                            not text.startswith('Home') and 
-                            not text.startswith('Discover') and
-                            not text.startswith('Spaces')):
-                            print(f"✅ Found answer quickly: {len(text)} chars")
-                            return text
-                    except:
-                        continue
-            except:
-                continue
+    if timeout is None:
+        timeout = wait_budget(site_type, "first_text", default=30, floor=10)
+    selectors = ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type])
+    
+    print("🔍 Looking for answer quickly...")
+    print(f"⏰ Will wait up to {timeout:.0f} seconds (fast mode)...")
+    
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        candidates = find_candidates(driver, selectors, min_length=150,
+                                     filters=NAVIGATION_FILTERS[site_type], first_match=True)
+        if candidates:
+            text = candidates[0]["text"]
+            record_latency(site_type, "first_text", time.time() - start_time)
+            record_selector_hit(site_type, "answer", candidates[0]["selector"])
+            print(f"✅ Found answer quickly: {len(text)} chars")
+            return text
         
         time.sleep(1)
     
     print("⏰ Fast timeout - answer not found quickly")
     return None
 
-def ask_one_super_fast(driver, prompt: str, site_type="perplexity") -> Tuple[str, List[str]]:
+def ask_one_super_fast(driver, prompt: str, site_type="perplexity",
+                       metrics: Optional[Dict] = None) -> Tuple[str, List[str]]:
     """Super fast version for fake prompts - only 10 seconds max"""
     print(f"\n🤖 Super fast processing: {prompt[:60]}{'...' if len(prompt) > 60 else ''}")
     
-    # Navigate to the selected site
-    if site_type == "perplexity":
-        url = "https://www.perplexity.ai/"
-        print("🌐 Navigating to Perplexity...")
-    else:  # chatgpt
-        url = "https://chat.openai.com/"
-        print("🌐 Navigating to ChatGPT...")
-    
-    driver.get(url)
-    time.sleep(1)  # Very short wait
-    
-    # Wait for page to be ready (not showing "Just a moment..." or similar)
-    print("⏳ Waiting for page to fully load (super fast mode)...")
-    max_wait = 10  # Wait up to 10 seconds for page to load in super fast mode
-    start_time = time.time()
-    while time.time() - start_time < max_wait:
-        if "just a moment" not in driver.title.lower() and "loading" not in driver.title.lower():
-            print("✅ Page appears to be loaded")
-            break
-        time.sleep(1)
-        print(f"⏳ Still waiting for page to load... ({int(time.time() - start_time)}s)")
-    
-    # Check if login needed
-    if "login" in driver.title.lower() or "sign in" in driver.title.lower():
-        if not wait_for_manual_login(driver):
-            raise Exception("Login not completed")
-        
-        # Add short delay after login to appear more human-like
-        delay = random.uniform(1.0, 2.0)
-        print(f"⏸️  Waiting {delay:.1f}s after login (super fast mode)...")
-        time.sleep(delay)
+    # Reuse the loaded app when possible, else do a full page load
+    nav_start = time.time()
+    with timed_stage(metrics, "navigate"):
+        input_el = try_reuse_session(driver, site_type)
+    nav_mode = "reuse" if input_el is not None else "load"
+    if input_el is None:
+        open_site(driver, site_type, settle=(1, 1), max_wait=10, login_delay=(1.0, 2.0),
+                  mode="super fast mode", metrics=metrics)
+        with timed_stage(metrics, "find_input"):
+            input_el = get_input_element(driver, site_type)
+        if not input_el:
+            raise ScrapeError("Input field not found", "input_not_found")
     
-    # Find input field
-    input_el = get_input_element(driver, site_type)
-    if not input_el:
-        raise Exception("Input field not found")
+    if metrics is not None:
+        metrics["nav_mode"] = nav_mode
+        metrics["nav_seconds"] = round(time.time() - nav_start, 2)
     
     # Type and submit quickly
-    print("⌨️  Typing prompt super quickly...")
-    human_like_typing(driver, input_el, prompt)
-    
-    # Submit with Enter
-    time.sleep(0.3)
-    input_el.send_keys(Keys.RETURN)
-    print("📤 Submitted prompt, waiting super briefly...")
+    with timed_stage(metrics, "typing"):
+        print("⌨️  Typing prompt super quickly...")
+        human_like_typing(driver, input_el, prompt)
+        
+        # Submit with Enter
+        time.sleep(0.3)
+        input_el.send_keys(Keys.RETURN)
+        print("📤 Submitted prompt, waiting super briefly...")
     
     # Wait for answer with very short timeout - only 10 seconds
-    answer = wait_for_answer_super_fast(driver, site_type)
+    with timed_stage(metrics, "wait_answer"):
+        answer = wait_for_answer_super_fast(driver, site_type)
     if not answer:
-        raise Exception("Answer not found in 10 seconds - skipping fake prompt")
+        raise ScrapeError("Answer not found in 10 seconds - skipping fake prompt", "answer_timeout")
     
     # Extract citations quickly
-    print("🔍 Extracting citations...")
-    citations = extract_citations(driver, site_type)
+    with timed_stage(metrics, "citations"):
+        print("🔍 Extracting citations...")
+        citations = extract_citations(driver, site_type)
     
     print(f"✅ Super fast success! Answer: {len(answer)} chars, Citations: {len(citations)}")
     
     # Add short delay after getting answer to appear more human-like
-    delay = random.uniform(0.5, 1.5)
-    print(f"⏸️  Waiting {delay:.1f}s after getting answer (super fast mode)...")
-    time.sleep(delay)
+    with timed_stage(metrics, "post_sleep"):
+        delay = random.uniform(0.5, 1.5)
+        print(f"⏸️  Waiting {delay:.1f}s after getting answer (super fast mode)...")
+        time.sleep(delay)
     
+    driver.last_answer_text = answer
     return answer.strip(), citations
 
-def wait_for_answer_super_fast(driver, site_type="perplexity") -> Optional[str]:
+def wait_for_answer_super_fast(driver, site_type="perplexity", timeout: Optional[float] = None) -> Optional[str]:
     """Super fast answer detection with only 10 second timeout"""
-    selectors = [
-        "[data-testid='answer']",
-        "[data-testid='response']",
-        ".prose",
-        ".markdown",
-        ".answer",
-        ".response",
-        "main",
-        "div[role='main']",
-    ]
+    if timeout is None:
+        timeout = wait_budget(site_type, "first_text", default=10, floor=5)
+    selectors = ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type])
     
-    print(f"🔍 Looking for answer super quickly...")
-    print(f"⏰ Will wait up to 10 seconds (super fast mode)...")
+    print("🔍 Looking for answer super quickly...")
+    print(f"⏰ Will wait up to {timeout:.0f} seconds (super fast mode)...")
     
     start_time = time.time()
-    while time.time() - start_time < 10:  # Only 10 seconds max
-        for sel in selectors:
-            try:
-                elements = driver.find_elements(By.CSS_SELECTOR, sel)
-                for elem in elements:
-                    try:
-                        text = elem.text.strip()
-                        # Look for any content, even short
-                        if (len(text) > 50 and 
-                            not text.startswith('Home') and 
-                            not text.startswith('Discover') and
-                            not text.startswith('Spaces')):
-                            print(f"✅ Found answer super quickly: {len(text)} chars")
-                            return text
-                    except:
-                        continue
-            except:
-                continue
+    while time.time() - start_time < timeout:
+        candidates = find_candidates(driver, selectors, min_length=50,
+                                     filters=NAVIGATION_FILTERS[site_type], first_match=True)
+        if candidates:
+            text = candidates[0]["text"]
+            record_selector_hit(site_type, "answer", candidates[0]["selector"])
+            print(f"✅ Found answer super quickly: {len(text)} chars")
+            return text
         
         time.sleep(0.5)  # Check more frequently
     
-    print("⏰ Super fast timeout - answer not found in 10 seconds")
+    print(f"⏰ Super fast timeout - answer not found in {timeout:.0f} seconds")
     return None
 
-def wait_for_answer_completion(driver, current_answer: str) -> str:
+def wait_for_answer_completion(driver, current_answer: str, site_type="chatgpt") -> str:
     """Wait for ChatGPT answer to stop growing (indicating completion)"""
     print("🔄 Monitoring answer length for completion...")
     
     last_length = len(current_answer)
     stable_count = 0
-    max_stable_time = 10  # Wait 10 seconds of stable length
+    max_stable_time = stable_window(site_type, 10)  # Default 10 seconds of stable length
+    max_wait = wait_budget(site_type, "completion", default=60, floor=20)  # Default max 60 seconds
     
     start_time = time.time()
-    while time.time() - start_time < 60:  # Max 60 seconds waiting for completion
+    while time.time() - start_time < max_wait:
         time.sleep(2)
         
         try:
@@ -810,172 +2618,1429 @@ def wait_for_answer_completion(driver, current_answer: str) -> str:
                 else:
                     stable_count = 0
                     last_length = new_length
-                    print(f"📈 Answer still growing...")
+                    print("📈 Answer still growing...")
         except:
             pass
     
     print("⏰ Timeout waiting for completion, using current answer")
     return current_answer
 
+def process_prompt(driver, n: int, i: int, prompt: str, site_type="perplexity") -> Dict:
+    """Run one prompt (with first-prompt warm-ups) and return its output row.
+
+    n is how many prompts this driver has handled (1-based) and decides the
+    warm-up behaviour; i is the prompt's position in the input and becomes idx.
+    """
+    before = getattr(driver, "round_trips", 0)
+    started = time.time()
+    metrics: Dict = {}
+    if WEBDRIVER_PROFILER is not None:
+        WEBDRIVER_PROFILER.begin_prompt(driver)
+    row = _run_prompt(driver, n, i, prompt, site_type, metrics)
+    metrics["t_total"] = round(time.time() - started, 3)
+    collect_network_metrics(driver, metrics)
+    row.update(metrics)
+    row["round_trips"] = getattr(driver, "round_trips", 0) - before
+    if WEBDRIVER_PROFILER is not None:
+        profile = WEBDRIVER_PROFILER.end_prompt(driver, i)
+        top = ", ".join(f"{caller} {entry['commands']}"
+                        for caller, entry in list(profile["by_caller"].items())[:3])
+        print(f"🔬 {profile['commands']} commands in {profile['seconds']:.1f}s ({top})")
+    
+    rss = browser_rss_bytes(driver)
+    if rss is not None:
+        row["browser_rss_mb"] = round(rss / 1e6, 1)
+    record_row_stats(row, metrics, rss)
+    return row
+
+
+def record_row_stats(row: Dict, metrics: Dict, rss: Optional[int] = None):
+    """Fold one finished prompt's measurements into RUN_STATS"""
+    RUN_STATS.observe("nav_seconds", metrics.get("nav_seconds"))
+    RUN_STATS.observe("answer_timeout", metrics.get("answer_timeout"))
+    for stage in STAGES + ["total"]:
+        RUN_STATS.observe(f"t_{stage}", metrics.get(f"t_{stage}"))
+    if rss is not None:
+        RUN_STATS.observe("browser_rss_mb", rss / 1e6)
+    RUN_STATS.observe("page_ready_ms", metrics.get("page_ready_ms"))
+    if metrics.get("bytes_received") is not None:
+        RUN_STATS.observe("network_kb", metrics["bytes_received"] / 1000)
+        RUN_STATS.incr("blocked_requests", metrics.get("blocked_requests", 0))
+    if metrics.get("nav_mode"):
+        RUN_STATS.incr(f"nav_{metrics['nav_mode']}")
+    if metrics.get("capture"):
+        RUN_STATS.incr(f"capture_{metrics['capture']}")
+    if metrics.get("completed_by"):
+        RUN_STATS.incr(f"completed_by_{metrics['completed_by']}")
+    RUN_STATS.observe("dead_seconds", metrics.get("dead_seconds"))
+    RUN_STATS.incr("prompts")
+    if not is_completed_row(row):
+        RUN_STATS.incr("failed_prompts")
+
+def _run_prompt(driver, n: int, i: int, prompt: str, site_type, metrics: Dict) -> Dict:
+    # Add fake first prompt for ChatGPT to warm up
+    if n == 1 and site_type == "chatgpt":
+        print("🚀 First prompt - sending fake 'Hello' to warm up ChatGPT (10s max)")
+        try:
+            # Send a simple "Hello" first - super fast
+            fake_answer, fake_citations = ask_one_super_fast(driver, "Hello", site_type)
+            print("✅ Fake prompt sent successfully, now processing real prompt...")
+            
+            # Add delay between fake and real prompt
+            delay = random.uniform(3.0, 8.0)
+            print(f"⏸️  Waiting {delay:.1f}s between fake and real prompt...")
+            time.sleep(delay)
+            
+            # Now process the real first prompt
+            answer, citations = ask_one(driver, prompt, site_type, metrics)
+            print("✅ First real prompt succeeded!")
+            return make_row(i, prompt, answer, citations, site_type)
+        except Exception as e:
+            print(f"❌ Error processing first prompt: {e}")
+            return error_row(i, prompt, e, site_type)
+    elif n == 2 and site_type == "chatgpt":
+        print("🚀 Second prompt - sending fake 'Are you there?' to continue warming up (10s max)")
+        try:
+            # Send "Are you there?" second - super fast
+            fake_answer, fake_citations = ask_one_super_fast(driver, "Are you there?", site_type)
+            print("✅ Second fake prompt sent successfully, now processing real prompt...")
+            
+            # Add delay between fake and real prompt
+            delay = random.uniform(3.0, 8.0)
+            print(f"⏸️  Waiting {delay:.1f}s between fake and real prompt...")
+            time.sleep(delay)
+            
+            # Now process the real second prompt
+            answer, citations = ask_one(driver, prompt, site_type, metrics)
+            print("✅ Second real prompt succeeded!")
+            return make_row(i, prompt, answer, citations, site_type)
+        except Exception as e:
+            print(f"❌ Error processing second prompt: {e}")
+            return error_row(i, prompt, e, site_type)
+    elif n == 1 and site_type == "perplexity":
+        print("🚀 First prompt - using fast-fail mode to avoid bot detection (Perplexity)")
+        try:
+            # Quick attempt for first prompt
+            answer, citations = ask_one_fast(driver, prompt, site_type, metrics)
+            print("✅ First prompt succeeded!")
+            return make_row(i, prompt, answer, citations, site_type)
+        except Exception as e:
+            print(f"❌ First prompt failed (expected): {e}")
+            print("⏭️  Skipping to next prompt...")
+            return error_row(i, prompt, e, site_type, "Skipped (bot detection)")
+    else:
+        # Normal processing for subsequent prompts
+        try:
+            answer, citations = ask_one(driver, prompt, site_type, metrics)
+            return make_row(i, prompt, answer, citations, site_type)
+        except Exception as e:
+            print(f"❌ Error processing prompt {i}: {e}")
+            return error_row(i, prompt, e, site_type)
+
+class NetworkMonitor:
+    """Per-prompt network figures from Chrome's performance log.
+
+    drain() reads the log entries buffered since the last call (one round
+    trip) and folds them into running totals; take() returns and resets them.
+    Parsed messages are returned so other consumers can look at them too.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.reset()
+
+    def reset(self):
+        self.totals = {"bytes_received": 0, "requests": 0, "blocked_requests": 0}
+
+    def drain(self) -> List[Dict]:
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception as e:
+            print(f"⚠️  Could not read the performance log: {e}")
+            return []
+        messages = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError, TypeError):
+                continue
+            method = message.get("method", "")
+            params = message.get("params", {})
+            if method == "Network.requestWillBeSent":
+                self.totals["requests"] += 1
+            elif method == "Network.loadingFinished":
+                self.totals["bytes_received"] += int(params.get("encodedDataLength") or 0)
+            elif method == "Network.loadingFailed" and params.get("blockedReason"):
+                self.totals["blocked_requests"] += 1
+            messages.append(message)
+        return messages
+
+    def take(self) -> Dict[str, int]:
+        self.drain()
+        totals = self.totals
+        self.reset()
+        return totals
+
+def collect_network_metrics(driver, metrics: Dict):
+    """Move the driver's network totals since the last prompt into metrics"""
+    monitor = getattr(driver, "network_monitor", None)
+    if monitor is not None:
+        metrics.update(monitor.take())
+
+def page_ready_ms(driver) -> Optional[float]:
+    """DOMContentLoaded time of the current document from the Navigation Timing API"""
+    try:
+        return driver.execute_script(
+            "const n = performance.getEntriesByType('navigation')[0];"
+            "return n ? Math.round(n.domContentLoadedEventEnd) : null;")
+    except Exception:
+        return None
+
+def load_block_patterns(path: Optional[str]) -> List[str]:
+    """Default blocked URL patterns plus any from a file (one per line, # comments)"""
+    patterns = list(BLOCKED_URL_PATTERNS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line and line not in patterns:
+                    patterns.append(line)
+    return patterns
+
+def create_driver(args, profile_dir: Optional[str] = None):
+    """Launch Chrome with the scraper's standard options"""
+    options = Options()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    if getattr(args, "tabs", 1) > 1:
+        # Background tabs must keep rendering the answers that stream into them
+        options.add_argument("--disable-background-timer-throttling")
+        options.add_argument("--disable-backgrounding-occluded-windows")
+        options.add_argument("--disable-renderer-backgrounding")
+    lean = getattr(args, "lean", False)
+    if getattr(args, "headless", False) or lean:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+    if lean:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--mute-audio")
+        options.add_argument("--disable-extensions")
+    monitor = (lean or getattr(args, "network_stats", False)
+               or getattr(args, "capture", "dom") == "network")
+    if monitor:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if profile_dir:
+        # Separate profiles let several browsers run side by side
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    
+    driver = webdriver.Chrome(options=options)
+    install_round_trip_counter(driver)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    driver.blocked_url_patterns = (getattr(args, "block_patterns", None) or BLOCKED_URL_PATTERNS) if lean else None
+    apply_request_blocking(driver)
+    driver.network_monitor = NetworkMonitor(driver) if monitor else None
+    return driver
+
+def apply_request_blocking(driver):
+    """Block driver.blocked_url_patterns (--lean) in the current tab.
+
+    CDP commands go to the tab the driver is switched to, so every tab opened
+    later needs this call as well.
+    """
+    patterns = getattr(driver, "blocked_url_patterns", None)
+    if patterns:
+        # Requests matching these patterns fail before they leave the browser
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+# Error messages of a browser or chromedriver that is gone for good
+DEAD_SESSION_MARKERS = ("invalid session id", "no such session", "session deleted", "chrome not reachable",
+                        "disconnected:", "target crashed", "tab crashed", "failed to establish a new connection",
+                        "connection refused", "max retries exceeded",
+                        # Playwright's wording for a page, context or browser that went away
+                        "has been closed", "browser closed")
+
+class BrowserCrashed(Exception):
+    """The browser session died; jobs holds the (seq, idx, prompt) jobs that were in flight"""
+
+    def __init__(self, cause, jobs: Iterable = ()):
+        super().__init__(str(cause))
+        self.jobs = list(jobs)
+
+def is_session_dead(error: BaseException) -> bool:
+    """True if the error means the browser or chromedriver is gone (not just a page problem)"""
+    if isinstance(error, (BrowserCrashed, InvalidSessionIdException, ConnectionError,
+                          MaxRetryError, ProtocolError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in DEAD_SESSION_MARKERS)
+
+class DriverSupervisor:
+    """Owns one browser and relaunches it, with the same options and profile, when its session dies.
+
+    At most max_restarts relaunches are allowed, after which dead is set and
+    callers stop feeding it. Restarts, their cost and the prompts run again go
+    to RUN_STATS (driver_restarts, restart_seconds, rerun_prompts). prompts
+    counts what the current browser has handled and drives the first-prompt
+    warm-ups, so a relaunched browser warms up again.
+
+    The browser is also recycled between prompts (see maybe_recycle) after
+    recycle_every prompts or once its process tree uses recycle_rss_mb MB;
+    every finished prompt adds a point to the "memory" timeline of the report.
+    """
+
+    def __init__(self, args, profile_dir: Optional[str] = None, max_restarts: int = 3,
+                 recycle_every: int = 0, recycle_rss_mb: float = 0.0):
+        self.args = args
+        self.profile_dir = profile_dir
+        self.max_restarts = max_restarts
+        self.recycle_every = recycle_every
+        self.recycle_rss_mb = recycle_rss_mb
+        self.restarts = 0
+        self.generation = 1
+        self.prompts = 0
+        self.rss_mb: Optional[float] = None
+        self.dead = False
+        self.driver = create_driver(args, profile_dir)
+
+    def _relaunch(self) -> float:
+        """Replace the browser with a fresh one; returns how long that took"""
+        started = time.time()
+        self.quit()
+        self.driver = create_driver(self.args, self.profile_dir)
+        self.generation += 1
+        self.prompts = 0
+        self.rss_mb = None
+        return time.time() - started
+
+    def record(self, row: Dict):
+        """Note a finished prompt's memory reading for the recycling policy and the timeline"""
+        self.rss_mb = row.get("browser_rss_mb", self.rss_mb)
+        RUN_STATS.sample("memory", browser=self.generation, prompts=self.prompts, rss_mb=self.rss_mb)
+
+    def recycle_due(self) -> Optional[str]:
+        if self.recycle_every and self.prompts >= self.recycle_every:
+            return f"{self.prompts} prompts"
+        if self.recycle_rss_mb and self.rss_mb is not None and self.rss_mb >= self.recycle_rss_mb:
+            return f"reaching {self.rss_mb:.0f} MB"
+        return None
+
+    def maybe_recycle(self) -> bool:
+        """Swap in a fresh browser if the policy says so; only call this between prompts"""
+        reason = self.recycle_due()
+        if reason is None:
+            return False
+        print(f"♻️  Recycling the browser after {reason}...")
+        cost = self._relaunch()
+        RUN_STATS.incr("driver_recycles")
+        RUN_STATS.observe("recycle_seconds", cost)
+        print(f"🔄 Fresh browser ready in {cost:.1f}s")
+        return True
+
+    def alive(self) -> bool:
+        try:
+            self.driver.current_url
+            return True
+        except Exception as e:
+            return not is_session_dead(e)
+
+    def restart(self, reason) -> bool:
+        """Relaunch the browser; False once the restart budget is used up"""
+        if self.restarts >= self.max_restarts:
+            print(f"🛑 Browser died again after {self.restarts} restarts ({str(reason)[:120]}); giving up")
+            self.dead = True
+            return False
+        print(f"💥 Browser session lost ({str(reason)[:120]}); relaunching...")
+        cost = self._relaunch()
+        self.restarts += 1
+        RUN_STATS.incr("driver_restarts")
+        RUN_STATS.observe("restart_seconds", cost)
+        print(f"🔄 Browser relaunched in {cost:.1f}s (restart {self.restarts}/{self.max_restarts})")
+        return True
+
+    def process(self, i: int, prompt: str, site_type: str) -> Dict:
+        """process_prompt() that relaunches a dead browser and runs the prompt again"""
+        while True:
+            self.prompts += 1
+            try:
+                row = process_prompt(self.driver, self.prompts, i, prompt, site_type)
+            except Exception as e:
+                if not is_session_dead(e):
+                    raise
+                row = error_row(i, prompt, e, site_type)
+            else:
+                # Failed rows are the only ones that can hide a dead session
+                if is_completed_row(row) or self.alive():
+                    self.record(row)
+                    return row
+            if not self.restart(row["answer"]):
+                return row
+            RUN_STATS.incr("rerun_prompts")
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            # chromedriver is already gone; make sure its process is too
+            try:
+                self.driver.service.stop()
+            except Exception:
+                pass
+
+def process_tree_rss_bytes(root_pid: int) -> Optional[int]:
+    """Resident memory of a process and all its descendants (Linux /proc only)"""
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, so parse after its closing paren
+        ppid = int(stat[stat.rfind(b")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except OSError:
+            continue
+        stack.extend(children.get(pid, []))
+    return total
+
+def browser_rss_bytes(driver) -> Optional[int]:
+    """Resident memory of chromedriver plus the browser processes it launched"""
+    try:
+        pid = driver.service.process.pid
+    except Exception:
+        return None
+    return process_tree_rss_bytes(pid)
+
+class OrderedResultWriter:
+    """Thread-safe writer that emits rows in submission order.
+
+    Workers finish prompts out of order; rows are held until every earlier
+    sequence number has arrived, so the output reads like a serial run.
+    """
+
+    def __init__(self, sink, first_seq: int = 1):
+        self.sink = sink
+        self._next_seq = first_seq
+        self._pending: Dict[int, Optional[Dict]] = {}
+        self._deferred = set()
+        self._lock = threading.Lock()
+
+    def submit(self, seq: int, row: Dict):
+        with self._lock:
+            if seq in self._deferred:
+                # Final row of a retried prompt: later rows were not held back for it
+                self._deferred.discard(seq)
+                self.sink.write(row)
+                return
+            self._pending[seq] = row
+            self._advance()
+
+    def defer(self, seq: int):
+        """seq's row will come later (it is being retried); stop holding later rows back for it"""
+        with self._lock:
+            if seq in self._deferred:
+                return
+            self._deferred.add(seq)
+            self._pending[seq] = None
+            self._advance()
+
+    def _advance(self):
+        while self._next_seq in self._pending:
+            row = self._pending.pop(self._next_seq)
+            if row is not None:
+                self.sink.write(row)
+            self._next_seq += 1
+
+    def settle(self, feed: JobFeed, seq: int, row: Dict):
+        """Hand a finished attempt to the feed and write the row if it is final"""
+        if feed.finish(seq, row):
+            self.submit(seq, row)
+        else:
+            self.defer(seq)
+
+    def flush_remaining(self):
+        """Write anything still buffered (only happens if a sequence number never arrived)"""
+        with self._lock:
+            for seq in sorted(self._pending):
+                row = self._pending.pop(seq)
+                if row is not None:
+                    self.sink.write(row)
+
+class TabSlot:
+    """One browser tab in the tab scheduler and the prompt it is working on"""
+
+    def __init__(self, handle: str):
+        self.handle = handle
+        self.job: Optional[Tuple[int, int, str]] = None
+        self.tracker: Optional[AnswerTracker] = None
+        self.metrics: Dict = {}
+        self.wait_metrics: Dict = {}
+        self.started = 0.0
+        self.submitted_at = 0.0
+        self.ready_at = 0.0
+        self.round_trips = 0
+        self.command_profile: Optional[Dict] = None
+        self.last_answer: Optional[str] = None
+
+@contextmanager
+def _on_tab(driver, slot: TabSlot):
+    """Switch to the slot's tab and charge the commands sent meanwhile to its prompt"""
+    before = getattr(driver, "round_trips", 0)
+    driver.command_profile = slot.command_profile
+    try:
+        driver.switch_to.window(slot.handle)
+        yield
+    finally:
+        driver.command_profile = None
+        slot.round_trips += getattr(driver, "round_trips", 0) - before
+
+def _start_tab_prompt(driver, slot: TabSlot, site_type: str):
+    """Load, type and submit the slot's prompt, then leave the answer to stream"""
+    seq, i, prompt = slot.job
+    print(f"\n🗂️  [tab {slot.handle[-6:]}] Submitting prompt #{i}: {prompt[:60]}")
+    metrics = slot.metrics
+    # The stale-answer check in try_reuse_session must look at this tab's last answer
+    driver.last_answer_text = slot.last_answer
+    nav_start = time.time()
+    with timed_stage(metrics, "navigate"):
+        input_el = try_reuse_session(driver, site_type)
+    nav_mode = "reuse" if input_el is not None else "load"
+    if input_el is None:
+        open_site(driver, site_type, settle=(1, 2), max_wait=30, login_delay=(3.0, 8.0),
+                  mode="tab", metrics=metrics)
+        with timed_stage(metrics, "find_input"):
+            input_el = get_input_element(driver, site_type)
+            if not input_el:
+                time.sleep(3)
+                input_el = get_input_element(driver, site_type)
+            if not input_el:
+                raise ScrapeError("Could not find input field", "input_not_found")
+    metrics["nav_mode"] = nav_mode
+    metrics["nav_seconds"] = round(time.time() - nav_start, 2)
+    
+    with timed_stage(metrics, "typing"):
+        human_like_typing(driver, input_el, prompt)
+        time.sleep(random.uniform(0.3, 0.8))
+        input_el.send_keys(Keys.RETURN)
+    
+    timeout = wait_budget(site_type, "completion", default=ANSWER_WAIT_SECONDS, floor=30)
+    stable_polls = stable_window(site_type, 8)
+    metrics["answer_timeout"] = round(timeout, 1)
+    metrics["stable_window"] = stable_polls
+    slot.submitted_at = time.time()
+    slot.tracker = AnswerTracker(timeout, stable_polls, slot.wait_metrics,
+                                 ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type]))
+
+def _poll_tab(driver, slot: TabSlot, site_type: str) -> bool:
+    """One non-blocking look at the slot's answer (same probe and rules as wait_for_answer);
+    True once it is complete or timed out"""
+    how = slot.tracker.poll(*probe_answer(driver, site_type, slot.tracker.selectors))
+    if how is None and slot.tracker.timed_out:
+        how = "timeout"
+    if how is None:
+        return False
+    slot.tracker.complete(how)
+    return True
+
+def _finish_tab_prompt(driver, slot: TabSlot, site_type: str) -> Dict:
+    seq, i, prompt = slot.job
+    metrics = slot.metrics
+    metrics["t_wait_answer"] = round(time.time() - slot.submitted_at, 3)
+    for key in ("completed_by", "dead_seconds"):
+        if key in slot.wait_metrics:
+            metrics[key] = slot.wait_metrics[key]
+    answer = slot.tracker.text
+    if not answer:
+        raise ScrapeError("Could not capture answer", "answer_timeout")
+    if slot.wait_metrics.get("completed_by") != "timeout":
+        record_selector_hit(site_type, "answer", slot.tracker.selector)
+    record_latency(site_type, "completion", time.time() - slot.submitted_at)
+    record_latency(site_type, "first_text", slot.wait_metrics.get("first_text_seconds"))
+    record_latency(site_type, "gap", slot.wait_metrics.get("max_gap_seconds"))
+    with timed_stage(metrics, "citations"):
+        citations = extract_citations(driver, site_type)
+    slot.last_answer = answer
+    print(f"✅ [tab {slot.handle[-6:]}] #{i}: {len(answer)} chars, {len(citations)} citations")
+    return make_row(i, prompt, answer.strip(), citations, site_type)
+
+def _close_tab_prompt(driver, slot: TabSlot, row: Dict) -> Dict:
+    """Attach the slot's measurements to its row and free the slot"""
+    seq, i, prompt = slot.job
+    slot.metrics["t_total"] = round(time.time() - slot.started, 3)
+    # The performance log is shared by all tabs: this is the browser's traffic since the last prompt finished
+    collect_network_metrics(driver, slot.metrics)
+    row.update(slot.metrics)
+    row["round_trips"] = slot.round_trips
+    if WEBDRIVER_PROFILER is not None:
+        driver.command_profile = slot.command_profile
+        WEBDRIVER_PROFILER.end_prompt(driver, i)
+    rss = browser_rss_bytes(driver)
+    if rss is not None:
+        row["browser_rss_mb"] = round(rss / 1e6, 1)
+    record_row_stats(row, slot.metrics, rss)
+    slot.job = None
+    slot.tracker = None
+    # Space out this tab's next prompt like a human would
+    slot.ready_at = time.time() + random.uniform(*PER_PROMPT_DELAY)
+    return row
+
+def run_tabs(driver, site_type: str, tabs: int, next_job, emit, poll_interval: float = 1.0) -> int:
+    """Multiplex prompts over `tabs` tabs of one driver; returns how many prompts ran.
+
+    next_job() returns (seq, idx, prompt) or None when the queue is empty and
+    emit(seq, row) receives each finished row (in completion order). Each tab
+    submits its prompt and then waits without blocking: the scheduler cycles
+    through the tabs, taking one answer reading per tab, so answer waits overlap.
+    """
+    slots = [TabSlot(driver.current_window_handle)]
+    for _ in range(tabs - 1):
+        driver.switch_to.new_window("tab")
+        apply_request_blocking(driver)
+        slots.append(TabSlot(driver.current_window_handle))
+    print(f"🗂️  Multiplexing prompts over {len(slots)} tabs")
+    
+    done = 0
+    exhausted = False
+    while True:
+        cycle_start = time.time()
+        busy = 0
+        for slot in slots:
+            if slot.job is None:
+                if exhausted or time.time() < slot.ready_at:
+                    continue
+                job = next_job()
+                if job is None:
+                    exhausted = True
+                    continue
+                slot.job = job
+                slot.started = time.time()
+                slot.metrics, slot.wait_metrics, slot.round_trips = {}, {}, 0
+                slot.command_profile = {} if WEBDRIVER_PROFILER is not None else None
+                try:
+                    with _on_tab(driver, slot):
+                        _start_tab_prompt(driver, slot, site_type)
+                except Exception as e:
+                    if is_session_dead(e):
+                        raise BrowserCrashed(e, [s.job for s in slots if s.job])
+                    print(f"❌ Error submitting prompt {job[1]}: {e}")
+                    row = error_row(job[1], job[2], e, site_type)
+                    emit(job[0], _close_tab_prompt(driver, slot, row))
+                    done += 1
+                    continue
+            
+            busy += 1
+            try:
+                with _on_tab(driver, slot):
+                    if not _poll_tab(driver, slot, site_type):
+                        continue
+                    row = _finish_tab_prompt(driver, slot, site_type)
+            except Exception as e:
+                if is_session_dead(e):
+                    raise BrowserCrashed(e, [s.job for s in slots if s.job])
+                print(f"❌ Error processing prompt {slot.job[1]}: {e}")
+                row = error_row(slot.job[1], slot.job[2], e, site_type)
+            seq = slot.job[0]
+            emit(seq, _close_tab_prompt(driver, slot, row))
+            done += 1
+        
+        if exhausted and not any(slot.job for slot in slots):
+            break
+        if busy == 0 and not exhausted:
+            # Every tab is pausing between prompts
+            time.sleep(0.2)
+            continue
+        # Aim for about one reading per tab per poll interval
+        elapsed = time.time() - cycle_start
+        if elapsed < poll_interval:
+            time.sleep(poll_interval - elapsed)
+    return done
+
+def run_driver_tabs(browser: DriverSupervisor, feed: JobFeed, emit) -> int:
+    """Run the usual warm-up prompts one at a time, then multiplex the rest over args.tabs tabs.
+
+    emit(seq, row) gets every attempt's row; it must report it to the feed.
+    If the browser dies it is relaunched, warmed up again, and the prompts
+    that were in flight in its tabs are run first. When the browser is due
+    for recycling the tabs stop taking prompts, finish the ones they have,
+    and the rest continue on a fresh browser. Once the tabs run dry, retries
+    still in backoff are waited for.
+    """
+    args = browser.args
+    warmups = 2 if args.site == "chatgpt" else 1
+    retry: List[Tuple[int, int, str]] = []
+    done = 0
+    draining = False
+    
+    def pull():
+        nonlocal draining
+        if draining:
+            return None
+        if retry:
+            return retry.pop(0)
+        job = feed.next(block=False)
+        if job is not None and browser.recycle_due():
+            # Hold the job for the fresh browser and let the tabs run dry
+            retry.append(job)
+            draining = True
+            return None
+        return job
+    
+    def counted(seq: int, row: Dict):
+        nonlocal done
+        done += 1
+        emit(seq, row)
+    
+    def tab_done(seq: int, row: Dict):
+        browser.prompts += 1
+        browser.record(row)
+        counted(seq, row)
+    
+    while True:
+        browser.maybe_recycle()
+        draining = False
+        try:
+            while browser.prompts < warmups:
+                job = pull()
+                if job is None:
+                    break
+                seq, i, prompt = job
+                counted(seq, browser.process(i, prompt, args.site))
+                if browser.dead:
+                    return done
+            else:
+                run_tabs(browser.driver, args.site, args.tabs, pull, tab_done)
+        except Exception as e:
+            if not is_session_dead(e):
+                raise
+            retry[:0] = getattr(e, "jobs", [])
+            if not browser.restart(e):
+                for seq, i, prompt in retry:
+                    counted(seq, error_row(i, prompt, e, args.site))
+                return done
+            RUN_STATS.incr("rerun_prompts", len(retry))
+            continue
+        if not draining:
+            # Wait for a deferred retry to come due (None once everything is final)
+            job = feed.next()
+            if job is None:
+                return done
+            retry.append(job)
+
+def _worker_loop(worker_id: int, args, feed: JobFeed, writer: OrderedResultWriter,
+                 profile_dir: str, stats: Dict):
+    """Pull prompts off the shared feed with a dedicated browser until it runs dry"""
+    # Stagger launches so the browsers don't all hit the site at once
+    time.sleep((worker_id - 1) * random.uniform(1.0, 2.0))
+    try:
+        browser = DriverSupervisor(args, profile_dir, args.max_restarts,
+                                   args.recycle_every, args.recycle_rss_mb)
+    except Exception as e:
+        print(f"❌ [worker {worker_id}] Could not start Chrome: {e}")
+        stats["failed_to_start"] = True
+        return
+    
+    def emit(seq: int, row: Dict):
+        stats["prompts"] += 1
+        stats["round_trips"] += row.get("round_trips") or 0
+        if row["answer"].startswith(RETRY_ANSWER_PREFIXES):
+            stats["errors"] += 1
+        writer.settle(feed, seq, row)
+    
+    try:
+        if args.tabs > 1:
+            started = time.time()
+            run_driver_tabs(browser, feed, emit)
+            stats["busy_seconds"] += time.time() - started
+            return
+        
+        n = 0
+        last_answer = ""
+        while True:
+            job = feed.next()
+            if job is None:
+                break
+            seq, i, prompt = job
+            n += 1
+            # Pause between prompts; the feed is lazy, so the pause comes before the next one
+            if n > 1 and not last_answer.startswith("Skipped"):
+                time.sleep(random.uniform(*PER_PROMPT_DELAY))
+            browser.maybe_recycle()
+            print(f"\n📝 [worker {worker_id}] Processing prompt #{i}")
+            started = time.time()
+            try:
+                row = browser.process(i, prompt, args.site)
+            except Exception as e:
+                # Every job handed out must be reported back, or the other workers wait for it
+                row = error_row(i, prompt, e, args.site)
+            stats["busy_seconds"] += time.time() - started
+            emit(seq, row)
+            last_answer = row["answer"]
+            if browser.dead:
+                break
+    finally:
+        stats["restarts"] = browser.restarts
+        browser.quit()
+
+# Chrome's per-instance lock files; a copied profile must not inherit them
+PROFILE_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile")
+
+def seed_worker_profile(base_dir: str, profile_dir: str):
+    """Start a new worker profile as a copy of the base --profile-dir profile (its login included)"""
+    base = Path(base_dir)
+    if Path(profile_dir).exists() or not (base / "Default").is_dir():
+        return
+    print(f"🌱 Seeding {profile_dir} from the profile in {base_dir}")
+    shutil.copytree(base, profile_dir,
+                    ignore=shutil.ignore_patterns("worker-*", *PROFILE_LOCK_FILES))
+
+def run_workers(args, pending: Iterable[Tuple[int, str]], sink) -> List[Dict]:
+    """Process prompts with args.workers browsers sharing one feed; returns per-worker stats"""
+    feed = JobFeed(pending, args.max_attempts, args.retry_backoff)
+    
+    writer = OrderedResultWriter(sink)
+    base_dir = args.profile_dir or tempfile.mkdtemp(prefix="ai-scraper-profiles-")
+    
+    all_stats = []
+    threads = []
+    started = time.time()
+    for w in range(1, args.workers + 1):
+        profile_dir = str(Path(base_dir) / f"worker-{w}")
+        if args.profile_dir:
+            seed_worker_profile(base_dir, profile_dir)
+        stats = {"worker": w, "prompts": 0, "errors": 0, "busy_seconds": 0.0, "round_trips": 0}
+        all_stats.append(stats)
+        t = threading.Thread(target=_worker_loop, name=f"worker-{w}",
+                             args=(w, args, feed, writer, profile_dir, stats), daemon=True)
+        t.start()
+        threads.append(t)
+    
+    for t in threads:
+        t.join()
+    wall = time.time() - started
+    
+    # If every browser died, record what was left instead of dropping it
+    for seq, row in abandoned_rows(feed, "No worker available", args.site):
+        writer.submit(seq, row)
+    writer.flush_remaining()
+    
+    print(f"\n{'='*60}")
+    print(f"👷 Worker throughput ({wall:.0f}s wall time)")
+    print(f"{'='*60}")
+    total = 0
+    for stats in all_stats:
+        total += stats["prompts"]
+        if stats.get("failed_to_start"):
+            print(f"  worker {stats['worker']}: failed to start")
+            continue
+        rate = stats["prompts"] / wall * 60 if wall > 0 else 0.0
+        avg = stats["busy_seconds"] / stats["prompts"] if stats["prompts"] else 0.0
+        trips = stats["round_trips"] / stats["prompts"] if stats["prompts"] else 0.0
+        print(f"  worker {stats['worker']}: {stats['prompts']} prompts "
+              f"({stats['errors']} failed), {rate:.2f} prompts/min, {avg:.1f}s avg per prompt, "
+              f"{trips:.0f} WebDriver round trips per prompt"
+              + (f", {stats['restarts']} browser restarts" if stats.get("restarts") else ""))
+    if wall > 0:
+        print(f"  total: {total} prompts, {total / wall * 60:.2f} prompts/min")
+    return all_stats
+
+# Playwright backend: the same ask/answer/citation flow on many concurrent
+# pages of one browser process (selected with --backend playwright)
+
+def _page_function(script: str) -> str:
+    """Wrap a WebDriver-style script body (arguments[i], return) as a Playwright page function"""
+    return f"(args) => (function() {{\n{script}\n}}).apply(null, args)"
+
+async def pw_find_candidates(page, selectors: List[str], min_length: int = 0, filters=(),
+                             with_text: bool = True, first_visible: bool = False,
+                             first_match: bool = False) -> List[Dict]:
+    """find_candidates() for a Playwright page (same probe script, no element handles)"""
+    opts = _probe_options(min_length, filters, with_text, False, first_visible, first_match)
+    try:
+        result = await page.evaluate(_page_function(PROBE_SELECTORS_JS), [selectors, opts])
+    except Exception as e:
+        print(f"⚠️  Probe failed: {e}")
+        return []
+    return result if isinstance(result, list) else []
+
+async def pw_probe_answer(page, site_type: str, selectors: List[str]) -> Tuple[List[Dict], Optional[Dict]]:
+    """probe_answer() for a Playwright page (same script and options)"""
+    if COMPLETION_MODE == "signals":
+        try:
+            state = await page.evaluate(_page_function(ANSWER_STATE_JS),
+                                        [selectors, _answer_probe_options(site_type), GENERATION_SIGNALS[site_type]])
+            if isinstance(state, dict):
+                return state.get("candidates") or [], state
+        except Exception as e:
+            print(f"⚠️  Generation-state probe failed, using length stability only: {e}")
+    return await pw_find_candidates(page, selectors, min_length=150, filters=NAVIGATION_FILTERS[site_type],
+                                    first_match=True), None
+
+async def pw_get_input_element(page, site_type="perplexity"):
+    """Locator for the first visible input field, or None"""
+    selectors = ordered_selectors(site_type, "input", INPUT_SELECTORS[site_type])
+    for cand in await pw_find_candidates(page, selectors, with_text=False, first_visible=True):
+        if cand["visible"]:
+            record_selector_hit(site_type, "input", cand["selector"])
+            return page.locator(cand["selector"]).nth(cand["index"])
+    return None
+
+async def pw_wait_for_answer(page, site_type="perplexity", timeout: Optional[float] = None,
+                             stable_polls: Optional[int] = None,
+                             metrics: Optional[Dict] = None) -> Optional[str]:
+    """wait_for_answer() for a Playwright page: the same probe and AnswerTracker rules"""
+    if timeout is None:
+        timeout = ANSWER_WAIT_SECONDS
+    if stable_polls is None:
+        stable_polls = 8
+    selectors = ordered_selectors(site_type, "answer", ANSWER_SELECTORS[site_type])
+    
+    tracker = AnswerTracker(timeout, stable_polls, metrics, selectors)
+    while not tracker.timed_out:
+        how = tracker.poll(*await pw_probe_answer(page, site_type, selectors))
+        if how is not None:
+            record_selector_hit(site_type, "answer", tracker.selector)
+            tracker.complete(how)
+            return tracker.text
+        await asyncio.sleep(1)
+    
+    tracker.complete("timeout")
+    if tracker.text:
+        print(f"⏰ Timeout - returning current answer: {len(tracker.text)} chars")
+    return tracker.text
+
+async def pw_extract_citations(page, site_type="perplexity") -> List[str]:
+    """extract_citations() for a Playwright page"""
+    try:
+        anchors = await page.evaluate(_page_function(HARVEST_ANCHORS_JS),
+                                      [CITATION_SELECTORS[site_type], ANSWER_SELECTORS[site_type]])
+    except Exception as e:
+        print(f"⚠️  Anchor harvest failed: {e}")
+        anchors = []
+    links = set(clean_citation_urls(anchors or [], site_type))
+    
+    if site_type == "chatgpt":
+        candidates = await pw_find_candidates(page, ANSWER_TEXT_SELECTORS, min_length=100, first_match=True)
+        if candidates:
+            links.update(extract_text_citations(candidates[0]["text"], existing=links,
+                                                exclude_domains=INTERNAL_LINK_DOMAINS[site_type]))
+    
+    result = sorted(links)
+    if site_type == "chatgpt" and not result:
+        result = ["No external citations found (ChatGPT typically doesn't provide external links)"]
+    return result
+
+async def pw_ask_one(page, prompt: str, site_type="perplexity", metrics: Optional[Dict] = None,
+                     login_lock: Optional[asyncio.Lock] = None) -> Tuple[str, List[str]]:
+    """ask_one() for a Playwright page: load, type, wait for the answer, collect citations"""
+    nav_start = time.time()
+    with timed_stage(metrics, "navigate"):
+        await page.goto(SITE_URLS[site_type], wait_until="domcontentloaded")
+    
+    with timed_stage(metrics, "page_load"):
+        await asyncio.sleep(random.uniform(1, 2))
+        start_time = time.time()
+        while time.time() - start_time < 30:
+            title = (await page.title()).lower()
+            if "just a moment" not in title and "loading" not in title:
+                break
+            await asyncio.sleep(1)
+    
+    if is_login_wall(await page.title(), page.url):
+        with timed_stage(metrics, "login"):
+            # One prompt at a time; the shared context keeps the session for the other pages
+            async with login_lock or asyncio.Lock():
+                if not await asyncio.to_thread(wait_for_manual_login, None):
+                    raise ScrapeError("Login not completed", "login_required")
+                await page.reload()
+    
+    with timed_stage(metrics, "find_input"):
+        input_el = await pw_get_input_element(page, site_type)
+        if input_el is None:
+            await asyncio.sleep(3)
+            input_el = await pw_get_input_element(page, site_type)
+        if input_el is None:
+            raise ScrapeError("Could not find input field", "input_not_found")
+    
+    if metrics is not None:
+        metrics["nav_mode"] = "load"
+        metrics["nav_seconds"] = round(time.time() - nav_start, 2)
+    
+    with timed_stage(metrics, "typing"):
+        await input_el.click()
+        await input_el.press_sequentially(prompt, delay=random.uniform(30, 80))
+        await asyncio.sleep(random.uniform(0.3, 0.8))
+        await input_el.press("Enter")
+    
+    timeout = wait_budget(site_type, "completion", default=ANSWER_WAIT_SECONDS, floor=30)
+    stable_polls = stable_window(site_type, 8)
+    wait_metrics: Dict = {}
+    if metrics is not None:
+        metrics["answer_timeout"] = round(timeout, 1)
+        metrics["stable_window"] = stable_polls
+    
+    submitted_at = time.time()
+    with timed_stage(metrics, "wait_answer"):
+        answer = await pw_wait_for_answer(page, site_type, timeout, stable_polls, wait_metrics)
+    if not answer:
+        raise ScrapeError("Could not capture answer", "answer_timeout")
+    if metrics is not None:
+        for key in ("completed_by", "dead_seconds"):
+            if key in wait_metrics:
+                metrics[key] = wait_metrics[key]
+    record_latency(site_type, "completion", time.time() - submitted_at)
+    record_latency(site_type, "first_text", wait_metrics.get("first_text_seconds"))
+    record_latency(site_type, "gap", wait_metrics.get("max_gap_seconds"))
+    
+    with timed_stage(metrics, "citations"):
+        citations = await pw_extract_citations(page, site_type)
+    
+    with timed_stage(metrics, "post_sleep"):
+        await asyncio.sleep(random.uniform(2.0, 5.0))
+    return answer.strip(), citations
+
+async def pw_process_prompt(page, i: int, prompt: str, site_type="perplexity",
+                            login_lock: Optional[asyncio.Lock] = None) -> Dict:
+    """process_prompt() for a Playwright page"""
+    started = time.time()
+    metrics: Dict = {}
+    try:
+        answer, citations = await pw_ask_one(page, prompt, site_type, metrics, login_lock)
+        row = make_row(i, prompt, answer, citations, site_type)
+        print(f"✅ #{i}: {len(answer)} chars, {len(citations)} citations")
+    except Exception as e:
+        print(f"❌ Error processing prompt {i}: {e}")
+        row = error_row(i, prompt, e, site_type)
+    metrics["t_total"] = round(time.time() - started, 3)
+    row.update(metrics)
+    record_row_stats(row, metrics, process_tree_rss_bytes(os.getpid()))
+    return row
+
+async def pw_page_alive(page) -> bool:
+    """False if the page, its context or its browser is gone"""
+    if page.is_closed():
+        return False
+    try:
+        await asyncio.wait_for(page.evaluate("1"), 10)
+        return True
+    except Exception:
+        return False
+
+async def _run_playwright(args, pending: Iterable[Tuple[int, str]], sink):
+    from playwright.async_api import async_playwright
+    
+    feed = JobFeed(pending, args.max_attempts, args.retry_backoff)
+    writer = OrderedResultWriter(sink)
+    login_lock = asyncio.Lock()
+    restart_lock = asyncio.Lock()
+    counts = {"prompts": 0, "errors": 0}
+    # The one browser and context all pages share; generation goes up on every relaunch
+    session = {"browser": None, "context": None, "generation": 0, "restarts": 0, "dead": False}
+    launch_args = ["--disable-blink-features=AutomationControlled", "--disable-dev-shm-usage"]
+    
+    async def launch(pw):
+        if args.profile_dir:
+            # A persistent profile keeps the login between runs, like the Selenium path
+            context = await pw.chromium.launch_persistent_context(
+                args.profile_dir, headless=args.headless, args=launch_args)
+            browser = None
+        else:
+            browser = await pw.chromium.launch(headless=args.headless, args=launch_args)
+            context = await browser.new_context()
+        await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        session.update(browser=browser, context=context, generation=session["generation"] + 1)
+    
+    async def shut_down():
+        for target in (session["context"], session["browser"]):
+            if target is not None:
+                try:
+                    await target.close()
+                except Exception:
+                    pass  # already gone with the crash
+    
+    async def restart(pw, generation: int, reason) -> bool:
+        """Relaunch the browser a page died in; False once --max-restarts is used up"""
+        async with restart_lock:
+            if session["generation"] != generation:
+                # Another page already relaunched it
+                return not session["dead"]
+            if session["dead"]:
+                return False
+            if session["restarts"] >= args.max_restarts:
+                print(f"🛑 Playwright browser died again after {session['restarts']} restarts "
+                      f"({str(reason)[:120]}); giving up")
+                session["dead"] = True
+                return False
+            print(f"💥 Playwright page lost ({str(reason)[:120]}); relaunching the browser...")
+            started = time.time()
+            await shut_down()
+            try:
+                await launch(pw)
+            except Exception as e:
+                print(f"🛑 Could not relaunch the Playwright browser: {e}")
+                session["dead"] = True
+                return False
+            session["restarts"] += 1
+            cost = time.time() - started
+            RUN_STATS.incr("driver_restarts")
+            RUN_STATS.observe("restart_seconds", cost)
+            print(f"🔄 Browser relaunched in {cost:.1f}s (restart {session['restarts']}/{args.max_restarts})")
+            return True
+    
+    async def page_worker(pw, worker_id: int):
+        # Stagger the first loads so the pages don't all hit the site at once
+        await asyncio.sleep((worker_id - 1) * random.uniform(0.5, 1.5))
+        page, generation = None, 0
+        try:
+            first = True
+            while not session["dead"]:
+                # feed.next may read the prompt file; keep it off the event loop and never block
+                # it waiting for a retry, the other pages may still defer some
+                job = await asyncio.to_thread(feed.next, block=False)
+                if job is None:
+                    if feed.finished:
+                        break
+                    await asyncio.sleep(1.0)
+                    continue
+                seq, i, prompt = job
+                if not first:
+                    await asyncio.sleep(random.uniform(*PER_PROMPT_DELAY))
+                first = False
+                print(f"\n📝 [page {worker_id}] Processing prompt #{i}")
+                while True:
+                    try:
+                        if page is None or generation != session["generation"]:
+                            generation = session["generation"]
+                            page = await session["context"].new_page()
+                        row = await pw_process_prompt(page, i, prompt, args.site, login_lock)
+                    except Exception as e:
+                        if not is_session_dead(e):
+                            raise
+                        row = error_row(i, prompt, e, args.site)
+                    # Failed rows are the only ones that can hide a dead page
+                    if is_completed_row(row) or (page is not None and await pw_page_alive(page)):
+                        break
+                    page = None
+                    if not await restart(pw, generation, row["answer"]):
+                        break
+                    RUN_STATS.incr("rerun_prompts")
+                counts["prompts"] += 1
+                if not is_completed_row(row):
+                    counts["errors"] += 1
+                await asyncio.to_thread(writer.settle, feed, seq, row)
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+    
+    started = time.time()
+    async with async_playwright() as pw:
+        await launch(pw)
+        try:
+            await asyncio.gather(*(page_worker(pw, w) for w in range(1, args.concurrency + 1)))
+        finally:
+            await shut_down()
+    
+    if session["dead"]:
+        print("🛑 Stopped early; the remaining prompts are recorded as failed, "
+              "rerun with --resume to pick them up")
+        for seq, row in abandoned_rows(feed, "Browser could not be restarted", args.site):
+            writer.submit(seq, row)
+    writer.flush_remaining()
+    wall = time.time() - started
+    if wall > 0:
+        print(f"\n🎭 Playwright: {counts['prompts']} prompts ({counts['errors']} failed) on "
+              f"{args.concurrency} pages in one browser, {counts['prompts'] / wall * 60:.2f} prompts/min")
+
+def run_playwright(args, pending: Iterable[Tuple[int, str]], sink):
+    """Process prompts with args.concurrency pages of one Playwright browser"""
+    try:
+        import playwright.async_api  # noqa: F401
+    except ImportError:
+        raise SystemExit("❌ The playwright backend needs Playwright: "
+                         "pip install playwright && playwright install chromium")
+    asyncio.run(_run_playwright(args, pending, sink))
+
 def main():
+    global COMPLETION_MODE, OBSERVER_QUIET_SECONDS, PROBE_MODE, SELECTOR_STATS, REUSE_SESSION
+    global LATENCY_MODEL, WEBDRIVER_PROFILER, CAPTURE_MODE, ANSWER_CACHE, INTERACTIVE_LOGIN
+    
     parser = argparse.ArgumentParser(description="AI Site Scraper (Perplexity & ChatGPT)")
     parser.add_argument("--site", choices=["perplexity", "chatgpt"], default="perplexity", 
                        help="Which site to scrape (default: perplexity)")
-    parser.add_argument("--prompts-csv", help="CSV with one prompt per row")
+    parser.add_argument("--prompts-csv", "--prompts", dest="prompts_csv",
+                       help="Prompt file: CSV (first column, or --prompt-column), JSONL or Parquet")
+    parser.add_argument("--prompt-column",
+                       help="Column/field holding the prompt; other fields are kept in the meta column "
+                            "(default: first CSV column, or 'prompt' for JSONL/Parquet)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                       help="Scrape repeated prompts again instead of skipping them")
     parser.add_argument("--limit", type=int, help="Limit number of prompts to process (for testing)")
     parser.add_argument("--out-csv", default="results.csv", help="Output CSV path")
     parser.add_argument("--out-jsonl", help="Optional JSONL output path")
+    parser.add_argument("--out-parquet", metavar="PATH",
+                       help="Optional Parquet dataset directory (one part file per run) with typed "
+                            "columns and citations as a list")
+    parser.add_argument("--parquet-row-group", type=int, default=500,
+                       help="Rows buffered per Parquet row group (default: 500)")
+    parser.add_argument("--out-db", metavar="PATH",
+                       help="Also record the run in a SQLite results store (query it with results_db.py)")
+    parser.add_argument("--fsync-interval", type=float, default=None,
+                       help="fsync outputs at most every N seconds (0 = every row; default: flush only)")
+    parser.add_argument("--resume", action="store_true",
+                       help="Append to existing outputs and skip prompts that already have a successful row")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Number of browsers pulling prompts from a shared queue (default: 1)")
+    parser.add_argument("--profile-dir",
+                       help="Chrome profile directory; --workers use DIR/worker-N, seeded from DIR "
+                            "(default: a temp dir)")
+    parser.add_argument("--base-url",
+                       help="Override the site URL (e.g. a local test page)")
+    parser.add_argument("--backend", choices=["selenium", "playwright"], default="selenium",
+                       help="Browser automation backend (default: selenium)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                       help="Concurrent pages in the one browser of the playwright backend (default: 4)")
+    parser.add_argument("--tabs", type=int, default=1,
+                       help="Prompts in flight per Selenium browser, one tab each; answer waits "
+                            "are polled round-robin so they overlap (default: 1)")
+    parser.add_argument("--max-restarts", type=int, default=3,
+                       help="Relaunch a crashed browser at most this many times per browser (default: 3)")
+    parser.add_argument("--recycle-every", type=int, default=0, metavar="N",
+                       help="Replace each browser with a fresh one after N prompts (default: never)")
+    parser.add_argument("--recycle-rss-mb", type=float, default=0, metavar="MB",
+                       help="Replace a browser between prompts once its process tree uses this much "
+                            "memory (default: never)")
+    parser.add_argument("--max-attempts", type=int, default=1,
+                       help="Attempts per prompt; failed prompts are retried after the main pass "
+                            "(default: 1 = no retries)")
+    parser.add_argument("--retry-backoff", type=float, default=30.0,
+                       help="Seconds before a failed prompt's first retry, doubling per attempt (default: 30)")
+    parser.add_argument("--headless", action="store_true",
+                       help="Run Chrome without a window (e.g. against fake_chat_server.py)")
+    parser.add_argument("--lean", action="store_true",
+                       help="Headless Chrome that blocks images, fonts, media and analytics requests "
+                            "(implies --network-stats)")
+    parser.add_argument("--block-list", metavar="PATH",
+                       help="Extra URL patterns to block in --lean mode, one per line (e.g. *cdn.example.com*)")
+    parser.add_argument("--network-stats", action="store_true",
+                       help="Record bytes received, requests and page-ready time per prompt")
+    parser.add_argument("--completion", choices=["poll", "observer", "signals"], default=COMPLETION_MODE,
+                       help="Answer completion detection: poll the DOM every second, inject a "
+                            "MutationObserver and wait for a quiet period, or poll and also finish as soon "
+                            "as the site's stop button / aria-busy clears or copy actions appear (default: poll)")
+    parser.add_argument("--capture", choices=["dom", "network"], default=CAPTURE_MODE,
+                       help="Read answers from the rendered DOM, or from the streamed response via "
+                            "DevTools network events with the DOM as fallback (default: dom)")
+    parser.add_argument("--quiet-seconds", type=float, default=OBSERVER_QUIET_SECONDS,
+                       help="Quiet period that marks an answer complete in observer mode")
+    parser.add_argument("--probe", choices=["batched", "legacy"], default=PROBE_MODE,
+                       help="Selector probing: one script call per poll (batched) or "
+                            "per-element WebDriver calls (legacy, for comparison)")
+    parser.add_argument("--selector-stats", default=".selector_stats.json",
+                       help="File that remembers which selectors matched, per site (default: .selector_stats.json)")
+    parser.add_argument("--fixed-selectors", action="store_true",
+                       help="Always try selectors in their built-in order")
+    parser.add_argument("--reuse-session", action="store_true",
+                       help="Keep the app loaded and start new threads in-page instead of "
+                            "reloading the site for every prompt")
+    parser.add_argument("--latency-model", default=".latency_model.json",
+                       help="File of observed answer latencies used to size timeouts (default: .latency_model.json)")
+    parser.add_argument("--latency-margin", type=float, default=1.5,
+                       help="Timeouts are the observed p99 latency times this margin (default: 1.5)")
+    parser.add_argument("--fixed-timeouts", action="store_true",
+                       help="Always use the built-in timeouts instead of learned ones")
+    parser.add_argument("--cache", nargs="?", const=".answer_cache.sqlite", metavar="PATH",
+                       help="Serve repeated prompts from a local answer cache and store new answers "
+                            "in it (default path: .answer_cache.sqlite)")
+    parser.add_argument("--cache-ttl", type=float, default=24.0,
+                       help="Hours a cached answer stays valid (default: 24)")
+    parser.add_argument("--cache-max", type=int, default=10000,
+                       help="Maximum cached answers; least recently used are evicted (default: 10000)")
+    parser.add_argument("--refresh-cache", action="store_true",
+                       help="Ignore cached answers (fresh answers still update the cache)")
+    parser.add_argument("--report-json",
+                       help="Write per-stage timings, throughput and counters to this JSON file")
+    parser.add_argument("--report-prom",
+                       help="Write the same report in Prometheus text format (textfile collector)")
+    parser.add_argument("--profile-webdriver", metavar="PATH",
+                       help="Count and time every WebDriver command by calling function and "
+                            "write per-prompt and per-run breakdowns to this JSON file")
     args = parser.parse_args()
-    
-    prompts = read_prompts(args.prompts_csv)
-    if not prompts:
-        print("No prompts found!")
-        return
-    
-    # Apply limit if specified
+    if args.backend == "playwright":
+        selenium_only = [flag for flag, used in (
+            ("--completion observer", args.completion == "observer"),
+            ("--capture network", args.capture == "network"),
+            ("--probe legacy", args.probe == "legacy"),
+            ("--lean", args.lean),
+            ("--block-list", args.block_list),
+            ("--network-stats", args.network_stats),
+            ("--tabs", args.tabs > 1),
+            ("--workers", args.workers > 1),
+            ("--reuse-session", args.reuse_session),
+            ("--recycle-every", args.recycle_every),
+            ("--recycle-rss-mb", args.recycle_rss_mb),
+            ("--profile-webdriver", args.profile_webdriver),
+        ) if used]
+        if selenium_only:
+            parser.error(f"--backend playwright does not support {', '.join(selenium_only)} "
+                         f"(Selenium backend only)")
+    
+    PROBE_MODE = args.probe
+    REUSE_SESSION = args.reuse_session
+    INTERACTIVE_LOGIN = (sys.stdin.isatty() and not args.headless and not args.lean
+                         and (args.backend == "playwright" or args.workers <= 1))
+    if not args.fixed_selectors:
+        SELECTOR_STATS = SelectorStats(args.selector_stats)
+    if not args.fixed_timeouts:
+        LATENCY_MODEL = LatencyModel(args.latency_model, margin=args.latency_margin)
+    if args.profile_webdriver:
+        WEBDRIVER_PROFILER = CommandProfiler(args.profile_webdriver)
+    args.block_patterns = load_block_patterns(args.block_list)
+    COMPLETION_MODE = args.completion
+    CAPTURE_MODE = args.capture
+    OBSERVER_QUIET_SECONDS = args.quiet_seconds
+    if args.base_url:
+        SITE_URLS[args.site] = args.base_url
+    
+    # Prompts are streamed: scraping starts before the input file is fully read.
+    # Each prompt keeps its position in the input as its idx, even when resuming
+    source = PromptSource(args.prompts_csv, args.prompt_column, dedupe=not args.keep_duplicates)
+    pending: Iterable[Tuple[int, str]] = iter(source)
+    if args.resume:
+        done = load_completed_keys([args.out_csv, args.out_jsonl, args.out_parquet], args.site)
+        print(f"♻️  Resuming: skipping prompts that already have one of {len(done)} successful rows")
+        pending = skip_completed(pending, done, args.site, source)
+    # Applied after the resume filter, so --resume --limit N scrapes the next N outstanding prompts
     if args.limit and args.limit > 0:
-        prompts = prompts[:args.limit]
-        print(f"📊 Limited to first {len(prompts)} prompts for testing")
+        pending = islice(pending, args.limit)
+        print(f"📊 Limited to {args.limit} prompts for testing")
+    
+    # Open outputs up front so every row is on disk as soon as it is captured
+    if args.cache:
+        ANSWER_CACHE = AnswerCache(args.cache, args.cache_ttl * 3600, args.cache_max)
+    sink = open_result_sinks(args)
+    sink.decorate = source.attach_meta
+    RUN_STATS.started = time.time()
+    
+    # Serve cached answers as they stream past, without touching a browser
+    if ANSWER_CACHE is not None:
+        pending = serve_cached(pending, sink, args.site, args.refresh_cache)
+    
+    # Only start a browser once there is something to scrape
+    first = next(pending, None)
+    if first is None:
+        sink.close()
+        print("✅ Nothing left to do!")
+        print(f"💾 Saved {sink.rows_written} rows to {args.out_csv}")
+        RUN_STATS.print_summary()
+        write_run_reports(args)
+        return
+    pending = chain([first], pending)
     
-    print(f"🚀 Starting {args.site.title()} scraper with {len(prompts)} prompts")
+    print(f"🚀 Starting {args.site.title()} scraper, streaming prompts from "
+          f"{args.prompts_csv or 'the built-in list'}")
     print(f"📁 Output: {args.out_csv}")
     print(f"⚡ Using optimized timing ({ANSWER_WAIT_SECONDS}s max wait per answer)")
     
-    # Setup Chrome
-    options = Options()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-blink-features=AutomationControlled")
+    if args.backend == "playwright" or args.workers > 1:
+        try:
+            if args.backend == "playwright":
+                print(f"🎭 Running {args.concurrency} pages in one Playwright browser")
+                run_playwright(args, pending, sink)
+            else:
+                print(f"👷 Running {args.workers} browsers in parallel")
+                run_workers(args, pending, sink)
+        finally:
+            sink.close()
+            if SELECTOR_STATS is not None:
+                SELECTOR_STATS.save()
+            if LATENCY_MODEL is not None:
+                LATENCY_MODEL.save()
+            print(f"\n💾 Saved {sink.rows_written} rows to {args.out_csv}")
+            if args.out_jsonl:
+                print(f"💾 Also wrote JSONL to {args.out_jsonl}")
+            RUN_STATS.print_summary()
+            write_run_reports(args)
+        return
     
-    driver = webdriver.Chrome(options=options)
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    # Setup Chrome
+    browser = DriverSupervisor(args, args.profile_dir, max_restarts=args.max_restarts,
+                               recycle_every=args.recycle_every, recycle_rss_mb=args.recycle_rss_mb)
     
+    feed = JobFeed(pending, args.max_attempts, args.retry_backoff)
+    total_round_trips = 0
     try:
-        rows = []
-        for i, prompt in enumerate(prompts, 1):
-            print(f"\n{'='*60}")
-            print(f"📝 Processing prompt {i}/{len(prompts)}")
-            print(f"{'='*60}")
-            
-            # Add fake first prompt for ChatGPT to warm up
-            if i == 1 and args.site == "chatgpt":
-                print("🚀 First prompt - sending fake 'Hello' to warm up ChatGPT (10s max)")
-                try:
-                    # Send a simple "Hello" first - super fast
-                    fake_answer, fake_citations = ask_one_super_fast(driver, "Hello", args.site)
-                    print("✅ Fake prompt sent successfully, now processing real prompt...")
-                    
-                    # Add delay between fake and real prompt
-                    delay = random.uniform(3.0, 8.0)
-                    print(f"⏸️  Waiting {delay:.1f}s between fake and real prompt...")
-                    time.sleep(delay)
-                    
-                    # Now process the real first prompt
-                    answer, citations = ask_one(driver, prompt, args.site)
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": answer,
-                        "citations": "; ".join(citations),
-                    })
-                    print("✅ First real prompt succeeded!")
-                except Exception as e:
-                    print(f"❌ Error processing first prompt: {e}")
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": f"Error: {e}",
-                        "citations": "",
-                    })
-            elif i == 2 and args.site == "chatgpt":
-                print("🚀 Second prompt - sending fake 'Are you there?' to continue warming up (10s max)")
-                try:
-                    # Send "Are you there?" second - super fast
-                    fake_answer, fake_citations = ask_one_super_fast(driver, "Are you there?", args.site)
-                    print("✅ Second fake prompt sent successfully, now processing real prompt...")
-                    
-                    # Add delay between fake and real prompt
-                    delay = random.uniform(3.0, 8.0)
-                    print(f"⏸️  Waiting {delay:.1f}s between fake and real prompt...")
+        if args.tabs > 1:
+            writer = OrderedResultWriter(sink)
+            run_driver_tabs(browser, feed, lambda seq, row: writer.settle(feed, seq, row))
+            if browser.dead:
+                for seq, row in abandoned_rows(feed, "Browser could not be restarted", args.site):
+                    writer.submit(seq, row)
+            writer.flush_remaining()
+            total_round_trips = browser.driver.round_trips
+        else:
+            row = None
+            n = 0
+            while True:
+                job = feed.next()
+                if job is None:
+                    break
+                seq, i, prompt = job
+                n += 1
+                # Wait between prompts (the fast-fail first prompt moves straight on)
+                if row is not None and not row["answer"].startswith("Skipped"):
+                    delay = random.uniform(*PER_PROMPT_DELAY)
+                    print(f"⏸️  Waiting {delay:.1f}s before next prompt...")
                     time.sleep(delay)
-                    
-                    # Now process the real second prompt
-                    answer, citations = ask_one(driver, prompt, args.site)
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": answer,
-                        "citations": "; ".join(citations),
-                    })
-                    print("✅ Second real prompt succeeded!")
-                except Exception as e:
-                    print(f"❌ Error processing second prompt: {e}")
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": f"Error: {e}",
-                        "citations": "",
-                    })
-            elif i == 1 and args.site == "perplexity":
-                print("🚀 First prompt - using fast-fail mode to avoid bot detection (Perplexity)")
-                try:
-                    # Quick attempt for first prompt
-                    answer, citations = ask_one_fast(driver, prompt, args.site)
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": answer,
-                        "citations": "; ".join(citations),
-                    })
-                    print("✅ First prompt succeeded!")
-                except Exception as e:
-                    print(f"❌ First prompt failed (expected): {e}")
-                    print("⏭️  Skipping to next prompt...")
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": f"Skipped (bot detection): {e}",
-                        "citations": "",
-                    })
-                    continue
-            else:
-                # Normal processing for subsequent prompts
-                try:
-                    answer, citations = ask_one(driver, prompt, args.site)
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": answer,
-                        "citations": "; ".join(citations),
-                    })
-                except Exception as e:
-                    print(f"❌ Error processing prompt {i}: {e}")
-                    rows.append({
-                        "idx": i,
-                        "prompt": prompt,
-                        "answer": f"Error: {e}",
-                        "citations": "",
-                    })
-            
-            # Wait between prompts
-            if i < len(prompts):
-                delay = random.uniform(*PER_PROMPT_DELAY)
-                print(f"⏸️  Waiting {delay:.1f}s before next prompt...")
-                time.sleep(delay)
-        
-        # Save results
-        df = pd.DataFrame(rows)
-        df.to_csv(args.out_csv, index=False, encoding="utf-8")
-        print(f"\n💾 Saved {len(rows)} rows to {args.out_csv}")
+                browser.maybe_recycle()
+                
+                print(f"\n{'='*60}")
+                print(f"📝 Processing prompt {n} (#{i})")
+                print(f"{'='*60}")
+                
+                row = browser.process(i, prompt, args.site)
+                if feed.finish(seq, row):
+                    sink.write(row)
+                total_round_trips += row.get("round_trips") or 0
+                print(f"🔁 {row.get('round_trips') or 0} WebDriver round trips for this prompt")
+                if browser.dead:
+                    print("🛑 Stopping early; the remaining prompts are recorded as failed, "
+                          "rerun with --resume to pick them up")
+                    for _, abandoned in abandoned_rows(feed, "Browser could not be restarted", args.site):
+                        sink.write(abandoned)
+                    break
         
+    finally:
+        sink.close()
+        if SELECTOR_STATS is not None:
+            SELECTOR_STATS.save()
+        if LATENCY_MODEL is not None:
+            LATENCY_MODEL.save()
+        print(f"\n💾 Saved {sink.rows_written} rows to {args.out_csv}")
         if args.out_jsonl:
-            with open(args.out_jsonl, "w", encoding="utf-8") as f:
-                for row in rows:
-                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
             print(f"💾 Also wrote JSONL to {args.out_jsonl}")
-    
-    finally:
-        driver.quit()
+        if sink.rows_written:
+            print(f"🔁 {total_round_trips} WebDriver round trips "
+                  f"({total_round_trips / sink.rows_written:.0f} per prompt, {PROBE_MODE} probe)")
+        RUN_STATS.print_summary()
+        write_run_reports(args)
+        browser.quit()
 
 if __name__ == "__main__":
     main()
@@ -4,56 +4,15 @@ Test script to demonstrate the improved citation extraction logic
 using the existing ChatGPT response data
 """
 
-import re
+from citations import extract_text_citations
 
 def extract_citations_from_text(text):
-    """Test the improved citation extraction logic"""
-    links = set()
-    
+    """Run the scraper's citation engine over the text and show what it found"""
     print(f"🔍 Processing {len(text)} characters of text for citations...")
     
-    # Find URLs in text using regex
-    url_pattern = r'https?://[^\s\)]+'
-    text_urls = re.findall(url_pattern, text)
-    print(f"🔗 Found {len(text_urls)} URLs in text")
-    for url in text_urls:
-        # Clean URL
-        if "?" in url:
-            url = url.split("?")[0]
-        if ")" in url:
-            url = url.rstrip(")")
-        links.add(url)
-        print(f"✅ Added URL citation: {url}")
-    
-    # Look for domain-like patterns
-    domain_pattern = r'\b[A-Z][a-zA-Z\s&]+(?:\.com|\.io|\.org|\.net|\.co\.uk|\.ai|\.tech)\b'
-    domain_matches = re.findall(domain_pattern, text)
-    print(f"🌐 Found {len(domain_matches)} domain-like patterns")
-    for domain in domain_matches:
-        clean_domain = domain.strip()
-        if clean_domain and len(clean_domain) > 3:
-            links.add(f"Potential source: {clean_domain}")
-            print(f"✅ Added domain citation: {clean_domain}")
-    
-    # Look for company names that might be sources
-    company_pattern = r'\b(?:Business Chief|AI Magazine|FNLondon|Business Insider|The Wall Street Journal|Wikipedia|McKinsey|BCG|Deloitte|EY|PwC|Accenture|IBM|Infosys|Capgemini|Cognizant|Financial Times|The Times of India|The Australian|LinkedIn|Superside|Bitcot|Goml|Ailoitte|Xonique|Faculty|Fractal|Algoscale|Quantiphi|Tredence|ZS Associates|Slalom|Booz Allen Hamilton|Unity Advisory|Keystone|Fusion Collective|Slideworks|Monevate|SIB|Perceptis|Xavier AI)\b'
-    company_matches = re.findall(company_pattern, text)
-    print(f"🏢 Found {len(company_matches)} company name matches")
-    for company in company_matches:
-        links.add(f"Source: {company}")
-        print(f"✅ Added company citation: {company}")
-    
-    # Look for any capitalized phrases that might be sources
-    source_pattern = r'\b[A-Z][a-zA-Z\s&]+(?:Magazine|Journal|Times|Insider|Chief|London|Financial|Wall Street|Business|AI|Tech|Consulting|Analytics|Platform|Company|Firm|Group|Advisory|Collective|Works|Advisory)\b'
-    source_matches = re.findall(source_pattern, text)
-    print(f"📰 Found {len(source_matches)} source pattern matches")
-    for source in source_matches:
-        clean_source = source.strip()
-        if clean_source and len(clean_source) > 3:
-            # Check if it's not already captured
-            if not any(clean_source in link for link in links):
-                links.add(f"Potential source: {clean_source}")
-                print(f"✅ Added source citation: {clean_source}")
+    links = extract_text_citations(text)
+    for link in links:
+        print(f"✅ Added citation: {link}")
     
     return sorted(links)
 
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules under test live at the repo root, next to scraper.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+class Clock:
+    """Stand-in for time.time() that only moves when a test moves it"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    import scraper
+    clock = Clock()
+    monkeypatch.setattr(scraper.time, "time", clock)
+    return clock
@@ -0,0 +1,67 @@
+"""AnswerCache TTL expiry, LRU eviction and batched access times"""
+
+from scraper import AnswerCache
+
+def open_cache(tmp_path, **kwargs):
+    kwargs.setdefault("ttl_seconds", 3600)
+    return AnswerCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+def test_hit_and_miss(tmp_path, clock):
+    cache = open_cache(tmp_path)
+    assert cache.get("perplexity", "What is AI?") is None
+    cache.put("perplexity", "What is AI?", "An answer", ["https://a.com"])
+    entry = cache.get("perplexity", "  what is ai? ")
+    assert entry == {"answer": "An answer", "citations": ["https://a.com"], "captured_at": clock.now}
+    # Keyed per site
+    assert cache.get("chatgpt", "What is AI?") is None
+
+def test_expired_entries_are_dropped(tmp_path, clock):
+    cache = open_cache(tmp_path, ttl_seconds=60)
+    cache.put("perplexity", "q", "a", [])
+    clock.now += 60
+    assert cache.get("perplexity", "q") is not None
+    clock.now += 1
+    assert cache.get("perplexity", "q") is None
+    clock.now -= 61
+    # Deleted, not just hidden
+    assert cache.get("perplexity", "q") is None
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    cache = open_cache(tmp_path, max_entries=2)
+    cache.put("perplexity", "a", "A", [])
+    clock.now += 1
+    cache.put("perplexity", "b", "B", [])
+    clock.now += 1
+    # A hit only notes its access time in memory; put() writes it before evicting
+    assert cache.get("perplexity", "a") is not None
+    clock.now += 1
+    cache.put("perplexity", "c", "C", [])
+    assert cache.get("perplexity", "b") is None
+    assert cache.get("perplexity", "a") is not None
+    assert cache.get("perplexity", "c") is not None
+
+def test_access_times_survive_close(tmp_path, clock):
+    cache = open_cache(tmp_path, max_entries=2)
+    cache.put("perplexity", "a", "A", [])
+    clock.now += 1
+    cache.put("perplexity", "b", "B", [])
+    clock.now += 1
+    cache.get("perplexity", "a")
+    cache.close()
+    cache = open_cache(tmp_path, max_entries=2)
+    clock.now += 1
+    cache.put("perplexity", "c", "C", [])
+    assert cache.get("perplexity", "b") is None
+    assert cache.get("perplexity", "a") is not None
+
+def test_touches_flush_in_batches(tmp_path, clock):
+    cache = open_cache(tmp_path, touch_batch=2, touch_seconds=1000)
+    cache.put("perplexity", "a", "A", [])
+    cache.put("perplexity", "b", "B", [])
+    clock.now += 5
+    cache.get("perplexity", "a")
+    assert cache._touched
+    cache.get("perplexity", "b")
+    assert not cache._touched
+    used = dict(cache._conn.execute("SELECT prompt, last_used FROM answers"))
+    assert used == {"a": clock.now, "b": clock.now}
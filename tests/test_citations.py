@@ -0,0 +1,53 @@
+"""Pins extract_text_citations() output on fixed inputs"""
+
+from citations import SOURCE_PATTERN, SubstringIndex, extract_text_citations
+
+SAMPLE = """Top Global IT Consulting Firms
+Deloitte
+Offers AI audits; see https://example.com/report?utm=x) and goml.io.
+Accenture Business Group Company leads, per The Wall Street Journal.
+Read Fusion Collective Works and the Financial Times Group blog via https://chatgpt.com/share/1
+One Two Three Four Five Six Seven Group"""
+
+def test_fixed_input():
+    assert extract_text_citations(SAMPLE, existing=["Source: Deloitte"],
+                                  exclude_domains=["chatgpt.com"]) == [
+        "https://example.com/report",
+        "Source: Accenture",
+        "Source: The Wall Street Journal",
+        "Source: Fusion Collective",
+        "Source: Financial Times",
+        "Potential source: Top Global IT Consulting",
+        "Potential source: Offers AI",
+        "Potential source: Accenture Business Group Company",
+        "Potential source: Read Fusion Collective Works",
+        "Potential source: Financial Times Group",
+        "Potential source: Three Four Five Six Seven Group",
+    ]
+
+def test_phrases_do_not_cross_newlines():
+    assert SOURCE_PATTERN.findall("Deloitte\nOffers AI tools") == ["Offers AI"]
+    assert SOURCE_PATTERN.findall("AI Magazine\nBusiness Insider") == ["AI Magazine", "Business Insider"]
+
+def test_phrase_ends_at_last_suffix():
+    assert SOURCE_PATTERN.findall("Accenture Business Group Company") == ["Accenture Business Group Company"]
+    assert SOURCE_PATTERN.findall("Xavier AI Tech Consulting Group Firm Holdings") == [
+        "Xavier AI Tech Consulting Group Firm"]
+
+def test_phrase_is_at_most_six_words():
+    assert SOURCE_PATTERN.findall("One Two Three Four Five Six Seven Group") == [
+        "Three Four Five Six Seven Group"]
+
+def test_lowercase_words_break_phrases():
+    assert SOURCE_PATTERN.findall("Read the Financial Times Group report") == ["Financial Times Group"]
+
+def test_empty_text():
+    assert extract_text_citations("") == []
+
+def test_substring_index():
+    index = SubstringIndex(["Source: Business Insider", "ab"])
+    assert "ab" in index
+    assert index.contains_substring("Business Insider")
+    assert index.contains_substring("b")
+    assert not index.contains_substring("Business Chief")
+    assert not index.add("ab")
@@ -0,0 +1,139 @@
+"""JobFeed deferred retries and OrderedResultWriter output order"""
+
+import time
+
+import scraper
+from scraper import JobFeed, OrderedResultWriter, abandoned_rows, error_row, make_row
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+def ok(i, prompt):
+    return make_row(i, prompt, "answer", [])
+
+def failed(i, prompt, error_class="answer_timeout"):
+    return error_row(i, prompt, scraper.ScrapeError("no answer", error_class))
+
+def prompts(n):
+    return [(i, f"p{i}") for i in range(1, n + 1)]
+
+def test_stream_then_nothing_left():
+    feed = JobFeed(prompts(2))
+    assert feed.next() == (1, 1, "p1")
+    assert feed.next() == (2, 2, "p2")
+    assert not feed.finished
+    assert feed.finish(1, ok(1, "p1"))
+    assert feed.finish(2, ok(2, "p2"))
+    assert feed.next() is None
+    assert feed.finished
+
+def test_single_attempt_is_final():
+    feed = JobFeed(prompts(1))
+    feed.next()
+    row = failed(1, "p1")
+    assert feed.finish(1, row)
+    assert row["attempts"] == 1
+
+def test_retry_waits_for_stream_and_backoff(clock):
+    feed = JobFeed(prompts(3), max_attempts=3, backoff=10)
+    feed.next()
+    assert not feed.finish(1, failed(1, "p1"))
+    # The rest of the stream comes first
+    assert feed.next(block=False) == (2, 2, "p2")
+    assert feed.next(block=False) == (3, 3, "p3")
+    feed.finish(2, ok(2, "p2"))
+    feed.finish(3, ok(3, "p3"))
+    # Not due yet
+    assert feed.next(block=False) is None
+    assert not feed.finished
+    clock.now += 10
+    assert feed.next(block=False) == (1, 1, "p1")
+    # Second failure backs off twice as long
+    assert not feed.finish(1, failed(1, "p1"))
+    clock.now += 19
+    assert feed.next(block=False) is None
+    clock.now += 1
+    assert feed.next(block=False) == (1, 1, "p1")
+    row = failed(1, "p1")
+    assert feed.finish(1, row)
+    assert row["attempts"] == 3
+    assert feed.finished
+
+def test_retries_come_due_in_order(clock):
+    feed = JobFeed(prompts(2), max_attempts=2, backoff=5)
+    feed.next()
+    feed.next()
+    feed.finish(2, failed(2, "p2"))
+    clock.now += 1
+    feed.finish(1, failed(1, "p1"))
+    clock.now += 10
+    assert feed.next(block=False) == (2, 2, "p2")
+    assert feed.next(block=False) == (1, 1, "p1")
+
+def test_backoff_is_capped(clock):
+    feed = JobFeed(prompts(1), max_attempts=5, backoff=100, max_backoff=150)
+    feed.next()
+    feed.finish(1, failed(1, "p1"))
+    clock.now += 100
+    feed.next(block=False)
+    feed.finish(1, failed(1, "p1"))
+    clock.now += 150
+    assert feed.next(block=False) == (1, 1, "p1")
+
+def test_permanent_errors_are_not_retried():
+    feed = JobFeed(prompts(1), max_attempts=3, backoff=0)
+    feed.next()
+    assert feed.finish(1, failed(1, "p1", "login_required"))
+
+def test_blocking_next_waits_for_retry():
+    feed = JobFeed(prompts(1), max_attempts=2, backoff=0.05)
+    feed.next()
+    feed.finish(1, failed(1, "p1"))
+    started = time.time()
+    assert feed.next() == (1, 1, "p1")
+    assert time.time() - started >= 0.04
+
+def test_abandoned_rows_include_waiting_retries(clock):
+    feed = JobFeed(prompts(3), max_attempts=2, backoff=60)
+    feed.next()
+    feed.finish(1, failed(1, "p1"))
+    rows = list(abandoned_rows(feed, "Browser could not be restarted", "perplexity"))
+    assert [(seq, row["idx"], row["error_class"]) for seq, row in rows] == [
+        (2, 2, "browser_crash"), (3, 3, "browser_crash"), (1, 1, "browser_crash")]
+    assert feed.next(block=False) is None
+
+def test_writer_keeps_submission_order():
+    sink = ListSink()
+    writer = OrderedResultWriter(sink)
+    writer.submit(2, ok(2, "p2"))
+    writer.submit(3, ok(3, "p3"))
+    assert sink.rows == []
+    writer.submit(1, ok(1, "p1"))
+    assert [row["idx"] for row in sink.rows] == [1, 2, 3]
+
+def test_writer_does_not_hold_rows_back_for_a_retry(clock):
+    sink = ListSink()
+    writer = OrderedResultWriter(sink)
+    feed = JobFeed(prompts(3), max_attempts=2, backoff=0)
+    for _ in range(3):
+        feed.next()
+    writer.settle(feed, 2, ok(2, "p2"))
+    writer.settle(feed, 1, failed(1, "p1"))
+    writer.settle(feed, 3, ok(3, "p3"))
+    assert [row["idx"] for row in sink.rows] == [2, 3]
+    assert feed.next(block=False) == (1, 1, "p1")
+    writer.settle(feed, 1, ok(1, "p1"))
+    assert [row["idx"] for row in sink.rows] == [2, 3, 1]
+    assert sink.rows[-1]["attempts"] == 2
+
+def test_flush_remaining_writes_gaps():
+    sink = ListSink()
+    writer = OrderedResultWriter(sink)
+    writer.submit(3, ok(3, "p3"))
+    writer.submit(2, ok(2, "p2"))
+    writer.flush_remaining()
+    assert [row["idx"] for row in sink.rows] == [2, 3]
@@ -0,0 +1,59 @@
+"""LatencyModel percentiles and the wait budgets derived from them"""
+
+import pytest
+
+import scraper
+from scraper import LatencyModel
+
+@pytest.fixture
+def model(tmp_path):
+    return LatencyModel(str(tmp_path / "latency.json"), margin=1.5, min_samples=5, max_samples=10)
+
+def test_default_until_enough_samples(model):
+    for seconds in (10, 10, 10, 10):
+        model.record("perplexity", "completion", seconds)
+    assert model.percentile("perplexity", "completion", 99) is None
+    assert model.budget("perplexity", "completion", default=60, floor=30) == 60
+
+def test_nearest_rank_percentile(model):
+    for seconds in (5, 1, 4, 2, 3):
+        model.record("perplexity", "completion", seconds)
+    assert model.percentile("perplexity", "completion", 50) == 3
+    assert model.percentile("perplexity", "completion", 99) == 5
+    assert model.percentile("perplexity", "completion", 0) == 1
+
+def test_budget_is_clamped(model):
+    for _ in range(5):
+        model.record("perplexity", "completion", 30)
+    assert model.budget("perplexity", "completion", default=60, floor=10) == 45
+    assert model.budget("perplexity", "completion", default=40, floor=10) == 40
+    assert model.budget("perplexity", "completion", default=60, floor=50) == 50
+
+def test_keeps_the_most_recent_samples(model):
+    for seconds in range(20):
+        model.record("perplexity", "gap", seconds)
+    model.record("perplexity", "gap", None)
+    assert model.data["perplexity"]["gap"] == [float(s) for s in range(10, 20)]
+
+def test_sites_and_series_are_separate(model):
+    for _ in range(5):
+        model.record("chatgpt", "completion", 20)
+    assert model.percentile("perplexity", "completion", 99) is None
+    assert model.percentile("chatgpt", "first_text", 99) is None
+
+def test_saved_and_reloaded(tmp_path):
+    path = str(tmp_path / "latency.json")
+    model = LatencyModel(path)
+    model.record("perplexity", "first_text", 1.234)
+    model.save()
+    assert LatencyModel(path).data == {"perplexity": {"first_text": [1.23]}}
+
+def test_module_helpers(model, monkeypatch):
+    monkeypatch.setattr(scraper, "LATENCY_MODEL", None)
+    assert scraper.wait_budget("perplexity", "completion", default=60, floor=30) == 60
+    assert scraper.stable_window("perplexity", 8) == 8
+    monkeypatch.setattr(scraper, "LATENCY_MODEL", model)
+    for seconds in (1.0, 1.2, 1.1, 0.9, 2.1):
+        scraper.record_latency("perplexity", "gap", seconds)
+    # p95 of the gaps x 1.5, rounded up to whole polls
+    assert scraper.stable_window("perplexity", 8) == 4
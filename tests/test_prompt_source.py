@@ -0,0 +1,60 @@
+"""PromptSource streaming, metadata and on-the-fly dedupe"""
+
+import json
+
+from scraper import PromptDeduper, PromptSource, read_prompts
+
+def test_deduper_normalizes_case_and_whitespace():
+    deduper = PromptDeduper()
+    assert deduper.add("What is  AI?")
+    assert not deduper.add(" what is ai? ")
+    assert deduper.add("What is ML?")
+    assert deduper.duplicates == 1
+
+def test_csv_first_column_with_file_positions(tmp_path):
+    path = tmp_path / "prompts.csv"
+    path.write_text("first,x\n\nsecond,y\nFIRST,z\n  \nthird\n", encoding="utf-8")
+    # idx counts records, so duplicates and empty prompts still use up their number
+    assert list(PromptSource(str(path))) == [(1, "first"), (2, "second"), (5, "third")]
+
+def test_keep_duplicates(tmp_path):
+    path = tmp_path / "prompts.csv"
+    path.write_text("a\nA\n", encoding="utf-8")
+    assert list(PromptSource(str(path), dedupe=False)) == [(1, "a"), (2, "A")]
+    assert read_prompts(str(path)) == ["a", "A"]
+
+def test_csv_column_keeps_other_fields_as_meta(tmp_path):
+    path = tmp_path / "prompts.csv"
+    path.write_text("id,question\n7,Why?\n8,How?\n", encoding="utf-8")
+    source = PromptSource(str(path), column="question")
+    assert list(source) == [(1, "Why?"), (2, "How?")]
+    row = source.attach_meta({"idx": 1})
+    assert json.loads(row["meta"]) == {"id": "7"}
+    # Metadata is handed out once
+    assert "meta" not in source.attach_meta({"idx": 1})
+
+def test_jsonl_records_and_strings(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"prompt": "one", "tag": "a"}\nnot json\n"two"\n\n{"tag": "b"}\n', encoding="utf-8")
+    source = PromptSource(str(path))
+    # Lines that are not JSON are not records
+    assert list(source) == [(1, "one"), (2, "two")]
+    assert json.loads(source.attach_meta({"idx": 1})["meta"]) == {"tag": "a"}
+
+def test_discard_drops_meta(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"prompt": "one", "tag": "a"}\n', encoding="utf-8")
+    source = PromptSource(str(path))
+    list(source)
+    source.discard(1)
+    assert "meta" not in source.attach_meta({"idx": 1})
+
+def test_streams_lazily(tmp_path):
+    path = tmp_path / "prompts.csv"
+    path.write_text("".join(f"p{k}\n" for k in range(1000)), encoding="utf-8")
+    stream = iter(PromptSource(str(path)))
+    assert next(stream) == (1, "p0")
+    assert next(stream) == (2, "p1")
+
+def test_default_prompts_without_a_file():
+    assert [i for i, _ in PromptSource(None)][:1] == [1]
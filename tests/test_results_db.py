@@ -0,0 +1,77 @@
+"""ResultsSink inserts and the results_db query helpers"""
+
+import json
+
+import pytest
+
+import results_db
+from scraper import error_row, make_row, prompt_key, row_status
+
+def record_run(path, rows, site="perplexity"):
+    sink = results_db.ResultsSink(path, site, "prompts.csv", {"limit": 3}, status=row_status, batch_size=2)
+    for row in rows:
+        sink.write(row)
+    sink.close()
+    return sink.run_id
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "results.db")
+    first = make_row(1, "AI consulting firms", "a1",
+                     ["https://www.bcg.com/x", "https://mckinsey.com/y", "Source: BCG"])
+    first["t_total"] = 12.5
+    first["round_trips"] = 40
+    record_run(path, [first, error_row(2, "Cloud vendors", RuntimeError("boom"))])
+    record_run(path, [make_row(1, "AI consulting firms", "a2", ["https://bcg.com/z", "https://bcg.com/w"]),
+                      make_row(2, "Cloud vendors", "a3", ["https://aws.amazon.com"])])
+    conn = results_db.connect(path)
+    yield conn
+    conn.close()
+
+def test_citation_domain():
+    assert results_db.citation_domain("https://www.Example.com:8080/a") == "example.com"
+    assert results_db.citation_domain("http://user@host.io/") == "host.io"
+    assert results_db.citation_domain("Source: BCG") is None
+
+def test_rows_and_runs_are_recorded(db):
+    runs = db.execute("SELECT run_id, rows, finished_at IS NOT NULL FROM runs ORDER BY run_id").fetchall()
+    assert runs == [(1, 2, 1), (2, 2, 1)]
+    assert db.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == 2
+    status, t_total, metrics = db.execute(
+        "SELECT status, t_total, metrics FROM answers WHERE run_id = 1 AND idx = 1").fetchone()
+    assert (status, t_total) == ("ok", 12.5)
+    assert json.loads(metrics)["round_trips"] == 40
+    assert db.execute("SELECT status FROM answers WHERE run_id = 1 AND idx = 2").fetchone()[0] == "error"
+
+def test_list_runs(db):
+    lines = list(results_db.list_runs(db, 10))
+    assert [line.split(":")[0] for line in lines] == ["run 2", "run 1"]
+    assert "2/2 answered" in lines[0] and "1/2 answered" in lines[1]
+    assert len(list(results_db.list_runs(db, 1))) == 1
+
+def test_matching_prompts(db):
+    key = prompt_key("perplexity", "AI consulting firms")
+    assert results_db._matching_prompts(db, "consulting", None) == [key]
+    assert results_db._matching_prompts(db, None, "abc") == ["abc"]
+    assert results_db._matching_prompts(db, "nothing like it", None) == []
+
+def test_prompt_domains_per_run(db):
+    hashes = [prompt_key("perplexity", "AI consulting firms")]
+    assert list(results_db.prompt_domains(db, hashes, 5)) == [
+        "run 2: bcg.com (2)",
+        "run 1: Source: BCG, bcg.com, mckinsey.com",
+    ]
+    assert list(results_db.prompt_domains(db, hashes, 1)) == ["run 2: bcg.com (2)"]
+    assert list(results_db.prompt_domains(db, [], 5)) == []
+
+def test_prompt_answers(db):
+    hashes = [prompt_key("perplexity", "Cloud vendors")]
+    lines = list(results_db.prompt_answers(db, hashes, 5, width=10))
+    assert lines == ["run 2 [ok] Cloud vendors\n    a3",
+                     "run 1 [error] Cloud vendors\n    Error: ..."]
+
+def test_top_domains(db):
+    assert list(results_db.top_domains(db, None, 2)) == [
+        "     3  bcg.com  (1 prompts)", "     1  aws.amazon.com  (1 prompts)"]
+    assert list(results_db.top_domains(db, 1, 5)) == [
+        "     1  bcg.com  (1 prompts)", "     1  mckinsey.com  (1 prompts)"]
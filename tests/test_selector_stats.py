@@ -0,0 +1,64 @@
+"""SelectorStats decay, specificity tiers and persistence"""
+
+import json
+
+import pytest
+
+import scraper
+from scraper import ANSWER_SELECTORS, SelectorStats
+
+@pytest.fixture
+def stats(tmp_path):
+    return SelectorStats(str(tmp_path / "stats.json"))
+
+def test_unknown_selectors_keep_built_in_order(stats):
+    assert stats.order("perplexity", "input", ["a", "b", "c"]) == ["a", "b", "c"]
+
+def test_hits_move_a_selector_first(stats):
+    stats.record("perplexity", "input", "textarea")
+    assert stats.order("perplexity", "input", ["#ask", "[contenteditable]", "textarea"]) == [
+        "textarea", "#ask", "[contenteditable]"]
+
+def test_scores_decay_so_order_recovers(stats):
+    for _ in range(5):
+        stats.record("perplexity", "input", "old")
+    assert stats.data["perplexity"]["input"]["old"] == pytest.approx(1 + 0.9 + 0.81 + 0.729 + 0.6561)
+    for _ in range(6):
+        stats.record("perplexity", "input", "new")
+    assert stats.order("perplexity", "input", ["old", "new"]) == ["new", "old"]
+
+def test_tiny_scores_are_dropped(stats):
+    stats.record("perplexity", "input", "gone")
+    for _ in range(44):
+        stats.record("perplexity", "input", "kept")
+    assert "gone" not in stats.data["perplexity"]["input"]
+
+def test_broad_answer_selectors_stay_behind_specific_ones(stats):
+    for _ in range(30):
+        stats.record("perplexity", "answer", "main")
+    stats.record("perplexity", "answer", ".prose")
+    order = stats.order("perplexity", "answer", ANSWER_SELECTORS["perplexity"])
+    assert order[0] == ".prose"
+    assert order[-2:] == ["main", "div[role='main']"]
+
+def test_broad_answer_matches_are_not_hits(stats, monkeypatch):
+    monkeypatch.setattr(scraper, "SELECTOR_STATS", stats)
+    scraper.record_selector_hit("perplexity", "answer", "main")
+    scraper.record_selector_hit("perplexity", "answer", None)
+    assert stats.data == {}
+    # The same selector as an input is an ordinary hit
+    scraper.record_selector_hit("perplexity", "input", "main")
+    assert stats.data == {"perplexity": {"input": {"main": 1.0}}}
+
+def test_fixed_selectors_without_stats(monkeypatch):
+    monkeypatch.setattr(scraper, "SELECTOR_STATS", None)
+    assert scraper.ordered_selectors("perplexity", "answer", ["b", "a"]) == ["b", "a"]
+
+def test_saved_and_reloaded(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = SelectorStats(str(path), save_every=2)
+    stats.record("chatgpt", "input", "textarea")
+    assert not path.exists()
+    stats.record("chatgpt", "input", "textarea")
+    assert json.loads(path.read_text())["chatgpt"]["input"]["textarea"] == pytest.approx(1.9)
+    assert SelectorStats(str(path)).order("chatgpt", "input", ["#x", "textarea"]) == ["textarea", "#x"]
@@ -0,0 +1,105 @@
+"""Result sinks, --resume appends and load_completed_keys()"""
+
+import csv
+import json
+from argparse import Namespace
+
+import pytest
+
+from scraper import (CsvSink, JsonlSink, error_row, load_completed_keys, make_row,
+                     open_result_sinks, prompt_key)
+
+def outputs(tmp_path, resume=False, parquet=False):
+    return Namespace(out_csv=str(tmp_path / "results.csv"), out_jsonl=str(tmp_path / "results.jsonl"),
+                     out_parquet=str(tmp_path / "results.parquet") if parquet else None,
+                     parquet_row_group=2, out_db=None, fsync_interval=None, resume=resume)
+
+def paths(args):
+    return [args.out_csv, args.out_jsonl, args.out_parquet]
+
+def run(args, rows):
+    sink = open_result_sinks(args)
+    for row in rows:
+        sink.write(row)
+    sink.close()
+
+def failed(i, prompt):
+    return error_row(i, prompt, RuntimeError("boom"))
+
+def test_rows_reach_every_output(tmp_path):
+    args = outputs(tmp_path)
+    run(args, [make_row(1, "q1", "a1", ["https://a.com", "Source: BCG"])])
+    with open(args.out_csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["prompt"] == "q1"
+    assert rows[0]["citations"] == "https://a.com; Source: BCG"
+    with open(args.out_jsonl, encoding="utf-8") as f:
+        assert json.loads(f.readline())["answer"] == "a1"
+
+def test_completed_keys_skip_failed_rows(tmp_path):
+    args = outputs(tmp_path)
+    run(args, [make_row(1, "q1", "a1", []), failed(2, "q2"),
+               make_row(3, "q3", "Skipped (bot detection)", [])])
+    for path in (args.out_csv, args.out_jsonl):
+        assert load_completed_keys([path], "perplexity") == {prompt_key("perplexity", "q1")}
+
+def test_resume_appends_and_sees_both_runs(tmp_path):
+    args = outputs(tmp_path)
+    run(args, [make_row(1, "q1", "a1", []), failed(2, "q2")])
+    resumed = outputs(tmp_path, resume=True)
+    run(resumed, [make_row(2, "q2", "a2", [])])
+    with open(args.out_csv, newline="", encoding="utf-8") as f:
+        assert [row["idx"] for row in csv.DictReader(f)] == ["1", "2", "2"]
+    assert load_completed_keys(paths(args), "perplexity") == {
+        prompt_key("perplexity", "q1"), prompt_key("perplexity", "q2")}
+
+def test_without_resume_outputs_start_over(tmp_path):
+    args = outputs(tmp_path)
+    run(args, [make_row(1, "q1", "a1", [])])
+    run(args, [make_row(2, "q2", "a2", [])])
+    assert load_completed_keys(paths(args), "perplexity") == {prompt_key("perplexity", "q2")}
+
+def test_append_repairs_a_cut_off_last_line(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    sink = JsonlSink(path)
+    sink.write(make_row(1, "q1", "a1", []))
+    sink.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"idx": 2, "prompt": "q2", "ans')
+    sink = JsonlSink(path, append=True)
+    sink.write(make_row(3, "q3", "a3", []))
+    sink.close()
+    assert load_completed_keys([path], "perplexity") == {
+        prompt_key("perplexity", "q1"), prompt_key("perplexity", "q3")}
+
+def test_csv_append_keeps_the_existing_header(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text("idx,prompt,answer,site\n1,q1,a1,chatgpt\n", encoding="utf-8")
+    sink = CsvSink(str(path), append=True)
+    sink.write(make_row(2, "q2", "a2", [], "chatgpt"))
+    sink.close()
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "idx,prompt,answer,site", "1,q1,a1,chatgpt", "2,q2,a2,chatgpt"]
+    # Rows without prompt_hash are keyed from their site and prompt
+    assert load_completed_keys([str(path)], "perplexity") == {
+        prompt_key("chatgpt", "q1"), prompt_key("chatgpt", "q2")}
+
+def test_missing_outputs_are_ignored(tmp_path):
+    assert load_completed_keys([str(tmp_path / "nope.csv"), None], "perplexity") == set()
+
+def test_parquet_parts_per_run(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    args = outputs(tmp_path, parquet=True)
+    run(args, [make_row(1, "q1", "a1", ["https://a.com"]), failed(2, "q2"), make_row(3, "q3", "a3", [])])
+    run(outputs(tmp_path, resume=True, parquet=True), [make_row(2, "q2", "a2", [])])
+    parts = sorted(p.name for p in (tmp_path / "results.parquet").iterdir())
+    assert len(parts) == 2 and all(p.startswith("part-") for p in parts)
+    table = pq.read_table(str(tmp_path / "results.parquet"))
+    rows = sorted(table.select(["idx", "status", "citations"]).to_pylist(), key=lambda r: (r["idx"], r["status"]))
+    assert rows == [{"idx": 1, "status": "ok", "citations": ["https://a.com"]},
+                    {"idx": 2, "status": "error", "citations": []},
+                    {"idx": 2, "status": "ok", "citations": []},
+                    {"idx": 3, "status": "ok", "citations": []}]
+    assert load_completed_keys([args.out_parquet], "perplexity") == {
+        prompt_key("perplexity", p) for p in ("q1", "q2", "q3")}
@@ -0,0 +1,70 @@
+"""parse_sse() and StreamCapture's rebuilding of a streamed answer"""
+
+import json
+
+from scraper import StreamCapture, parse_sse
+
+def test_parse_sse_events():
+    body = "event: token\ndata: Hel\n\ndata: lo\ndata: world\n\n: comment\nevent: done\ndata: {}\n"
+    assert parse_sse(body) == [("token", "Hel"), ("message", "lo\nworld"), ("done", "{}")]
+
+def test_parse_sse_without_events():
+    assert parse_sse("") == []
+    assert parse_sse('{"v": "a"}\n{"v": "b"}\n') == []
+
+def capture():
+    return StreamCapture(driver=None)
+
+def test_apply_text_deltas():
+    cap = capture()
+    cap._apply_text({"delta": {"content": "Hello"}})
+    cap._apply_text({"v": ", "})
+    cap._apply_text({"content": "world"})
+    assert cap.text == "Hello, world"
+
+def test_apply_text_cumulative():
+    cap = capture()
+    cap._apply_text({"answer": "The"})
+    cap._apply_text({"answer": "The answer"})
+    assert cap.text == "The answer"
+    cap._apply_text({"message": {"content": {"parts": ["Replaced"]}}})
+    assert cap.text == "Replaced"
+
+def test_apply_text_ignores_unknown_payloads():
+    cap = capture()
+    cap._apply_text({"message": {"content": {"parts": [{"image": 1}]}}, "other": 1})
+    assert cap.text == ""
+
+def test_event_source_messages():
+    cap = capture()
+    events = [("message", json.dumps("Hi")), ("message", json.dumps({"v": " there",
+               "sources": [{"url": "https://a.com"}, {"href": "https://b.com"}, {"url": "ftp://c"}]})),
+              ("message", "[DONE]")]
+    cap.feed([{"method": "Network.eventSourceMessageReceived",
+               "params": {"requestId": "1", "eventName": name, "data": data}} for name, data in events])
+    assert cap.text == "Hi there"
+    assert list(cap.urls) == ["https://a.com", "https://b.com"]
+    assert cap.finished
+
+class BodyDriver:
+    def __init__(self, body):
+        self.body = body
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Network.getResponseBody"
+        return {"body": self.body}
+
+def test_fetch_stream_body_read_on_finish():
+    cap = StreamCapture(BodyDriver('{"v": "a"}\n{"v": "b"}\n'))
+    cap.feed([
+        {"method": "Network.responseReceived",
+         "params": {"requestId": "7", "response": {"mimeType": "application/x-ndjson"}}},
+        {"method": "Network.responseReceived",
+         "params": {"requestId": "8", "response": {"mimeType": "text/html"}}},
+        {"method": "Network.loadingFinished", "params": {"requestId": "8"}},
+    ])
+    assert cap.streams == {"7"}
+    assert not cap.finished
+    cap.feed([{"method": "Network.loadingFinished", "params": {"requestId": "7"}}])
+    assert cap.text == "ab"
+    assert cap.finished